@@ -0,0 +1,292 @@
+'''
+File: analytics.py
+Author: Jeroen De Vlieger
+Description:
+
+Statistics over a whole archive of mazefiles.
+
+The mazefiles are never turned into Maze objects. The tokens of each file are
+streamed from a MazeFileTokenizer and collected a row at a time: the tile
+tokens of a row are counted as plain strings and their tile codes are
+compared with the row above to check the walls of touching tiles. Only the
+few distinct tokens of a file are split into their parts, after the whole
+file is read. The files are analysed in a process pool and the per file
+reports are merged into one CorpusReport.
+
+Run this module to print the report of a number of mazefiles
+
+    python3 -m penomazefiles.analytics archive/*.maze --format csv
+'''
+from collections import Counter
+import contextlib
+import csv
+import io
+import json
+
+from .grid import BIT_TABLES
+from .mazefileparser import MazeFileTokenizer
+from .mazefileparser import MazeTokenParser
+from .mazefileparser import SpecificationViolationError
+
+
+"""Output formats of a CorpusReport"""
+FORMATS = ('json', 'csv')
+
+
+class CorpusReport(object):
+    """
+    Statistics of a number of mazefiles.
+
+    The histograms are Counter objects: tile_types counts the tiles per type
+    name, orientations per 'Type.Orientation' pair, barcodes per barcode,
+    markers the other tile annotations, e.g. start positions and objects, and
+    sizes the files per 'widthxheight' size. failures maps the path of each
+    mazefile that could not be read to the reason why.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.tiles = 0
+        self.tile_types = Counter()
+        self.orientations = Counter()
+        self.barcodes = Counter()
+        self.markers = Counter()
+        self.sizes = Counter()
+        # the number of borders between two touching tiles, the number of
+        # those borders where only one of the tiles has a wall and the number
+        # of files with at least one such border
+        self.borders = 0
+        self.inconsistent_borders = 0
+        self.inconsistent_files = 0
+        self.failures = {}
+
+    @property
+    def dead_ends(self):
+        return self.tile_types['DeadEnd']
+
+    @property
+    def junctions(self):
+        """the number of tiles with three or four open sides"""
+        return self.tile_types['T'] + self.tile_types['Cross']
+
+    @property
+    def failure_rate(self):
+        """the fraction of the files that are unreadable or inconsistent"""
+        if self.files == 0:
+            return 0.0
+        return (len(self.failures) + self.inconsistent_files) / self.files
+
+    def merge(self, other):
+        """Add the statistics of another report to this report, return self"""
+        self.files += other.files
+        self.tiles += other.tiles
+        self.tile_types.update(other.tile_types)
+        self.orientations.update(other.orientations)
+        self.barcodes.update(other.barcodes)
+        self.markers.update(other.markers)
+        self.sizes.update(other.sizes)
+        self.borders += other.borders
+        self.inconsistent_borders += other.inconsistent_borders
+        self.inconsistent_files += other.inconsistent_files
+        self.failures.update(other.failures)
+        return self
+
+    def to_dict(self):
+        """Return the report as a dictionary of plain python objects"""
+        return {'files': self.files,
+                'tiles': self.tiles,
+                'dead_ends': self.dead_ends,
+                'junctions': self.junctions,
+                'borders': self.borders,
+                'inconsistent_borders': self.inconsistent_borders,
+                'inconsistent_files': self.inconsistent_files,
+                'failure_rate': self.failure_rate,
+                'tile_types': dict(self.tile_types.most_common()),
+                'orientations': dict(self.orientations.most_common()),
+                'barcodes': dict(self.barcodes.most_common()),
+                'markers': dict(self.markers.most_common()),
+                'sizes': dict(self.sizes.most_common()),
+                'failures': dict(sorted(self.failures.items()))}
+
+    def write(self, stream, format='json'):
+        """
+        Write the report to a text stream as 'json' or as 'csv'.
+
+        The csv output has a (section, key, value) row per counter.
+        """
+        if format not in FORMATS:
+            raise ValueError('unknown format {!r}'.format(format))
+        report = self.to_dict()
+        if format == 'json':
+            json.dump(report, stream, indent=2)
+            stream.write('\n')
+            return
+
+        writer = csv.writer(stream)
+        writer.writerow(('section', 'key', 'value'))
+        for (key, value) in report.items():
+            if isinstance(value, dict):
+                for (name, count) in value.items():
+                    writer.writerow((key, name, count))
+            else:
+                writer.writerow(('totals', key, value))
+
+    def __str__(self):
+        return '{:d} files, {:d} tiles, {:d} unreadable, {:d} inconsistent'\
+            .format(self.files, self.tiles, len(self.failures),
+                    self.inconsistent_files)
+
+
+class _TokenCounter(object):
+    """
+    Token consumer of a MazeFileTokenizer that collects the statistics of a
+    single mazefile a row at a time.
+    """
+
+    def __init__(self):
+        self.width = None
+        self.height = None
+        self.rows = 0
+        self.tokens = Counter()
+        self.borders = 0
+        self.inconsistent = 0
+        self._row = []
+        self._above = None
+
+    def consume(self, token):
+        if self.height is None:
+            self._read_dimension(token)
+            return
+        row = self._row
+        row.append(token)
+        if len(row) == self.width:
+            self.end_row()
+
+    def _read_dimension(self, token):
+        try:
+            value = int(token)
+        except ValueError:
+            raise SpecificationViolationError(
+                'The first two tokens must be integers')
+        if self.width is None:
+            if value <= 0:
+                raise SpecificationViolationError(
+                    'The maze width must be positive')
+            self.width = value
+        else:
+            if value < 0:
+                raise SpecificationViolationError(
+                    'The maze height can not be negative')
+            self.height = value
+
+    def end_row(self):
+        """count the tokens of the current row and check its borders"""
+        row = self._row
+        if not row:
+            return
+        if self.rows == self.height:
+            raise SpecificationViolationError('To many tiles')
+        self._row = []
+        self.rows += 1
+        self.tokens.update(row)
+
+        codes = bytes(map(MazeTokenParser.token_code, row))
+        # the wall bits of a tile code, NO_TILE has none
+        (north, east, south, west) = BIT_TABLES
+        # the east wall of each tile against the west wall of the next tile
+        self._compare(codes[:-1].translate(east), codes[1:].translate(west))
+        if self._above is not None:
+            # a short last row only touches the start of the row above
+            self._compare(self._above[:len(codes)].translate(south),
+                          codes.translate(north))
+        self._above = codes
+
+    def _compare(self, walls, other_walls):
+        self.borders += len(walls)
+        self.inconsistent += (int.from_bytes(walls, 'little') ^
+                              int.from_bytes(other_walls, 'little')).bit_count()
+
+    def report(self):
+        """Return a CorpusReport of the tokens consumed so far"""
+        self.end_row()
+        report = CorpusReport()
+        report.files = 1
+        report.tiles = sum(self.tokens.values())
+        report.sizes['{:d}x{:d}'.format(self.width, self.height)] = 1
+        report.borders = self.borders
+        report.inconsistent_borders = self.inconsistent
+        report.inconsistent_files = 1 if self.inconsistent else 0
+        for (token, count) in self.tokens.items():
+            parts = token.split('.')
+            report.tile_types[parts[0]] += count
+            report.orientations['.'.join(parts[0:2])] += count
+            for annotation in parts[2:]:
+                if annotation.isdigit():
+                    report.barcodes[annotation] += count
+                else:
+                    report.markers[annotation] += count
+        return report
+
+
+def analyse_file(path):
+    """
+    Return a CorpusReport of a single mazefile.
+
+    An unreadable mazefile is reported as a failure rather than raising an
+    error.
+    """
+    counter = _TokenCounter()
+    try:
+        # the parser prints its diagnostics, keep them out of the report
+        with open(path, 'r') as stream, \
+                contextlib.redirect_stdout(io.StringIO()):
+            tokenizer = MazeFileTokenizer(stream)
+            tokenizer.addTokenConsumer(counter.consume)
+            tokenizer.start()
+            if counter.height is None:
+                raise SpecificationViolationError(
+                    'The mazefile must start with the width and height of '
+                    'the maze')
+            return counter.report()
+    except (SpecificationViolationError, OSError, UnicodeDecodeError) as e:
+        report = CorpusReport()
+        report.files = 1
+        report.failures[path] = str(e)
+        return report
+
+
+def analyse_files(paths, processes=None, chunksize=16):
+    """
+    Return a CorpusReport of a number of mazefiles.
+
+    The files are analysed in a process pool of 'processes' workers, a worker
+    is handed 'chunksize' paths at a time. Use processes=0 to analyse all
+    files in the current process.
+    """
+    report = CorpusReport()
+    if processes == 0:
+        for path in paths:
+            report.merge(analyse_file(path))
+        return report
+
+    import multiprocessing
+    with multiprocessing.Pool(processes) as pool:
+        for file_report in pool.imap_unordered(analyse_file, paths,
+                                               chunksize):
+            report.merge(file_report)
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='collect statistics over a number of mazefiles')
+    parser.add_argument('mazefiles', nargs='+')
+    parser.add_argument('--format', choices=FORMATS, default='json')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    analyse_files(args.mazefiles, args.processes).write(sys.stdout,
+                                                        args.format)
@@ -0,0 +1,21 @@
+'''
+File: assertions.py
+Author: Jeroen De Vlieger
+Description:
+
+Assertions shared by the unit tests of the path planners.
+'''
+
+
+class PathAssertions(object):
+    """Mixin for unittest.TestCase classes that check planned paths"""
+
+    def assertValidPath(self, grid, path, start, goal):
+        """
+        Assert that a list of coordinates leads from start to goal through
+        the passable borders of a MazeGrid, one tile per step.
+        """
+        self.assertEqual(path[0], start)
+        self.assertEqual(path[-1], goal)
+        for (a, b) in zip(path, path[1:]):
+            self.assertIn(grid.index(b), grid.neighbours(grid.index(a)))
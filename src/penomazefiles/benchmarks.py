@@ -0,0 +1,341 @@
+'''
+File: benchmarks.py
+Author: Jeroen De Vlieger
+Description:
+
+Benchmarks of the algorithms of this package. Each one times an algorithm on
+a generated maze and, where there is one, the plain alternative it replaces.
+
+Run a single benchmark, optionally on a maze of a given size, or all of them
+on a maze of their default size
+
+    python3 -m penomazefiles.benchmarks [name [width height]]
+'''
+import random
+import time
+
+from .chunkedmaze import ChunkedMaze
+from .corridors import CorridorGraph
+from .coverage import CoveragePlanner
+from .deadends import DeadEndFiller
+from .edgemaze import EdgeMaze
+from .exploration import ExplorationMap
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .grid import OFFSETS
+from .hierarchical import HierarchicalPlanner
+from .maze import are_walls_consistent
+from .merging import align
+from .merging import merge
+from .raycast import RayCastTable
+from .replanning import DStarLite
+from .tiles import Tile
+from .turnplanner import TurnCostPlanner
+from . import tiles
+
+
+def corridors(width, height):
+    """Compare the corridor graph with a tile level breadth first search"""
+    maze = perfect_maze(width, height, seed=1, straightness=0.9, loops=0.05)
+    grid = MazeGrid(maze)
+
+    start = time.perf_counter()
+    graph = CorridorGraph(grid)
+    print('compressed {:d} tiles into {:d} nodes in {:.3f} s'.format(
+        width * height, graph.node_count(), time.perf_counter() - start))
+
+    generator = random.Random(2)
+    queries = [((generator.randrange(width), generator.randrange(height)),
+                (generator.randrange(width), generator.randrange(height)))
+               for query in range(100)]
+    for (name, search) in (('tile BFS', grid.shortest_path),
+                           ('corridor graph', graph.shortest_path)):
+        start = time.perf_counter()
+        for (source, target) in queries:
+            search(source, target)
+        print('{:s}: {:.2f} ms per query'.format(
+            name, (time.perf_counter() - start) * 10))
+
+
+def coverage(width, height):
+    """Plan coverage tours through random mazes with a few time budgets"""
+    for loops in (0.0, 0.1, 0.3):
+        maze = perfect_maze(width, height, seed=1, loops=loops)
+        for time_budget in (0.25, 2.0):
+            start = time.perf_counter()
+            planner = CoveragePlanner(maze, (width // 2, height // 2))
+            tour = planner.plan(time_budget)
+            print('loops {:.1f}, budget {:.2f} s: {:d} tiles covered in {:d} '
+                  'steps, {:d} moves, planned in {:.3f} s'.format(
+                      loops, time_budget, len(set(tour.path)), tour.length,
+                      len(tour.moves), time.perf_counter() - start))
+
+
+def deadends(width, height):
+    """Compare dead-end filling with a breadth first search"""
+    for (name, options) in (('winding', {}),
+                            ('straight', {'straightness': 0.9})):
+        maze = perfect_maze(width, height, seed=1, **options)
+        grid = MazeGrid(maze)
+        (start, goal) = ((0, 0), (width - 1, height - 1))
+
+        begin = time.perf_counter()
+        expected = grid.shortest_path(start, goal)
+        bfs = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        (corridor, path) = DeadEndFiller(grid).solve(start, goal)
+        filling = time.perf_counter() - begin
+        assert len(path) == len(expected)
+        print('{:s} {:d}x{:d} maze, path of {:d} tiles: BFS {:.3f} s, '
+              'dead-end filling {:.3f} s'.format(name, width, height,
+                                                 len(path), bfs, filling))
+
+
+def edgemaze(width, height):
+    """Compare an EdgeMaze with a Maze of Tile objects"""
+    maze = perfect_maze(width, height, seed=1, loops=0.05)
+
+    start = time.perf_counter()
+    consistent = are_walls_consistent(maze)
+    print('are_walls_consistent: {!s} in {:.3f} s'.format(
+        consistent, time.perf_counter() - start))
+    start = time.perf_counter()
+    (edge_maze, conflicts) = EdgeMaze.from_maze(maze)
+    print('from_maze: {:d} conflicts in {:.3f} s'.format(
+        len(conflicts), time.perf_counter() - start))
+    print('walls: {:d} bytes in the planes, {:d} bytes as 4 bit wall masks'
+          .format(len(edge_maze._horizontal) + len(edge_maze._vertical),
+                  width * height // 2))
+    start = time.perf_counter()
+    (converted, conflicts) = edge_maze.to_maze()
+    print('to_maze: {:d} conflicts in {:.3f} s'.format(
+        len(conflicts), time.perf_counter() - start))
+
+    coordinates = [coordinate for (coordinate, tile) in maze]
+    for (name, has_wall) in (
+            ('Maze',
+             lambda coordinate, d: maze.get_tile(coordinate).has_wall(d)),
+            ('EdgeMaze', edge_maze.has_wall)):
+        start = time.perf_counter()
+        for coordinate in coordinates:
+            has_wall(coordinate, Tile.EAST)
+        print('{:s}.has_wall: {:.3f} us'.format(
+            name, (time.perf_counter() - start) * 1e6 / len(coordinates)))
+
+
+def exploration(width, height):
+    """Time the exploration of a maze by a frontier following robot"""
+    maze = perfect_maze(width, height, seed=1, loops=0.1)
+
+    # a robot that always drives to the most recent frontier border, every
+    # tile it enters is sensed and visited
+    start = time.perf_counter()
+    exploration = ExplorationMap()
+    exploration.visit((0, 0), maze.get_tile((0, 0)))
+    frontier = exploration.next_frontier()
+    while frontier is not None:
+        ((x, y), direction) = frontier
+        coordinate = (x + OFFSETS[direction][0], y + OFFSETS[direction][1])
+        exploration.visit(coordinate, maze.get_tile(coordinate))
+        frontier = exploration.next_frontier()
+    seconds = time.perf_counter() - start
+    print('explored {:d} tiles in {:.3f} s, {:.0f} observations per '
+          'second'.format(len(exploration.visited()), seconds,
+                          4 * width * height / seconds))
+    assert exploration.to_maze() == maze
+
+
+def hierarchical(width, height):
+    """Compare HPA* with a tile level breadth first search"""
+    maze = perfect_maze(width, height, seed=1, straightness=0.5, loops=0.1)
+    grid = MazeGrid(maze)
+
+    start = time.perf_counter()
+    planner = HierarchicalPlanner(grid)
+    print('{:d} entrances in {:d} clusters in {:.2f} s'.format(
+        len(planner.edges), len(planner.entrances),
+        time.perf_counter() - start))
+
+    generator = random.Random(2)
+    queries = [((generator.randrange(width), generator.randrange(height)),
+                (generator.randrange(width), generator.randrange(height)))
+               for query in range(100)]
+    for (name, search) in (('tile BFS', grid.shortest_path),
+                           ('HPA* distance', planner.distance),
+                           ('HPA* path', planner.shortest_path)):
+        start = time.perf_counter()
+        for (source, target) in queries:
+            search(source, target)
+        print('{:s}: {:.2f} ms per query'.format(
+            name, (time.perf_counter() - start) * 10))
+
+
+def merging(width, height):
+    """Time the alignment and merge of two partial maps of a maze"""
+    world = perfect_maze(width, height, seed=1, loops=0.05,
+                         maze_class=ChunkedMaze)
+
+    # two robots explored overlapping parts of the world, the second one in
+    # a frame rotated once and shifted
+    generator = random.Random(2)
+    first = ChunkedMaze()
+    second = ChunkedMaze()
+    for y in range(height):
+        for x in range(width):
+            tile = world.get_tile((x, y))
+            if x < width * 2 // 3 and generator.random() < 0.95:
+                first.add_tile((x, y), tile)
+            if x >= width // 3 and generator.random() < 0.95:
+                second.add_tile((y + 17, -x + 5), tile.rotate(3))
+
+    start = time.perf_counter()
+    alignment = align(first, second)
+    print('translation only: {!r} in {:.2f} s'.format(
+        alignment, time.perf_counter() - start))
+    start = time.perf_counter()
+    (merged, conflicts, alignment) = merge(first, second, rotations=True)
+    elapsed = time.perf_counter() - start
+    print('with rotations: {!r}, {:d} tiles, {:d} conflicts in {:.2f} s'
+          .format(alignment, len(merged._tiles_dict()), len(conflicts),
+                  elapsed))
+
+
+def raycast(width, height):
+    """Compare the distance tables with walking along the tiles"""
+    maze = perfect_maze(width, height, seed=1, straightness=0.7)
+
+    start = time.perf_counter()
+    table = RayCastTable(maze)
+    print('built the tables of {:d} tiles in {:.3f} s'.format(
+        width * height, time.perf_counter() - start))
+
+    generator = random.Random(2)
+    readings = [((generator.randrange(width), generator.randrange(height)),
+                 generator.randrange(4)) for reading in range(100000)]
+
+    def walk(coordinate, direction):
+        (dx, dy) = OFFSETS[direction]
+        (x, y) = coordinate
+        distance = 0
+        tile = maze.get_tile((x, y))
+        while tile is not None and tile.is_open(direction):
+            (x, y) = (x + dx, y + dy)
+            tile = maze.get_tile((x, y))
+            if tile is None or tile.has_wall((direction + 2) % 4):
+                break
+            distance += 1
+        return distance
+
+    for (name, sense) in (('tile walk', walk), ('table', table.distance)):
+        start = time.perf_counter()
+        for (coordinate, direction) in readings:
+            sense(coordinate, direction)
+        print('{:s}: {:.3f} us per reading'.format(
+            name, (time.perf_counter() - start) * 10))
+
+    start = time.perf_counter()
+    for update in range(100):
+        coordinate = (generator.randrange(width), generator.randrange(height))
+        table.add_tile(coordinate, maze.get_tile(coordinate).rotate())
+    print('update after add_tile: {:.2f} ms'.format(
+        (time.perf_counter() - start) * 10))
+
+
+def replanning(width, height):
+    """Compare D* Lite with a full breadth first search per replan"""
+    maze = perfect_maze(width, height, seed=1, loops=0.1)
+    generator = random.Random(2)
+
+    # replace straights by seesaws, entered from either side
+    seesaws = []
+    for (coordinate, tile) in list(maze):
+        if isinstance(tile, tiles.Straight) and generator.random() < 0.2:
+            rotations = generator.choice((0, 2)) + (1 if tile.walls[0] else 0)
+            maze.add_tile(coordinate, tiles.Seesaw(rotations))
+            seesaws.append(coordinate)
+
+    goal = (width - 1, height - 1)
+    planner = DStarLite(maze, (0, 0), goal)
+    start = time.perf_counter()
+    path = planner.path()
+    print('initial plan of {:d} steps expanded {:d} tiles in {:.1f} ms'.format(
+        len(path) - 1, planner.expanded, (time.perf_counter() - start) * 1000))
+
+    (incremental, full, expanded) = (0.0, 0.0, planner.expanded)
+    replans = 0
+    while path is not None and len(path) > 1:
+        robot = path[min(len(path) - 1, 3)]
+        planner.move_to(robot)
+        seesaw = generator.choice([coordinate for coordinate in seesaws
+                                    if coordinate != robot])
+        start = time.perf_counter()
+        planner.toggle_seesaw(seesaw)
+        path = planner.path()
+        incremental += time.perf_counter() - start
+
+        start = time.perf_counter()
+        planner.grid.shortest_path(robot, goal)
+        full += time.perf_counter() - start
+        replans += 1
+
+    print('{:d} replans: D* Lite {:.2f} ms and {:.0f} expansions per replan, '
+          'full BFS {:.2f} ms per replan'.format(
+              replans, incremental * 1000 / replans,
+              (planner.expanded - expanded) / replans, full * 1000 / replans))
+
+
+def turnplanner(width, height):
+    """Compare the turn cost planner with a tile level breadth first search"""
+    maze = perfect_maze(width, height, seed=1, loops=0.2)
+    grid = MazeGrid(maze)
+    planner = TurnCostPlanner(grid, forward=1, turn=3, u_turn=5)
+
+    generator = random.Random(2)
+    queries = [((generator.randrange(width), generator.randrange(height)),
+                generator.randrange(4),
+                (generator.randrange(width), generator.randrange(height)))
+               for query in range(100)]
+    start = time.perf_counter()
+    for (source, heading, target) in queries:
+        planner.plan(source, heading, target)
+    print('turn cost planner: {:.2f} ms per query'.format(
+        (time.perf_counter() - start) * 10))
+    start = time.perf_counter()
+    for (source, heading, target) in queries:
+        grid.shortest_path(source, target)
+    print('tile BFS: {:.2f} ms per query'.format(
+        (time.perf_counter() - start) * 10))
+
+
+"""the benchmarks by name and the default width and height of their maze"""
+BENCHMARKS = {'corridors': (corridors, (200, 200)),
+              'coverage': (coverage, (100, 100)),
+              'deadends': (deadends, (300, 300)),
+              'edgemaze': (edgemaze, (500, 500)),
+              'exploration': (exploration, (200, 200)),
+              'hierarchical': (hierarchical, (500, 500)),
+              'merging': (merging, (500, 500)),
+              'raycast': (raycast, (500, 500)),
+              'replanning': (replanning, (100, 100)),
+              'turnplanner': (turnplanner, (50, 50))}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='time the algorithms of penomazefiles on generated mazes')
+    parser.add_argument('name', nargs='?', choices=sorted(BENCHMARKS),
+                        help='the benchmark to run, all of them by default')
+    parser.add_argument('size', nargs='*', type=int,
+                        help='the width and height of the maze')
+    args = parser.parse_args()
+    if args.size and (args.name is None or len(args.size) != 2):
+        parser.error('expected a benchmark name followed by a width and a '
+                     'height')
+
+    for name in [args.name] if args.name else sorted(BENCHMARKS):
+        (benchmark, size) = BENCHMARKS[name]
+        print('{:s}:'.format(name))
+        benchmark(*(args.size or size))
@@ -0,0 +1,341 @@
+'''
+File: chunkedmaze.py
+Author: Jeroen De Vlieger
+Description:
+
+Module containing a chunked storage backend for freeform mazes
+'''
+from itertools import compress
+
+from .maze import Maze
+from . import tiles
+
+
+"""Number of bits of a coordinate that index a tile within a chunk"""
+CHUNK_BITS = 6
+"""Width and height of a chunk expressed in tiles"""
+CHUNK_SIZE = 1 << CHUNK_BITS
+_CHUNK_MASK = CHUNK_SIZE - 1
+_CHUNK_TILES = CHUNK_SIZE * CHUNK_SIZE
+
+
+class ChunkedMaze(Maze):
+    """A Maze that stores its tiles in fixed size chunks
+
+    The coordinate space is divided in square chunks of CHUNK_SIZE by
+    CHUNK_SIZE tiles. A chunk is only allocated once a tile is added to it,
+    hence sparse mazes and mazes with negative coordinates don't waste memory
+    on empty space.
+
+    Each chunk is a bytearray holding one tile code (see tiles.encode) per
+    tile in row major order. A tile code of tiles.NO_TILE marks an empty spot.
+
+    Only tiles of the types in tiles.TILE_TYPES can be stored. get_tile
+    returns a new Tile object on every call, so modifying a returned tile does
+    not modify the maze. Use add_tile to store the modified tile.
+    """
+
+    """
+    The chunks are stored in a dictionary with the chunk coordinates as key
+            { (x >> CHUNK_BITS, y >> CHUNK_BITS) -> bytearray }
+
+    Chunks can be shared with forks of this maze. Only the keys of the chunks
+    in _owned are exclusively owned by this maze and can be written in place,
+    all other chunks are copied before their first modification.
+    """
+    def __init__(self):
+        # don't call Maze.__init__, this backend has no use for its dictionary
+        self._chunks = {}
+        self._owned = set()
+
+    def add_tile(self, coordinate, tile):
+        """Add a tile to this maze on a specific coordinate
+
+        'coordinate' is a 2 dimensional tuple of integers (int, int) denoting
+        the position if the maze where 'tile' should be added.
+        If a tile is already present on that coordinate then it gets replaced.
+        """
+        (x, y) = coordinate
+        self._writable_chunk((x >> CHUNK_BITS, y >> CHUNK_BITS))[
+            (y & _CHUNK_MASK) << CHUNK_BITS | (x & _CHUNK_MASK)] = \
+            tiles.encode(tile)
+
+    def remove_tile(self, coordinate):
+        """Remove the tile at a given coordinate, if any"""
+        (x, y) = coordinate
+        key = (x >> CHUNK_BITS, y >> CHUNK_BITS)
+        if key in self._chunks:
+            self._writable_chunk(key)[
+                (y & _CHUNK_MASK) << CHUNK_BITS | (x & _CHUNK_MASK)] = \
+                tiles.NO_TILE
+
+    def add_tiles(self, coordinates, tiles=None):
+        """Add a number of tiles to this maze at once
+
+        Either 'coordinates' is an iterable of (coordinate, tile) tuples and
+        'tiles' is None, or 'coordinates' and 'tiles' are two iterables of
+        equal length holding the coordinates and the tiles respectively.
+        Existing tiles get replaced.
+        """
+        items = coordinates if tiles is None else zip(coordinates, tiles)
+        add_tile = self.add_tile
+        for (coordinate, tile) in items:
+            add_tile(coordinate, tile)
+
+    def add_code_row(self, coordinate, codes):
+        """Add a horizontal run of tiles given by their tile codes
+
+        The tile with code codes[i] is added at (x+i, y), where (x, y) is
+        'coordinate'. Entries equal to tiles.NO_TILE are skipped, i.e. they
+        leave the maze unchanged at their coordinate. The codes are copied
+        into the chunks a chunk row at a time.
+        """
+        (x, y) = coordinate
+        codes = bytes(codes)
+        row_start = (y & _CHUNK_MASK) << CHUNK_BITS
+        index = 0
+        while index < len(codes):
+            local_x = (x + index) & _CHUNK_MASK
+            count = min(CHUNK_SIZE - local_x, len(codes) - index)
+            part = codes[index:index + count]
+            chunk_key = ((x + index) >> CHUNK_BITS, y >> CHUNK_BITS)
+            if part.count(tiles.NO_TILE) == count:
+                index += count
+                continue
+
+            chunk = self._writable_chunk(chunk_key)
+            start = row_start | local_x
+            if tiles.NO_TILE not in part:
+                chunk[start:start + count] = part
+            else:
+                for (offset, code) in enumerate(part, start):
+                    if code != tiles.NO_TILE:
+                        chunk[offset] = code
+            index += count
+
+    def get_tile(self, coordinate):
+        """
+        Return the tile at a given coordinate.
+
+        Return None if there is no tile at the given coordinate
+        """
+        (x, y) = coordinate
+        chunk = self._chunks.get((x >> CHUNK_BITS, y >> CHUNK_BITS))
+        if chunk is None:
+            return None
+        return tiles.decode(
+            chunk[(y & _CHUNK_MASK) << CHUNK_BITS | (x & _CHUNK_MASK)])
+
+    def get_code(self, coordinate):
+        """
+        Return the tile code (see tiles.encode) at a given coordinate, or
+        tiles.NO_TILE if there is no tile.
+        """
+        (x, y) = coordinate
+        chunk = self._chunks.get((x >> CHUNK_BITS, y >> CHUNK_BITS))
+        if chunk is None:
+            return tiles.NO_TILE
+        return chunk[(y & _CHUNK_MASK) << CHUNK_BITS | (x & _CHUNK_MASK)]
+
+    def _wall_masks(self, xs, ys):
+        """look up the tile codes chunk by chunk, see Maze.walls_at"""
+        get = self._chunks.get
+        empty = bytes(_CHUNK_TILES)
+        return bytearray(
+            get((x >> CHUNK_BITS, y >> CHUNK_BITS), empty)[
+                (y & _CHUNK_MASK) << CHUNK_BITS | (x & _CHUNK_MASK)]
+            for (x, y) in zip(xs, ys)).translate(tiles.WALL_MASKS)
+
+    def _writable_chunk(self, key):
+        """return the chunk with the given key, allocate it if needed"""
+        if key in self._owned:
+            return self._chunks[key]
+
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = bytearray(_CHUNK_TILES)
+        else:
+            # copy on write, the chunk is shared with a fork
+            chunk = bytearray(chunk)
+        self._chunks[key] = chunk
+        self._owned.add(key)
+        return chunk
+
+    def fork(self):
+        """
+        Return a copy of this maze which shares its storage with this maze.
+
+        Forking only copies the chunk dictionary, not the chunks themselves.
+        Both mazes can be modified independently afterwards, a shared chunk
+        is copied by the first maze that modifies it. Memory hence grows
+        with the number of modified chunks and not with the number of forks.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone._chunks = dict(self._chunks)
+        clone._owned = set()
+        # all chunks are now shared with the fork
+        self._owned = set()
+        return clone
+
+    def snapshot(self):
+        """
+        Return a snapshot of the current state of this maze.
+
+        The snapshot is a fork, i.e. taking it is cheap and neither the
+        snapshot nor this maze is affected by later modifications of the other
+        """
+        return self.fork()
+
+    def __getstate__(self):
+        """the chunks of tile codes are compact already, pickle them as is"""
+        return {'chunks': self._chunks}
+
+    def __setstate__(self, state):
+        self._chunks = state['chunks']
+        # a maze and its forks pickled together share their chunks again,
+        # copy every chunk before its first modification
+        self._owned = set()
+
+    def iter_chunks(self):
+        """return an iterator over the allocated chunks of this maze
+
+        The iterator yields ((x0,y0), chunk) tuples, where (x0,y0) is the
+        coordinate of the left upper tile of the chunk and chunk is a
+        bytearray of tile codes in row major order. The chunks must not be
+        modified.
+        """
+        for ((cx, cy), chunk) in self._chunks.items():
+            yield ((cx << CHUNK_BITS, cy << CHUNK_BITS), chunk)
+
+    def get_boundingbox(self):
+        """
+        compute a bounding box of the current maze.
+
+        Returns  a tuple of coordinates (lu, rl). lu is the coordinate of the
+        left upper point of the bounding box while rl is the coordinate of the
+        right lower point of the bounding box
+
+        Raises a ValueError if the maze holds no tiles, like Maze does.
+        """
+        min_x = min_y = max_x = max_y = None
+        for ((x0, y0), chunk) in self.iter_chunks():
+            for row_index in range(CHUNK_SIZE):
+                start = row_index << CHUNK_BITS
+                row = bytes(chunk[start:start + CHUNK_SIZE])
+                if row.count(tiles.NO_TILE) == CHUNK_SIZE:
+                    continue
+                left = x0 + CHUNK_SIZE - len(row.lstrip(b'\0'))
+                right = x0 + len(row.rstrip(b'\0'))
+                y = y0 + row_index
+                if min_x is None:
+                    (min_x, max_x, min_y, max_y) = (left, right, y, y + 1)
+                    continue
+                min_x = min(min_x, left)
+                max_x = max(max_x, right)
+                min_y = min(min_y, y)
+                max_y = max(max_y, y + 1)
+
+        if min_x is None:
+            raise ValueError('an empty maze has no bounding box')
+        return ((min_x, min_y), (max_x, max_y))
+
+    def code_grid(self, boundingbox=None):
+        """
+        Return the tile codes (see tiles.encode) of this maze as a bytearray
+
+        The grid covers 'boundingbox', a ((min_x, min_y), (max_x, max_y))
+        tuple that defaults to the bounding box of the maze, in row major
+        order. Spots without a tile hold tiles.NO_TILE. The grid is filled a
+        chunk row at a time.
+        """
+        if boundingbox is None:
+            boundingbox = self.get_boundingbox()
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        width = max_x - min_x
+        grid = bytearray(width * (max_y - min_y))
+        for ((x0, y0), chunk) in self._chunks_within(boundingbox):
+            left = max(x0, min_x)
+            right = min(x0 + CHUNK_SIZE, max_x)
+            if left >= right:
+                continue
+            for y in range(max(y0, min_y), min(y0 + CHUNK_SIZE, max_y)):
+                start = (y - y0) << CHUNK_BITS
+                target = (y - min_y) * width
+                grid[target + left - min_x:target + right - min_x] = \
+                    chunk[start + left - x0:start + right - x0]
+        return grid
+
+    def _chunks_within(self, boundingbox):
+        """
+        Return an iterator over the ((x0,y0), chunk) tuples of the chunks that
+        might overlap 'boundingbox', see iter_chunks. Small boxes only probe
+        the chunk keys they cover instead of visiting every chunk.
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        if min_x >= max_x or min_y >= max_y:
+            return iter(())
+        (left, top) = (min_x >> CHUNK_BITS, min_y >> CHUNK_BITS)
+        (right, bottom) = (((max_x - 1) >> CHUNK_BITS) + 1,
+                           ((max_y - 1) >> CHUNK_BITS) + 1)
+        if (right - left) * (bottom - top) >= len(self._chunks):
+            return self.iter_chunks()
+        chunks = self._chunks
+        return (((cx << CHUNK_BITS, cy << CHUNK_BITS), chunks[(cx, cy)])
+                for cy in range(top, bottom) for cx in range(left, right)
+                if (cx, cy) in chunks)
+
+    def build_spatial_index(self):
+        """iter_region only reads the chunks within its box, no index needed"""
+
+    def iter_region(self, boundingbox):
+        """
+        Return an iterator over the (coordinate, tile) tuples of the tiles
+        within 'boundingbox' in row major order, see Maze.iter_region.
+
+        Only the allocated chunks that overlap the box are read, so the cost
+        doesn't grow with the empty space between the chunks.
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        # the overlapping chunks per chunk row, { y0 -> [(x0, chunk), ...] }
+        chunk_rows = {}
+        for ((x0, y0), chunk) in self._chunks_within(boundingbox):
+            if x0 < max_x and x0 + CHUNK_SIZE > min_x and \
+               y0 < max_y and y0 + CHUNK_SIZE > min_y:
+                chunk_rows.setdefault(y0, []).append((x0, chunk))
+        decode = tiles.decode
+        for y0 in sorted(chunk_rows):
+            row = sorted(chunk_rows[y0], key=lambda item: item[0])
+            for y in range(max(y0, min_y), min(y0 + CHUNK_SIZE, max_y)):
+                start = (y - y0) << CHUNK_BITS
+                for (x0, chunk) in row:
+                    left = start + max(x0, min_x) - x0
+                    right = start + min(x0 + CHUNK_SIZE, max_x) - x0
+                    for index in compress(range(left, right),
+                                          chunk[left:right]):
+                        yield ((x0 + (index & _CHUNK_MASK), y),
+                               decode(chunk[index]))
+
+    def __iter__(self):
+        """return an Iterator for this maze object
+
+        The iterator traverses the maze object chunk by chunk returning
+        (coordinate, tile) tuples.
+        """
+        decode = tiles.decode
+        for ((x0, y0), chunk) in self.iter_chunks():
+            for index in compress(range(_CHUNK_TILES), chunk):
+                yield ((x0 + (index & _CHUNK_MASK), y0 + (index >> CHUNK_BITS)),
+                       decode(chunk[index]))
+
+    def _tiles_dict(self):
+        return dict(iter(self))
+
+    def __eq__(self, other):
+        if isinstance(other, ChunkedMaze):
+            return self._nonempty_chunks() == other._nonempty_chunks()
+        return super().__eq__(other)
+
+    def _nonempty_chunks(self):
+        empty = bytes(_CHUNK_TILES)
+        return {key: chunk for (key, chunk) in self._chunks.items()
+                if chunk != empty}
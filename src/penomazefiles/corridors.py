@@ -0,0 +1,230 @@
+'''
+File: corridors.py
+Author: Jeroen De Vlieger
+Description:
+
+Corridor graph compression of a maze for faster path planning.
+
+Most tiles of a maze are part of a corridor, i.e. Straight and Corner tiles
+with exactly two passable neighbours. Searching through them tile by tile is
+wasteful. A CorridorGraph collapses every corridor into a single weighted edge
+between the tiles where a decision can be made: junctions (T, Cross), dead
+ends and explicitly marked tiles such as barcodes and start positions.
+
+Run its benchmark to compare it with a tile level breadth first search
+
+    python3 -m penomazefiles.benchmarks corridors [width height]
+'''
+from array import array
+import heapq
+
+from .grid import MazeGrid
+
+
+_DEGREE = bytes(bin(mask).count('1') for mask in range(16))
+
+
+class CorridorGraph(object):
+    """
+    Weighted graph of the junctions of a maze.
+
+    Attributes:
+        grid     the MazeGrid of the maze
+        edges    { node -> [(neighbour, weight, chain, forward), ...] } where
+                 nodes are grid indices. The corridor between a node and its
+                 neighbour is chains[chain], traversed from start to end if
+                 forward is True.
+        chains   list of the grid indices of the tiles in each corridor,
+                 excluding the nodes at both ends
+        ends     (start node, end node) of each chain
+        chain_of array mapping each grid index to the chain it belongs to, or
+                 -1 for nodes and empty cells
+        position array mapping each grid index to its position within its
+                 chain
+    """
+
+    def __init__(self, maze, keep=()):
+        """
+        Compress a maze, or a MazeGrid. The tiles at the coordinates in 'keep'
+        always become nodes.
+        """
+        self.grid = maze if isinstance(maze, MazeGrid) else MazeGrid(maze)
+        grid = self.grid
+        size = grid.width * grid.height
+
+        degrees = grid.passable.translate(_DEGREE + bytes(240))
+        self.is_node = bytearray(1 if present and degree != 2 else 0
+                                 for (present, degree)
+                                 in zip(grid.present, degrees))
+        for coordinate in keep:
+            if grid.contains(coordinate):
+                self.is_node[grid.index(coordinate)] = 1
+
+        self.edges = {}
+        self.chains = []
+        self.ends = []
+        self.chain_of = array('l', [-1]) * size
+        self.position = array('l', [0]) * size
+
+        for node in [index for (index, flag) in enumerate(self.is_node) if flag]:
+            self._walk_from(node)
+
+        # corridors that form a closed loop without any node
+        for index in range(size):
+            if degrees[index] == 2 and self.chain_of[index] < 0 and \
+               not self.is_node[index]:
+                self.is_node[index] = 1
+                self._walk_from(index)
+
+    def _walk_from(self, node):
+        """follow all corridors leaving a node that were not followed yet"""
+        grid = self.grid
+        passable = grid.passable
+        deltas = grid.deltas()
+        self.edges.setdefault(node, [])
+
+        for direction in range(4):
+            if not passable[node] >> direction & 1:
+                continue
+            first = node + deltas[direction]
+            if not self.is_node[first] and self.chain_of[first] >= 0:
+                # corridor already followed from its other end
+                continue
+            if self.is_node[first] and \
+               any(neighbour == first and weight == 1 and
+                   self._direction(node, first) == direction
+                   for (neighbour, weight, chain, forward) in self.edges[node]):
+                continue
+
+            chain = array('l')
+            (previous, current, heading) = (node, first, direction)
+            while not self.is_node[current]:
+                self.chain_of[current] = len(self.chains)
+                self.position[current] = len(chain)
+                chain.append(current)
+                back = (heading + 2) % 4
+                heading = next(d for d in range(4)
+                               if passable[current] >> d & 1 and d != back)
+                (previous, current) = (current, current + deltas[heading])
+
+            chain_id = len(self.chains)
+            self.chains.append(chain)
+            self.ends.append((node, current))
+            weight = len(chain) + 1
+            self.edges[node].append((current, weight, chain_id, True))
+            self.edges.setdefault(current, []).append(
+                (node, weight, chain_id, False))
+
+    def _direction(self, index, neighbour):
+        return self.grid.deltas().index(neighbour - index)
+
+    def node_count(self):
+        """return the number of nodes of the compressed graph"""
+        return len(self.edges)
+
+    def _anchors(self, index):
+        """
+        return the nodes reachable from a tile without passing another node as
+        a list of (node, distance, tiles leading to the node) tuples
+        """
+        if self.is_node[index]:
+            return [(index, 0, [])]
+        chain_id = self.chain_of[index]
+        chain = self.chains[chain_id]
+        position = self.position[index]
+        (start, end) = self.ends[chain_id]
+        return [(start, position + 1, list(reversed(chain[0:position]))),
+                (end, len(chain) - position, list(chain[position+1:]))]
+
+    def shortest_path(self, start, goal):
+        """
+        Return a shortest list of coordinates leading from coordinate 'start'
+        to coordinate 'goal', both included.
+
+        Return None if the goal can't be reached.
+        """
+        grid = self.grid
+        if not (grid.contains(start) and grid.contains(goal)):
+            return None
+        (source, target) = (grid.index(start), grid.index(goal))
+        if not grid.present[source] or not grid.present[target]:
+            return None
+        if source == target:
+            return [start]
+
+        best = None
+        best_route = None
+        # both tiles in the same corridor
+        if not self.is_node[source] and \
+           self.chain_of[source] == self.chain_of[target]:
+            chain = self.chains[self.chain_of[source]]
+            (p, q) = (self.position[source], self.position[target])
+            best = abs(p - q)
+            step = 1 if q > p else -1
+            best_route = list(chain[p:q + step if q + step >= 0 else None:step])
+
+        # a corridor looping back to its own node has that node at both ends
+        goal_anchors = {}
+        for (node, distance, tiles) in self._anchors(target):
+            if distance < goal_anchors.get(node, (distance + 1,))[0]:
+                goal_anchors[node] = (distance, tiles)
+
+        # A* search, the manhattan distance to the goal is a lower bound of
+        # the remaining path length
+        width = grid.width
+        (goal_x, goal_y) = (target % width, target // width)
+
+        def estimate(node):
+            return abs(node % width - goal_x) + abs(node // width - goal_y)
+
+        distances = {}
+        parents = {}
+        heap = []
+        for (node, distance, tiles) in self._anchors(source):
+            if distance < distances.get(node, distance + 1):
+                distances[node] = distance
+                parents[node] = ('start', tiles)
+                heapq.heappush(heap, (distance + estimate(node), distance, node))
+
+        finish = None
+        while heap:
+            (bound, distance, node) = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            if best is not None and bound >= best:
+                break
+            if node in goal_anchors:
+                total = distance + goal_anchors[node][0]
+                if best is None or total < best:
+                    (best, best_route, finish) = (total, None, node)
+            for (neighbour, weight, chain, forward) in self.edges[node]:
+                candidate = distance + weight
+                if candidate < distances.get(neighbour, candidate + 1):
+                    distances[neighbour] = candidate
+                    parents[neighbour] = (node, chain, forward)
+                    heapq.heappush(heap, (candidate + estimate(neighbour),
+                                          candidate, neighbour))
+
+        if best is None:
+            return None
+        if best_route is not None:
+            return [grid.coordinate(index) for index in best_route]
+
+        # expand the compressed path, walking back from the goal
+        tiles = [] if self.is_node[target] else \
+                [target] + goal_anchors[finish][1]
+        node = finish
+        while True:
+            tiles.append(node)
+            parent = parents[node]
+            if parent[0] == 'start':
+                tiles.extend(reversed(parent[1]))
+                break
+            (previous, chain, forward) = parent
+            tiles.extend(reversed(self.chains[chain]) if forward
+                         else self.chains[chain])
+            node = previous
+        if not self.is_node[source]:
+            tiles.append(source)
+        tiles.reverse()
+        return [grid.coordinate(index) for index in tiles]
@@ -0,0 +1,409 @@
+'''
+File: coverage.py
+Author: Jeroen De Vlieger
+Description:
+
+Coverage tours: a short walk from a start pose that visits every tile that
+can be reached from it, e.g. for a scoring run through a known maze.
+
+A tour is an order of targets, tiles the robot must drive to, joined by
+legs. Two constructions build a tour: a depth first traversal of a spanning
+tree that explores the deepest branch last, with the leaves of the tree as
+targets, and a robot that repeatedly drives to the nearest unvisited tile.
+The shorter tour is improved with 2-opt moves, using the exact distances
+between each target and its nearest targets, until no move helps or the
+time budget runs out. Tiles that the legs of a tour miss, e.g. on loops,
+become targets themselves.
+
+Run its benchmark to plan a tour through a random maze
+
+    python3 -m penomazefiles.benchmarks coverage [width height]
+'''
+from array import array
+from collections import deque
+import time
+
+from .grid import MazeGrid
+from .grid import OFFSETS
+from .tiles import Tile
+
+
+"""Commands of a move sequence: drive one tile forward, turn on the spot"""
+FORWARD = 'F'
+LEFT = 'L'
+RIGHT = 'R'
+U_TURN = 'U'
+
+"""TURNS[(new_heading - heading) % 4] is the command for a change of heading"""
+TURNS = ('', RIGHT, U_TURN, LEFT)
+
+"""number of nearest targets a 2-opt move may connect a target to"""
+NEIGHBOURS = 8
+
+
+def path_moves(path, heading):
+    """
+    Return the move sequence, a string of FORWARD, LEFT, RIGHT and U_TURN
+    commands, that drives a robot with a given heading along a path of
+    coordinates, and the heading of the robot at the end of the path.
+    """
+    commands = []
+    for ((x, y), (next_x, next_y)) in zip(path, path[1:]):
+        direction = OFFSETS.index((next_x - x, next_y - y))
+        commands.append(TURNS[(direction - heading) % 4])
+        commands.append(FORWARD)
+        heading = direction
+    return (''.join(commands), heading)
+
+
+def _length(tour):
+    """the number of steps of a (targets, legs) tour"""
+    return sum(len(leg) for leg in tour[1])
+
+
+class CoverageTour(object):
+    """
+    A walk visiting every reachable tile of a maze.
+
+    Attributes:
+        path     list of coordinates of the walk, the start first
+        moves    move sequence following the path, see path_moves
+        heading  heading of the robot at the end of the walk
+        targets  coordinates of the targets in the order they are visited
+    """
+
+    def __init__(self, path, moves, heading, targets):
+        self.path = path
+        self.moves = moves
+        self.heading = heading
+        self.targets = targets
+
+    @property
+    def length(self):
+        """the number of steps of the walk"""
+        return len(self.path) - 1
+
+
+class CoveragePlanner(object):
+    """
+    Plans coverage tours through a maze from a start pose.
+
+    Attributes:
+        grid     the MazeGrid of the maze
+        tiles    grid indices of the tiles reachable from the start, in
+                 breadth first order
+    """
+
+    def __init__(self, maze, start, heading=Tile.NORTH):
+        """
+        Plan on a maze, or a MazeGrid, from coordinate 'start' where the robot
+        faces 'heading'.
+        """
+        self.grid = maze if isinstance(maze, MazeGrid) else MazeGrid(maze)
+        grid = self.grid
+        if not grid.contains(start) or not grid.present[grid.index(start)]:
+            raise ValueError('there is no tile at {!s}'.format(start))
+        self.start = grid.index(start)
+        self.heading = heading
+
+        self.tiles = [self.start]
+        reachable = bytearray(grid.width * grid.height)
+        reachable[self.start] = 1
+        for index in self.tiles:
+            for neighbour in grid.neighbours(index):
+                if not reachable[neighbour]:
+                    reachable[neighbour] = 1
+                    self.tiles.append(neighbour)
+        # exact distances, keyed by (min(a, b), max(a, b)), and the limits
+        # beyond which searches found nothing
+        self._distances = {}
+        self._beyond = {}
+
+    def _search(self, source, stop, limit=None):
+        """
+        Breadth first search from a grid index until stop(index) is True for
+        a visited index, up to 'limit' steps away. Return the list of indices
+        leading from the source to that index, the source excluded, or None.
+        """
+        if stop(source):
+            return []
+        grid = self.grid
+        (passable, deltas) = (grid.passable, grid.deltas())
+        parents = {source: None}
+        (frontier, depth) = ([source], 0)
+        while frontier and (limit is None or depth < limit):
+            depth += 1
+            layer = []
+            for index in frontier:
+                mask = passable[index]
+                for direction in range(4):
+                    if not mask >> direction & 1:
+                        continue
+                    neighbour = index + deltas[direction]
+                    if neighbour in parents:
+                        continue
+                    parents[neighbour] = index
+                    if stop(neighbour):
+                        path = [neighbour]
+                        while parents[path[-1]] != source:
+                            path.append(parents[path[-1]])
+                        return path[::-1]
+                    layer.append(neighbour)
+            frontier = layer
+        return None
+
+    def _path(self, a, b):
+        """return the indices of a shortest path from a to b, a excluded"""
+        path = self._search(a, b.__eq__)
+        self._distances[(min(a, b), max(a, b))] = len(path)
+        return path
+
+    def _distance(self, a, b, limit):
+        """return the distance from a to b, or None if it exceeds 'limit'"""
+        key = (min(a, b), max(a, b))
+        distance = self._distances.get(key)
+        if distance is None:
+            # the manhattan distance and earlier searches that gave up bound
+            # the distance from below
+            width = self.grid.width
+            if abs(a % width - b % width) + abs(a // width - b // width) > \
+               limit or self._beyond.get(key, -1) >= limit:
+                return None
+            path = self._search(a, b.__eq__, limit)
+            if path is None:
+                self._beyond[key] = limit
+                return None
+            distance = self._distances[key] = len(path)
+        return distance if distance <= limit else None
+
+    def _nearest(self, index, is_target):
+        """
+        return the NEIGHBOURS targets nearest to a grid index, is_target[i]
+        is 1 for the grid index i of a target
+        """
+        grid = self.grid
+        found = []
+        seen = {index}
+        (frontier, depth) = ([index], 0)
+        while frontier and len(found) < NEIGHBOURS:
+            depth += 1
+            layer = []
+            for tile in frontier:
+                for neighbour in grid.neighbours(tile):
+                    if neighbour in seen:
+                        continue
+                    seen.add(neighbour)
+                    layer.append(neighbour)
+                    if is_target[neighbour]:
+                        found.append(neighbour)
+                        self._distances[(min(index, neighbour),
+                                         max(index, neighbour))] = depth
+            frontier = layer
+        return found[:NEIGHBOURS]
+
+    def _dfs_order(self):
+        """
+        order the leaves of a depth first spanning tree, which include the
+        dead ends, the way a traversal that visits the highest subtree of
+        every tile last meets them
+        """
+        grid = self.grid
+        parents = {self.start: None}
+        order = []
+        stack = [self.start]
+        while stack:
+            index = stack.pop()
+            order.append(index)
+            for neighbour in grid.neighbours(index):
+                if neighbour not in parents:
+                    parents[neighbour] = index
+                    stack.append(neighbour)
+
+        heights = dict.fromkeys(order, 0)
+        children = {index: [] for index in order}
+        for index in reversed(order):
+            parent = parents[index]
+            if parent is not None:
+                heights[parent] = max(heights[parent], heights[index] + 1)
+                children[parent].append(index)
+
+        targets = []
+        stack = [self.start]
+        while stack:
+            index = stack.pop()
+            if not children[index] and index != self.start:
+                targets.append(index)
+            # the stack pops the lowest subtree first
+            stack.extend(sorted(children[index], key=heights.__getitem__,
+                                reverse=True))
+        return targets
+
+    def _greedy_tour(self):
+        """
+        Return (targets, legs) of the walk of a robot that repeatedly drives
+        to the nearest unvisited tile. The targets are the tiles where it has
+        to turn back and the tile where it ends, legs[i] is the walk from the
+        previous target to targets[i].
+        """
+        unvisited = bytearray(self.grid.width * self.grid.height)
+        for index in self.tiles:
+            unvisited[index] = 1
+        unvisited[self.start] = 0
+        count = len(self.tiles) - 1
+        (current, targets, legs, leg) = (self.start, [], [], [])
+        while count:
+            path = self._search(current, unvisited.__getitem__)
+            if len(path) > 1 and leg:
+                # the robot drives back over visited tiles
+                targets.append(current)
+                legs.append(leg)
+                leg = []
+            for index in path:
+                count -= unvisited[index]
+                unvisited[index] = 0
+            leg.extend(path)
+            current = path[-1]
+        if leg:
+            targets.append(current)
+            legs.append(leg)
+        return (targets, legs)
+
+    def _cover(self, targets):
+        """
+        Return (targets, legs) where legs[i] is a shortest path to targets[i]
+        from the previous target. Tiles the legs miss are inserted as targets
+        next to the leg passing closest to them.
+        """
+        legs = [self._path(a, b)
+                for (a, b) in zip([self.start] + targets, targets)]
+        while True:
+            leg_of = array('l', [-1]) * (self.grid.width * self.grid.height)
+            leg_of[self.start] = 0
+            for (number, leg) in enumerate(legs):
+                for index in leg:
+                    if leg_of[index] < 0:
+                        leg_of[index] = number
+
+            inserted = {}
+            for index in self.tiles:
+                if leg_of[index] >= 0:
+                    continue
+                path = self._search(index, lambda tile: leg_of[tile] >= 0)
+                number = leg_of[path[-1]]
+                inserted.setdefault(number, []).append(index)
+                # the detour to this tile passes the tiles on the way
+                for tile in path[:-1]:
+                    leg_of[tile] = number
+            if not inserted:
+                return (targets, legs)
+
+            # only the legs with insertions change, the last leg can be
+            # extended beyond its target
+            (order, paths, previous) = ([], [], self.start)
+            for number in range(len(targets) + 1):
+                last = number == len(targets)
+                stops = inserted.get(number, [])
+                if not stops and not last:
+                    paths.append(legs[number])
+                stops = stops + ([] if last else [targets[number]])
+                for stop in stops:
+                    if len(paths) == len(order):
+                        paths.append(self._path(previous, stop))
+                    order.append(stop)
+                    previous = stop
+            (targets, legs) = (order, paths)
+
+    def _two_opt(self, targets, deadline):
+        """
+        Improve an order of targets by 2-opt moves until no move helps or
+        the deadline passes.
+
+        A move replaces the edges leaving tour[low] and tour[high] by edges
+        between tour[low] and tour[high] and between their successors, one
+        of which connects a target to one of its nearest targets. Targets
+        whose edges didn't change since they were last examined are skipped.
+        """
+        tour = [self.start] + targets
+        position = {index: number for (number, index) in enumerate(tour)}
+        is_target = bytearray(self.grid.width * self.grid.height)
+        for index in tour:
+            is_target[index] = 1
+        neighbours = {}
+        distances = self._distances
+
+        def edge(number):
+            """the length of the edge leaving tour[number], 0 at the end"""
+            if number + 1 == len(tour):
+                return 0
+            (a, b) = (tour[number], tour[number + 1])
+            known = distances.get((min(a, b), max(a, b)))
+            return len(self._path(a, b)) if known is None else known
+
+        def gain(low, high):
+            removed = edge(low) + edge(high)
+            first = self._distance(tour[low], tour[high], removed - 1)
+            if first is None or high + 1 == len(tour):
+                return 0 if first is None else removed - first
+            second = self._distance(tour[low + 1], tour[high + 1],
+                                    removed - first - 1)
+            return 0 if second is None else removed - first - second
+
+        queue = deque(tour)
+        queued = set(tour)
+        while queue and time.perf_counter() < deadline:
+            a = queue.popleft()
+            queued.discard(a)
+            if a not in neighbours:
+                neighbours[a] = self._nearest(a, is_target)
+            for c in neighbours[a]:
+                (i, j) = (position[a], position[c])
+                (low, high) = (i, j) if i < j else (j, i)
+                # a and c either become neighbours in place of their
+                # successors or in place of their predecessors
+                moves = [(low, high), (low - 1, high - 1)] if low else \
+                    [(low, high)]
+                moves = [(low, high) for (low, high) in moves
+                         if high - low >= 2 and gain(low, high) > 0]
+                if not moves:
+                    continue
+                (low, high) = moves[0]
+                changed = [tour[number] for number in (low, low + 1, high,
+                                                       high + 1)
+                           if number < len(tour)]
+                tour[low + 1:high + 1] = tour[high:low:-1]
+                for number in range(low + 1, high + 1):
+                    position[tour[number]] = number
+                for index in changed:
+                    if index not in queued:
+                        queued.add(index)
+                        queue.append(index)
+                break
+        return tour[1:]
+
+    def plan(self, time_budget=0.25):
+        """
+        Return a CoverageTour starting at the start pose.
+
+        The 2-opt improvement stops such that planning takes about
+        'time_budget' seconds, the constructions always run to completion.
+        """
+        start = time.perf_counter()
+        deadline = start + time_budget
+        candidates = [self._cover(self._dfs_order())]
+        # leave time to cover the tiles the improved tour misses
+        deadline -= time.perf_counter() - start
+        candidates.append(self._greedy_tour())
+        if time.perf_counter() < deadline:
+            best = min(candidates, key=_length)
+            improved = self._two_opt(best[0], deadline)
+            if improved != best[0]:
+                candidates.append(self._cover(improved))
+        (targets, legs) = min(candidates, key=_length)
+
+        grid = self.grid
+        path = [grid.coordinate(self.start)]
+        for leg in legs:
+            path.extend(grid.coordinate(index) for index in leg)
+        (moves, heading) = path_moves(path, self.heading)
+        return CoverageTour(path, moves, heading,
+                            [grid.coordinate(index) for index in targets])
@@ -0,0 +1,195 @@
+'''
+File: deadends.py
+Author: Jeroen De Vlieger
+Description:
+
+Dead-end filling solver.
+
+Every tile that is a dead end, other than the endpoints of the route, can't
+be part of a route between them and is filled. Filling a dead end can turn
+its neighbour into a dead end, and so on until only the corridors between the
+endpoints remain. In a perfect maze that is exactly the solution path, in a
+maze with loops all the loops between the endpoints are kept.
+
+The degrees of all tiles are computed with one byte lane per tile of a big
+integer (see grid.borders) and all dead ends are filled at once. A pass fills
+the tips of all dead-end branches, so a long branch takes one pass per tile.
+The passes are repeated while they fill a good share of the maze, the
+remaining branches are then followed one tile at a time.
+
+Run its benchmark to compare it with a breadth first search
+
+    python3 -m penomazefiles.benchmarks deadends [width height]
+'''
+from collections import deque
+from itertools import compress
+
+from .grid import BIT_TABLES
+from .grid import MazeGrid
+
+
+"""
+A pass that fills less than this fraction of the maze hands the remaining
+dead ends over to a walk along each branch.
+"""
+_MIN_FILL = 1 / 256
+
+
+class DeadEndFiller(object):
+    """
+    Dead-end filling solver of a maze.
+
+    The passable masks of the maze are compiled once, every call of fill or
+    solve starts from the unfilled maze.
+    """
+
+    def __init__(self, maze):
+        """Compile a maze, or use a MazeGrid as is"""
+        self.grid = maze if isinstance(maze, MazeGrid) else MazeGrid(maze)
+        grid = self.grid
+        size = grid.width * grid.height
+        # open[d] has a 1 in the lane of every tile a robot can leave in
+        # direction d
+        self._open = [int.from_bytes(grid.passable.translate(BIT_TABLES[d]),
+                                     'little') for d in range(4)]
+        self._ones = int.from_bytes(b'\x01' * size, 'little')
+        # index offsets to the neighbours a robot can drive to, per 4 bit
+        # passable mask
+        self._steps = tuple(tuple(delta for (direction, delta)
+                                  in enumerate(grid.deltas())
+                                  if mask >> direction & 1)
+                            for mask in range(16))
+
+    def _index(self, coordinate):
+        grid = self.grid
+        if not grid.contains(coordinate) or \
+           not grid.present[grid.index(coordinate)]:
+            raise ValueError('there is no tile at {!s}'.format(coordinate))
+        return grid.index(coordinate)
+
+    def _degrees(self, alive):
+        """return lanes holding the number of living neighbours of each tile"""
+        (north, east, south, west) = self._open
+        row = 8 * self.grid.width
+        return (north & alive << row) + (east & alive >> 8) + \
+               (south & alive >> row) + (west & alive << 8)
+
+    def _branching(self, degrees):
+        """return lanes holding 1 for each tile with at least two neighbours"""
+        # adding 6 sets bit 3 of a lane when its degree is 2 or more, the
+        # degrees are at most 4 so no lane carries into the next one
+        return (degrees + 6 * self._ones) >> 3 & self._ones
+
+    def fill(self, endpoints):
+        """
+        Fill all dead ends that are not one of the given coordinates.
+
+        Return a bytearray holding 1 for each cell of the grid that is left
+        open, in the row major order of the grid.
+        """
+        grid = self.grid
+        size = grid.width * grid.height
+        keep = 0
+        for coordinate in endpoints:
+            keep |= 1 << 8 * self._index(coordinate)
+
+        alive = int.from_bytes(grid.present, 'little')
+        count = alive.bit_count()
+        while True:
+            degrees = self._degrees(alive)
+            survivors = alive & (self._branching(degrees) | keep)
+            filled = count - survivors.bit_count()
+            if filled == 0:
+                return bytearray(alive.to_bytes(size, 'little'))
+            (alive, count) = (survivors, count - filled)
+            if filled < size * _MIN_FILL:
+                break
+
+        degrees = self._degrees(alive)
+        dead_ends = alive & ~(self._branching(degrees) | keep)
+        alive = bytearray(alive.to_bytes(size, 'little'))
+        self._walk_branches(alive, bytearray(degrees.to_bytes(size, 'little')),
+                            bytearray(keep.to_bytes(size, 'little')),
+                            compress(range(size),
+                                     dead_ends.to_bytes(size, 'little')))
+        return alive
+
+    def _walk_branches(self, alive, degrees, keep, dead_ends):
+        """fill each dead end and the branch leading to it, tile by tile"""
+        passable = self.grid.passable
+        steps = self._steps
+        for index in dead_ends:
+            while alive[index]:
+                alive[index] = 0
+                following = None
+                for step in steps[passable[index]]:
+                    neighbour = index + step
+                    if alive[neighbour]:
+                        degrees[neighbour] -= 1
+                        following = neighbour
+                if following is None or keep[following] or \
+                   degrees[following] > 1:
+                    break
+                index = following
+
+    def solve(self, start, goal):
+        """
+        Fill the dead ends of the maze for a route from start to goal.
+
+        Return a (corridor, path) tuple where corridor is the bytearray of
+        open cells returned by fill and path a shortest list of coordinates
+        leading from start to goal through the open cells, both included, or
+        None if the goal can't be reached.
+        """
+        corridor = self.fill((start, goal))
+        grid = self.grid
+        (source, target) = (grid.index(start), grid.index(goal))
+        path = self._follow(corridor, source, target)
+        if path is None:
+            path = self._search(corridor, source, target)
+        if path is None:
+            return (corridor, None)
+        return (corridor, [grid.coordinate(index) for index in path])
+
+    def _follow(self, corridor, source, target):
+        """
+        return the grid indices of the single corridor leading from source to
+        target, or None if the corridor branches or ends before the target
+        """
+        passable = self.grid.passable
+        steps = self._steps
+        (path, previous, index) = ([source], None, source)
+        while index != target:
+            following = [index + step for step in steps[passable[index]]
+                         if corridor[index + step] and index + step != previous]
+            if len(following) != 1:
+                return None
+            (previous, index) = (index, following[0])
+            path.append(index)
+        return path
+
+    def _search(self, corridor, source, target):
+        """breadth first search through the remaining corridors and loops"""
+        passable = self.grid.passable
+        steps = self._steps
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            index = queue.popleft()
+            if index == target:
+                break
+            for step in steps[passable[index]]:
+                neighbour = index + step
+                if corridor[neighbour] and neighbour not in parents:
+                    parents[neighbour] = index
+                    queue.append(neighbour)
+        else:
+            return None
+
+        path = []
+        index = target
+        while index is not None:
+            path.append(index)
+            index = parents[index]
+        path.reverse()
+        return path
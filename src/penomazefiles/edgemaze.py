@@ -0,0 +1,489 @@
+'''
+File: edgemaze.py
+Author: Jeroen De Vlieger
+Description:
+
+Module containing a storage backend for mazes that stores every wall once.
+
+A Maze stores each border twice, once on each of the two tiles that share it,
+which is why are_walls_consistent has to exist. An EdgeMaze stores the borders
+themselves as two packed bit planes, one for the horizontal and one for the
+vertical borders, hence two touching tiles can't disagree about their shared
+border.
+'''
+from itertools import compress
+
+from .grid import BIT_TABLES
+from .maze import Maze
+from .tiles import Tile
+from . import tiles
+
+
+"""translate a tile code into its type index, see tiles.encode"""
+_TYPES = bytes(code >> 4 for code in range(256))
+
+"""translate a tile code into 1 if there is a tile"""
+_PRESENT = bytes([0]) + bytes([1]) * 255
+
+"""translate bytes 0/1 into the digits '0'/'1' and back"""
+_DIGITS = bytes(range(48, 50)) + bytes(254)
+_BITS = bytes(48) + bytes([0, 1]) + bytes(206)
+
+
+
+def _conflicting_codes():
+    codes = bytearray([1]) * 256
+    # type index 0, walls of a spot without a tile
+    codes[0:1 << 4] = bytes(16)
+    # a plain Tile can have any walls
+    codes[1 << 4:2 << 4] = bytes(16)
+    for cls in tiles.TILE_TYPES[1:]:
+        for rotations in range(4):
+            tile = cls(rotations)
+            for passable in (True, False):
+                if cls is tiles.Seesaw:
+                    tile.passable = passable
+                codes[tiles.encode(tile)] = 0
+    return bytes(codes)
+
+"""1 for every code of a tile whose walls don't match its type"""
+_CONFLICTING = _conflicting_codes()
+
+
+def _pack(lanes):
+    """return an int with bit i set if lanes[i] is 1, lanes holds bytes 0/1"""
+    text = bytes(lanes).translate(_DIGITS)[::-1]
+    return int(text, 2) if text else 0
+
+
+def _spread(bits, count):
+    """return bytes holding bit i of the int 'bits' at index i, for i < count"""
+    text = format(bits, 'b')[::-1][:count].ljust(count, '0')
+    return text.encode('ascii').translate(_BITS)
+
+
+def _ones(bits):
+    """return the positions of the set bits of a non negative int"""
+    text = format(bits, 'b')[::-1]
+    return [index for (index, digit) in enumerate(text) if digit == '1']
+
+
+class EdgeMaze(Maze):
+    """A Maze that stores the borders between tiles instead of tile walls
+
+    The maze covers a rectangular region of the coordinate space which grows
+    when a tile is added outside of it. For the region the maze holds
+        - types: a bytearray with the type index (see tiles.encode) of each
+          tile, 0 where there is no tile
+        - a horizontal bit plane with one bit per border above a tile, height
+          + 1 rows of width bits
+        - a vertical bit plane with one bit per border left of a tile, height
+          rows of width + 1 bits
+    A set bit denotes a wall. The rows of a plane are packed little endian,
+    i.e. bit x of a row is bit x % 8 of byte x // 8 of the row.
+
+    add_tile writes all four borders of a tile, hence it also changes the
+    walls its neighbours show. A regular tile (Corner, T, ...) shows as the
+    regular tile matching its current walls, other tiles keep their type.
+
+    Only tiles of the types in tiles.TILE_TYPES can be stored. get_tile
+    returns a new Tile object on every call, so modifying a returned tile does
+    not modify the maze. Use add_tile to store the modified tile.
+    """
+
+    def __init__(self):
+        # don't call Maze.__init__, this backend has no use for its dictionary
+        self._allocate((0, 0), 0, 0)
+
+    def _allocate(self, origin, width, height):
+        (self._min_x, self._min_y) = origin
+        (self._width, self._height) = (width, height)
+        self._h_stride = (width + 7) >> 3
+        self._v_stride = (width + 8) >> 3
+        self._types = bytearray(width * height)
+        self._horizontal = bytearray(self._h_stride * (height + 1))
+        self._vertical = bytearray(self._v_stride * height)
+
+    def _reserve(self, x, y):
+        """grow the region such that it contains the tile at (x, y)"""
+        (min_x, min_y) = (self._min_x, self._min_y)
+        (width, height) = (self._width, self._height)
+        if min_x <= x < min_x + width and min_y <= y < min_y + height:
+            return
+        if not width:
+            self._allocate((x, y), 1, 1)
+            return
+
+        # grow by at least the current size on every side that grows, so
+        # that a maze explored tile by tile is copied a logarithmic number of
+        # times
+        left = min_x - min(x, min_x - width) if x < min_x else 0
+        right = max(x + 1, min_x + 2 * width) - min_x - width \
+            if x >= min_x + width else 0
+        top = min_y - min(y, min_y - height) if y < min_y else 0
+        bottom = max(y + 1, min_y + 2 * height) - min_y - height \
+            if y >= min_y + height else 0
+
+        old = (self._types, self._horizontal, self._vertical,
+               self._h_stride, self._v_stride)
+        self._allocate((min_x - left, min_y - top), left + width + right,
+                       top + height + bottom)
+        (types, horizontal, vertical, h_stride, v_stride) = old
+        for row in range(height + 1):
+            target = row + top
+            if row < height:
+                start = target * self._width + left
+                self._types[start:start + width] = \
+                    types[row * width:(row + 1) * width]
+                bits = int.from_bytes(
+                    vertical[row * v_stride:(row + 1) * v_stride], 'little')
+                self._vertical[target * self._v_stride:
+                               (target + 1) * self._v_stride] = \
+                    (bits << left).to_bytes(self._v_stride, 'little')
+            bits = int.from_bytes(
+                horizontal[row * h_stride:(row + 1) * h_stride], 'little')
+            self._horizontal[target * self._h_stride:
+                             (target + 1) * self._h_stride] = \
+                (bits << left).to_bytes(self._h_stride, 'little')
+
+    def _index(self, coordinate):
+        """return the local (x, y) of a coordinate, or None outside the region"""
+        (x, y) = (coordinate[0] - self._min_x, coordinate[1] - self._min_y)
+        if 0 <= x < self._width and 0 <= y < self._height:
+            return (x, y)
+        return None
+
+    def _border(self, x, y, direction):
+        """return the (plane, byte index, bit) of a border of a local tile"""
+        if direction == Tile.NORTH:
+            (plane, row, bit) = (self._horizontal, y, x)
+        elif direction == Tile.SOUTH:
+            (plane, row, bit) = (self._horizontal, y + 1, x)
+        elif direction == Tile.WEST:
+            (plane, row, bit) = (self._vertical, y, x)
+        else:
+            (plane, row, bit) = (self._vertical, y, x + 1)
+        stride = self._h_stride if plane is self._horizontal else \
+            self._v_stride
+        return (plane, row * stride + (bit >> 3), 1 << (bit & 7))
+
+    def _wall_mask(self, x, y):
+        mask = 0
+        for direction in range(4):
+            (plane, index, bit) = self._border(x, y, direction)
+            if plane[index] & bit:
+                mask |= 1 << direction
+        return mask
+
+    def has_wall(self, coordinate, direction):
+        """
+        Return True if there is a wall on the border of the spot at a
+        coordinate in a given direction.
+
+        The border is shared with the neighbouring spot, hence it doesn't
+        matter which of the two tiles put the wall there. Borders that no
+        tile touches have no wall.
+        """
+        (x, y) = (coordinate[0] - self._min_x, coordinate[1] - self._min_y)
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            return False
+        if direction & 1:
+            # the vertical border left of the tile or left of its neighbour
+            x += direction == Tile.EAST
+            return bool(self._vertical[y * self._v_stride + (x >> 3)] >>
+                        (x & 7) & 1)
+        y += direction == Tile.SOUTH
+        return bool(self._horizontal[y * self._h_stride + (x >> 3)] >>
+                    (x & 7) & 1)
+
+    def _wall_masks(self, xs, ys):
+        """read the four borders of each tile, see Maze.walls_at"""
+        (min_x, min_y) = (self._min_x, self._min_y)
+        (width, height) = (self._width, self._height)
+        (h_stride, v_stride) = (self._h_stride, self._v_stride)
+        (types, horizontal, vertical) = (self._types, self._horizontal,
+                                         self._vertical)
+        masks = bytearray(b'\x0f') * len(xs)
+        for (i, x, y) in zip(range(len(masks)), xs, ys):
+            (x, y) = (x - min_x, y - min_y)
+            if not (0 <= x < width and 0 <= y < height) or \
+               not types[y * width + x]:
+                continue
+            (row, east) = (y * h_stride + (x >> 3), x + 1)
+            left = y * v_stride
+            masks[i] = horizontal[row] >> (x & 7) & 1 | \
+                (vertical[left + (east >> 3)] >> (east & 7) & 1) << 1 | \
+                (horizontal[row + h_stride] >> (x & 7) & 1) << 2 | \
+                (vertical[left + (x >> 3)] >> (x & 7) & 1) << 3
+        return masks
+
+    def add_tile(self, coordinate, tile):
+        """Add a tile to this maze on a specific coordinate
+
+        'coordinate' is a 2 dimensional tuple of integers (int, int) denoting
+        the position if the maze where 'tile' should be added.
+        If a tile is already present on that coordinate then it gets replaced.
+        The walls of the tile replace the borders it shares with its
+        neighbours.
+        """
+        self._set_code(coordinate, tiles.encode(tile))
+
+    def _set_code(self, coordinate, code):
+        self._reserve(*coordinate)
+        (x, y) = self._index(coordinate)
+        self._types[y * self._width + x] = code >> 4
+        for direction in range(4):
+            (plane, index, bit) = self._border(x, y, direction)
+            if code >> direction & 1:
+                plane[index] |= bit
+            else:
+                plane[index] &= ~bit
+
+    def remove_tile(self, coordinate):
+        """Remove the tile at a given coordinate, if any
+
+        The borders of the tile stay, they might belong to its neighbours.
+        """
+        local = self._index(coordinate)
+        if local is not None:
+            self._types[local[1] * self._width + local[0]] = tiles.NO_TILE
+
+    def add_code_row(self, coordinate, codes):
+        """Add a horizontal run of tiles given by their tile codes
+
+        The tile with code codes[i] is added at (x+i, y), where (x, y) is
+        'coordinate'. Entries equal to tiles.NO_TILE are skipped, i.e. they
+        leave the maze unchanged at their coordinate.
+        """
+        (x, y) = coordinate
+        codes = bytes(codes)
+        stripped = codes.strip(b'\0')
+        if not stripped:
+            return
+        start = x + len(codes) - len(codes.lstrip(b'\0'))
+        self._reserve(start, y)
+        self._reserve(start + len(stripped) - 1, y)
+        for (x, code) in enumerate(stripped, start):
+            if code != tiles.NO_TILE:
+                self._set_code((x, y), code)
+
+    def get_tile(self, coordinate):
+        """
+        Return the tile at a given coordinate.
+
+        Return None if there is no tile at the given coordinate
+        """
+        local = self._index(coordinate)
+        if local is None:
+            return None
+        (x, y) = local
+        type_index = self._types[y * self._width + x]
+        if type_index == tiles.NO_TILE:
+            return None
+        return tiles.decode(tiles.VIEW_CODES[type_index << 4 |
+                                             self._wall_mask(x, y)])
+
+    def fork(self):
+        """
+        Return a copy of this maze that can be modified independently.
+
+        Forking copies the planes and the types, one byte and two bits per
+        spot of the region.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        for name in ('_types', '_horizontal', '_vertical'):
+            setattr(clone, name, bytearray(getattr(self, name)))
+        return clone
+
+    def snapshot(self):
+        """Return a snapshot of the current state of this maze, see fork"""
+        return self.fork()
+
+    def __getstate__(self):
+        """the planes are compact already, pickle them as is"""
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def get_boundingbox(self):
+        """
+        compute a bounding box of the current maze.
+
+        Returns  a tuple of coordinates (lu, rl). lu is the coordinate of the
+        left upper point of the bounding box while rl is the coordinate of the
+        right lower point of the bounding box
+
+        Raises a ValueError if the maze holds no tiles, like Maze does.
+        """
+        width = self._width
+        min_x = min_y = max_x = max_y = None
+        for y in range(self._height):
+            row = bytes(self._types[y * width:(y + 1) * width])
+            if row.count(tiles.NO_TILE) == width:
+                continue
+            left = width - len(row.lstrip(b'\0'))
+            right = len(row.rstrip(b'\0'))
+            if min_x is None:
+                (min_x, max_x, min_y) = (left, right, y)
+            (min_x, max_x, max_y) = (min(min_x, left), max(max_x, right), y + 1)
+
+        if min_x is None:
+            raise ValueError('an empty maze has no bounding box')
+        return ((self._min_x + min_x, self._min_y + min_y),
+                (self._min_x + max_x, self._min_y + max_y))
+
+    def _row_codes(self, y):
+        """
+        return the type index and the walls of each spot of local row y as
+        bytes of tile codes, translate them with tiles.VIEW_CODES to get the
+        codes of the tiles shown
+        """
+        width = self._width
+        horizontal = [int.from_bytes(
+            self._horizontal[row * self._h_stride:(row + 1) * self._h_stride],
+            'little') for row in (y, y + 1)]
+        vertical = int.from_bytes(
+            self._vertical[y * self._v_stride:(y + 1) * self._v_stride],
+            'little')
+        # one byte lane per tile, the walls at their bit of the wall mask
+        lanes = [int.from_bytes(_spread(bits, width), 'little') << direction
+                 for (direction, bits) in ((Tile.NORTH, horizontal[0]),
+                                           (Tile.EAST, vertical >> 1),
+                                           (Tile.SOUTH, horizontal[1]),
+                                           (Tile.WEST, vertical))]
+        types = int.from_bytes(self._types[y * width:(y + 1) * width],
+                               'little')
+        codes = types << 4 | lanes[0] | lanes[1] | lanes[2] | lanes[3]
+        return codes.to_bytes(width, 'little')
+
+    def code_grid(self, boundingbox=None):
+        """
+        Return the tile codes (see tiles.encode) of this maze as a bytearray
+
+        The grid covers 'boundingbox', a ((min_x, min_y), (max_x, max_y))
+        tuple that defaults to the bounding box of the maze, in row major
+        order. Spots without a tile hold tiles.NO_TILE. The codes of a row
+        are derived from the planes all at once.
+        """
+        if boundingbox is None:
+            boundingbox = self.get_boundingbox()
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        width = max_x - min_x
+        grid = bytearray(width * (max_y - min_y))
+        left = max(min_x, self._min_x)
+        right = min(max_x, self._min_x + self._width)
+        if left >= right:
+            return grid
+        for y in range(max(min_y, self._min_y),
+                       min(max_y, self._min_y + self._height)):
+            row = self._row_codes(y - self._min_y).translate(
+                tiles.VIEW_CODES)
+            target = (y - min_y) * width
+            grid[target + left - min_x:target + right - min_x] = \
+                row[left - self._min_x:right - self._min_x]
+        return grid
+
+    def build_spatial_index(self):
+        """iter_region only reads the rows within its box, no index needed"""
+
+    def iter_region(self, boundingbox):
+        """
+        Return an iterator over the (coordinate, tile) tuples of the tiles
+        within 'boundingbox' in row major order, see Maze.iter_region.
+
+        Only the rows of the region that hold a tile within the box are
+        decoded.
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        left = max(min_x, self._min_x) - self._min_x
+        right = min(max_x, self._min_x + self._width) - self._min_x
+        if left >= right:
+            return
+        decode = tiles.decode
+        width = self._width
+        for y in range(max(min_y, self._min_y) - self._min_y,
+                       min(max_y, self._min_y + self._height) - self._min_y):
+            if not any(self._types[y * width + left:y * width + right]):
+                continue
+            row = self._row_codes(y).translate(tiles.VIEW_CODES)
+            for x in compress(range(left, right), row[left:right]):
+                yield ((self._min_x + x, self._min_y + y), decode(row[x]))
+
+    def __iter__(self):
+        """return an Iterator for this maze object
+
+        The iterator traverses the maze object row by row returning
+        (coordinate, tile) tuples.
+        """
+        return self.iter_region(
+            ((self._min_x, self._min_y),
+             (self._min_x + self._width, self._min_y + self._height)))
+
+    def _tiles_dict(self):
+        return dict(iter(self))
+
+    @classmethod
+    def from_maze(cls, maze):
+        """
+        Convert a maze of any backend into an EdgeMaze.
+
+        Where two touching tiles disagree about their shared border the wall
+        wins. Return an (edge_maze, conflicts) tuple where conflicts is the
+        set of those borders, in the format of maze.inconsistent_borders.
+        """
+        edge_maze = cls()
+        conflicts = set()
+        if next(iter(maze), None) is None:
+            return (edge_maze, conflicts)
+        ((min_x, min_y), (max_x, max_y)) = maze.get_boundingbox()
+        (width, height) = (max_x - min_x, max_y - min_y)
+        codes = maze.code_grid()
+
+        edge_maze._allocate((min_x, min_y), width, height)
+        edge_maze._types[:] = codes.translate(_TYPES)
+        (h_stride, v_stride) = (edge_maze._h_stride, edge_maze._v_stride)
+        (south, present) = (0, 0)
+        for y in range(height + 1):
+            row = codes[y * width:(y + 1) * width]
+            (above, south) = (south, _pack(row.translate(BIT_TABLES[2])))
+            (present_above, present) = (present, _pack(row.translate(_PRESENT)))
+            north = _pack(row.translate(BIT_TABLES[0]))
+            edge_maze._horizontal[y * h_stride:(y + 1) * h_stride] = \
+                (north | above).to_bytes(h_stride, 'little')
+            for x in _ones((north ^ above) & present & present_above):
+                conflicts.add(((min_x + x, min_y + y - 1), Tile.SOUTH))
+            if y == height:
+                break
+
+            west = _pack(row.translate(BIT_TABLES[3]))
+            east = _pack(row.translate(BIT_TABLES[1])) << 1
+            edge_maze._vertical[y * v_stride:(y + 1) * v_stride] = \
+                (west | east).to_bytes(v_stride, 'little')
+            for x in _ones((west ^ east) & present & present << 1):
+                conflicts.add(((min_x + x - 1, min_y + y), Tile.EAST))
+        return (edge_maze, conflicts)
+
+    def to_maze(self, maze_class=Maze):
+        """
+        Convert this maze into a maze of another backend.
+
+        Return a (maze, conflicts) tuple. conflicts is the set of coordinates
+        of the tiles whose walls no longer match the type they were added
+        with because a neighbour replaced a shared border, e.g. a Cross that
+        shows as a T or a Seesaw with a wall across its track. Such tiles are
+        converted as they show, see get_tile.
+        """
+        maze = maze_class()
+        conflicts = set()
+        width = self._width
+        for y in range(self._height):
+            if not any(self._types[y * width:(y + 1) * width]):
+                continue
+            codes = self._row_codes(y)
+            for x in compress(range(width), codes.translate(_CONFLICTING)):
+                conflicts.add((self._min_x + x, self._min_y + y))
+            shown = codes.translate(tiles.VIEW_CODES)
+            maze.add_code_row((self._min_x, self._min_y + y), shown)
+        return (maze, conflicts)
@@ -0,0 +1,149 @@
+'''
+File: exploration.py
+Author: Jeroen De Vlieger
+Description:
+
+Map of a partially explored maze.
+
+While exploring, a robot knows that some borders are walls, that some are
+open and that the others are still unknown, something a Tile can't express.
+An ExplorationMap keeps the state of every border it has heard of, ingests
+the observations of the robot one border at a time and keeps the frontier up
+to date: the known open borders of the visited tiles that lead to a tile that
+was not visited yet.
+
+Run its benchmark to time the exploration of a maze
+
+    python3 -m penomazefiles.benchmarks exploration [width height]
+'''
+from .grid import OFFSETS
+from .maze import Maze
+from . import tiles
+
+
+"""states of a border"""
+UNKNOWN = 0
+WALL = 1
+OPEN = 2
+
+
+class ExplorationMap(object):
+    """
+    The known borders and tiles of a maze that is being explored.
+
+    The map stores a single int per coordinate it has heard of:
+        - bits 0 to 3: the known mask, bit d is set if the state of the border
+          in direction d is known
+        - bits 4 to 7: the wall mask, bit 4 + d is set if that border is a
+          wall
+        - bits 8 and up: the type index of the tile (see tiles.encode) once
+          the tile is visited, 0 before that
+    Both tiles that share a border are written by every observation, hence
+    they always agree about it.
+
+    The frontier is a dictionary of (coordinate, direction) pairs used as an
+    ordered set. Every observation adds or removes the few frontier borders
+    it affects, next_frontier returns the most recently found frontier
+    border.
+
+    Only visited tiles have frontier borders, hence an exploration seeds the
+    frontier by visiting its first tile. Borders observed between two tiles
+    that are not visited are remembered but don't join the frontier until
+    one of the two tiles is visited.
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._frontier = {}
+
+    def edge(self, coordinate, direction):
+        """return the state of the border of a tile: UNKNOWN, WALL or OPEN"""
+        cell = self._cells.get(coordinate, 0)
+        if not cell >> direction & 1:
+            return UNKNOWN
+        return WALL if cell >> 4 + direction & 1 else OPEN
+
+    def is_visited(self, coordinate):
+        return self._cells.get(coordinate, 0) >> 8 != 0
+
+    def observe(self, coordinate, direction, wall):
+        """
+        Record that the border of a tile in a direction is a wall or not.
+
+        An open border joins the frontier if exactly one of its two tiles is
+        visited.
+        """
+        (x, y) = coordinate
+        (dx, dy) = OFFSETS[direction]
+        neighbour = (x + dx, y + dy)
+        back = (direction + 2) % 4
+        cells = self._cells
+        a = cells.get(coordinate, 0) | 1 << direction
+        b = cells.get(neighbour, 0) | 1 << back
+        if wall:
+            (a, b) = (a | 1 << 4 + direction, b | 1 << 4 + back)
+        else:
+            (a, b) = (a & ~(1 << 4 + direction), b & ~(1 << 4 + back))
+        (cells[coordinate], cells[neighbour]) = (a, b)
+
+        # a border is a frontier border of the visited one of its two tiles
+        frontier = self._frontier
+        frontier.pop((coordinate, direction), None)
+        frontier.pop((neighbour, back), None)
+        if not wall and (a >> 8 == 0) != (b >> 8 == 0):
+            frontier[(coordinate, direction) if a >> 8 else
+                     (neighbour, back)] = None
+
+    def ingest(self, observations):
+        """Record an iterable of (coordinate, direction, wall) observations"""
+        observe = self.observe
+        for (coordinate, direction, wall) in observations:
+            observe(coordinate, direction, wall)
+
+    def visit(self, coordinate, tile):
+        """
+        Record the tile found at a coordinate, including its four walls.
+
+        The walls of the tile replace whatever was known about its borders,
+        its open borders towards tiles that are not visited yet join the
+        frontier.
+        """
+        code = tiles.encode(tile)
+        cells = self._cells
+        cells[coordinate] = cells.get(coordinate, 0) & 0xff | code >> 4 << 8
+        for direction in range(4):
+            self.observe(coordinate, direction, code >> direction & 1)
+
+    @property
+    def frontier(self):
+        """a live, read only view of the frontier borders"""
+        return self._frontier.keys()
+
+    def next_frontier(self):
+        """
+        Return the (coordinate, direction) pair of the most recently found
+        frontier border, or None once the exploration is done.
+        """
+        return next(reversed(self._frontier), None)
+
+    def visited(self):
+        """return the coordinates of the visited tiles"""
+        return [coordinate for (coordinate, cell) in self._cells.items()
+                if cell >> 8]
+
+    def to_maze(self, maze_class=Maze):
+        """
+        Return a maze holding the visited tiles.
+
+        The walls of a tile are the borders as they are known now, later
+        observations can have replaced the walls the tile was visited with.
+        A regular tile (Corner, T, ...) turns into the regular tile with those
+        walls, see EdgeMaze.
+        """
+        maze = maze_class()
+        for (coordinate, cell) in self._cells.items():
+            if cell >> 8:
+                walls = (cell >> 4 | ~cell) & 15
+                maze.add_tile(coordinate,
+                              tiles.decode(tiles.VIEW_CODES[cell >> 8 << 4 | walls]))
+        return maze
@@ -0,0 +1,276 @@
+'''
+File: export.py
+Author: Jeroen De Vlieger
+Description:
+
+Export of a Maze as a set of dense arrays.
+
+The arrays are plain byte buffers exposed as 2 dimensional memoryviews, which
+NumPy (or any other consumer of the buffer protocol) can wrap without copying
+them. They can be saved to and memory mapped from a NumPy compatible .npz file
+using only the standard library.
+'''
+import ast
+import mmap
+import struct
+import zipfile
+
+from .grid import BIT_TABLES
+from .maze import Maze
+from . import tiles
+
+"""the .npy type and the item size of each array in a saved file"""
+_DESCRS = {'codes': ('|u1', 1),
+           'walls': ('|u1', 1),
+           'present': ('|u1', 1),
+           'horizontal': ('|u1', 1),
+           'vertical': ('|u1', 1),
+           'origin': ('<i8', 8)}
+
+
+def _or_bytes(a, b):
+    """return the element wise or of two equally long byte strings"""
+    return bytearray((int.from_bytes(a, 'little') |
+                      int.from_bytes(b, 'little')).to_bytes(len(a), 'little'))
+
+
+class MazeArrays(object):
+    """
+    Dense array representation of (a rectangular part of) a Maze.
+
+    The arrays cover the rectangle of 'width' by 'height' tiles with its left
+    upper tile at coordinate 'origin'. Each array is a memoryview of unsigned
+    bytes with a 2 dimensional shape:
+
+        codes       (height, width)     tile code, see tiles.encode
+        walls       (height, width)     wall mask, see Tile.wall_mask
+        present     (height, width)     1 if there is a tile, 0 otherwise
+        horizontal  (height+1, width)   horizontal[y][x] is 1 if there is a
+                                        wall on the northern border of tile
+                                        (x,y), i.e. between (x,y-1) and (x,y)
+        vertical    (height, width+1)   vertical[y][x] is 1 if there is a wall
+                                        on the western border of tile (x,y),
+                                        i.e. between (x-1,y) and (x,y)
+
+    A border has a wall in the edge planes if at least one of the tiles
+    sharing it has a wall there. Spots without a tile have no walls.
+    """
+
+    NAMES = ('codes', 'walls', 'present', 'horizontal', 'vertical')
+
+    def __init__(self, origin, width, height, buffers):
+        """
+        Create MazeArrays from a dictionary mapping each name in NAMES to a
+        flat buffer of unsigned bytes. The buffers are not copied.
+        """
+        self.origin = tuple(origin)
+        self.width = width
+        self.height = height
+        shapes = self.shapes(width, height)
+        for name in self.NAMES:
+            setattr(self, name, memoryview(buffers[name]).cast('B', shapes[name]))
+
+    @staticmethod
+    def shapes(width, height):
+        """return the shape of each array of a width by height rectangle"""
+        return {'codes': (height, width),
+                'walls': (height, width),
+                'present': (height, width),
+                'horizontal': (height+1, width),
+                'vertical': (height, width+1)}
+
+    @classmethod
+    def from_maze(cls, maze, boundingbox=None):
+        """
+        Export a maze. The arrays cover 'boundingbox', which defaults to the
+        bounding box of the maze.
+        """
+        if boundingbox is None:
+            boundingbox = maze.get_boundingbox()
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        (width, height) = (max_x - min_x, max_y - min_y)
+
+        codes = maze.code_grid(boundingbox)
+        return cls.from_codes((min_x, min_y), width, height, codes)
+
+    @classmethod
+    def from_codes(cls, origin, width, height, codes):
+        """
+        Create MazeArrays from a flat row major buffer of tile codes. The
+        buffer is used as is, the other planes are derived from it.
+        """
+        codes = memoryview(codes).cast('B')
+        flat = codes.tobytes()
+        padding = bytes(width)
+
+        # the low 4 bits of a code are the wall mask, NO_TILE has no walls
+        (north, east, south, west) = [flat.translate(BIT_TABLES[direction])
+                                      for direction in range(4)]
+        horizontal = _or_bytes(north + padding, padding + south)
+
+        rows = range(0, width * height, width)
+        vertical = _or_bytes(
+            b''.join(west[start:start+width] + b'\0' for start in rows),
+            b''.join(b'\0' + east[start:start+width] for start in rows))
+
+        walls = 0
+        for (direction, plane) in enumerate((north, east, south, west)):
+            walls |= int.from_bytes(plane, 'little') << direction
+
+        return cls(origin, width, height,
+                   {'codes': codes,
+                    'walls': bytearray(walls.to_bytes(len(flat), 'little')),
+                    'present': bytearray(flat.translate(tiles.PRESENT)),
+                    'horizontal': horizontal,
+                    'vertical': vertical})
+
+    def to_maze(self, maze_class=Maze):
+        """Return a new maze of class 'maze_class' holding the exported tiles"""
+        flat = self.codes.cast('B', (self.width * self.height,))
+        rows = (flat[start:start + self.width]
+                for start in range(0, self.width * self.height, self.width))
+        return maze_class.from_grid(rows, self.origin, codes=True)
+
+    def as_numpy(self):
+        """
+        Return a dictionary mapping each name in NAMES to a NumPy array.
+
+        The NumPy arrays share their memory with these arrays. NumPy is only
+        needed for this method.
+        """
+        import numpy
+        arrays = {name: numpy.asarray(getattr(self, name))
+                  for name in self.NAMES}
+        arrays['origin'] = numpy.array(self.origin, dtype=numpy.int64)
+        return arrays
+
+    def save(self, path):
+        """
+        Save the arrays to an uncompressed .npz file.
+
+        The file can be read by numpy.load. The arrays are stored uncompressed
+        so they can be memory mapped by load.
+        """
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED,
+                             allowZip64=True) as archive:
+            for name in self.NAMES:
+                view = getattr(self, name)
+                _write_npy(archive, name, '|u1', view.shape, view)
+            _write_npy(archive, 'origin', '<i8', (2,),
+                       struct.pack('<2q', *self.origin))
+
+    @classmethod
+    def load(cls, path, mmap_mode=True):
+        """
+        Load arrays saved by save (or by numpy.savez with the same names).
+
+        With mmap_mode the file is memory mapped and the arrays are read only
+        views on the mapping, i.e. no data is read until it is accessed.
+
+        Raises a ValueError if an array is missing or if its type or shape
+        differs from the ones written by save. Other arrays are ignored.
+        """
+        with open(path, 'rb') as stream:
+            archive = zipfile.ZipFile(stream)
+            mapping = None
+            if mmap_mode:
+                mapping = memoryview(
+                    mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
+
+            buffers = {}
+            for info in archive.infolist():
+                name = info.filename
+                if name.endswith('.npy'):
+                    name = name[:-4]
+                if name not in _DESCRS:
+                    continue
+                if mapping is not None and \
+                   info.compress_type == zipfile.ZIP_STORED:
+                    data = _member_view(mapping, info)
+                else:
+                    data = memoryview(bytearray(archive.read(info)))
+                buffers[name] = _read_npy(data, name)
+            archive.close()
+
+        missing = set(_DESCRS).difference(buffers)
+        if missing:
+            raise ValueError('the file lacks the {:s} array(s)'.format(
+                ', '.join(sorted(missing))))
+        shapes = {name: shape for (name, (shape, data)) in buffers.items()}
+        if shapes['origin'] != (2,) or len(shapes['codes']) != 2:
+            raise ValueError('expected an origin of 2 coordinates and a 2 '
+                             'dimensional codes array')
+        origin = struct.unpack('<2q', buffers['origin'][1])
+        (height, width) = shapes['codes']
+        for (name, shape) in cls.shapes(width, height).items():
+            if shapes[name] != shape:
+                raise ValueError('expected a {!s} array of shape {!r}, not '
+                                 '{!r}'.format(name, shape, shapes[name]))
+        return cls(origin, width, height,
+                   {name: buffers[name][1] for name in cls.NAMES})
+
+
+def _write_npy(archive, name, descr, shape, data):
+    """write a single array in the .npy format to a zip archive"""
+    header = "{{'descr': '{:s}', 'fortran_order': False, 'shape': {!r}, }}" \
+             .format(descr, tuple(shape))
+    # the data must start at a multiple of 64 bytes
+    header += ' ' * (63 - (10 + len(header)) % 64) + '\n'
+    info = zipfile.ZipInfo(name + '.npy')
+    info.compress_type = zipfile.ZIP_STORED
+    with archive.open(info, 'w', force_zip64=True) as member:
+        member.write(b'\x93NUMPY\x01\x00')
+        member.write(struct.pack('<H', len(header)))
+        member.write(header.encode('latin1'))
+        member.write(memoryview(data).cast('B'))
+
+
+def _member_view(mapping, info):
+    """return a view on the data of an uncompressed member of a zip file"""
+    offset = info.header_offset
+    (name_length, extra_length) = struct.unpack(
+        '<2H', mapping[offset + 26:offset + 30])
+    start = offset + 30 + name_length + extra_length
+    return mapping[start:start + info.file_size]
+
+
+def _read_npy(data, name):
+    """
+    Return a (shape, flat buffer) tuple for the .npy file of array 'name'.
+
+    Raises a ValueError unless the file holds a C ordered array of the type
+    in _DESCRS and exactly the data of its shape.
+    """
+    if bytes(data[0:6]) != b'\x93NUMPY':
+        raise ValueError('{!s} is not a .npy file'.format(name))
+    if data[6] == 1:
+        (header_length,) = struct.unpack('<H', data[8:10])
+        start = 10
+    else:
+        (header_length,) = struct.unpack('<I', data[8:12])
+        start = 12
+    try:
+        header = ast.literal_eval(
+            bytes(data[start:start + header_length]).decode('latin1'))
+        (descr, fortran_order, shape) = (
+            header['descr'], header['fortran_order'], tuple(header['shape']))
+    except (SyntaxError, ValueError, TypeError, KeyError):
+        raise ValueError('{!s} has an invalid .npy header'.format(name))
+
+    (expected, item_size) = _DESCRS[name]
+    if descr != expected:
+        raise ValueError('expected a {!s} array of {!r}, not {!r}'.format(
+            name, expected, descr))
+    if fortran_order:
+        raise ValueError('fortran ordered arrays are not supported')
+    size = item_size
+    for dimension in shape:
+        if not isinstance(dimension, int) or dimension < 0:
+            raise ValueError('{!s} has an invalid shape {!r}'.format(
+                name, shape))
+        size *= dimension
+    data = data[start + header_length:]
+    if len(data) != size:
+        raise ValueError('expected {:d} bytes of {!s} data, not {:d}'.format(
+            size, name, len(data)))
+    return (shape, data)
@@ -0,0 +1,69 @@
+'''
+File: generator.py
+Author: Jeroen De Vlieger
+Description:
+
+Random maze generation, mainly for tests and benchmarks of the algorithms
+working on large mazes.
+'''
+import random
+
+from .maze import Maze
+from .grid import OFFSETS
+
+
+def perfect_maze(width, height, seed=None, origin=(0,0), straightness=0.0,
+                 loops=0.0, maze_class=Maze):
+    """
+    Generate a random rectangular maze of 'width' by 'height' tiles.
+
+    The maze is carved by a randomized depth first search, hence it is a
+    perfect maze: there is exactly one path between any two tiles. With
+    'straightness' the probability that a corridor continues in the same
+    direction, long Straight runs become more likely. 'loops' is the fraction
+    of the remaining inner walls that gets removed afterwards, which creates
+    cycles.
+
+    The tiles are regular tiles (Cross, T, Straight, Corner, DeadEnd), their
+    top left tile is placed at coordinate 'origin'. Return a maze of class
+    'maze_class'.
+    """
+    generator = random.Random(seed)
+    masks = [[15] * width for y in range(height)]
+
+    def open_border(x, y, direction):
+        (dx, dy) = OFFSETS[direction]
+        masks[y][x] &= ~(1 << direction)
+        masks[y + dy][x + dx] &= ~(1 << ((direction + 2) % 4))
+
+    visited = [[False] * width for y in range(height)]
+    visited[0][0] = True
+    stack = [(0, 0, None)]
+    while stack:
+        (x, y, heading) = stack[-1]
+        options = [direction for (direction, (dx, dy)) in enumerate(OFFSETS)
+                   if 0 <= x + dx < width and 0 <= y + dy < height and
+                   not visited[y + dy][x + dx]]
+        if not options:
+            stack.pop()
+            continue
+        if heading in options and generator.random() < straightness:
+            direction = heading
+        else:
+            direction = generator.choice(options)
+        (dx, dy) = OFFSETS[direction]
+        open_border(x, y, direction)
+        visited[y + dy][x + dx] = True
+        stack.append((x + dx, y + dy, direction))
+
+    if loops > 0:
+        for y in range(height):
+            for x in range(width):
+                for direction in (1, 2):
+                    (dx, dy) = OFFSETS[direction]
+                    if x + dx < width and y + dy < height and \
+                       masks[y][x] >> direction & 1 and \
+                       generator.random() < loops:
+                        open_border(x, y, direction)
+
+    return maze_class.from_grid(masks, origin)
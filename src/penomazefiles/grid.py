@@ -0,0 +1,223 @@
+'''
+File: grid.py
+Author: Jeroen De Vlieger
+Description:
+
+Module containing a compiled, dense representation of a Maze for algorithms
+that walk through the maze, e.g. simulations and path planners.
+'''
+from collections import deque
+from itertools import compress
+
+from . import tiles
+
+
+"""(dx, dy) offset of a step in the north, east, south and west direction"""
+OFFSETS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+def _lanes(codes, function):
+    """
+    return an integer with one byte lane per tile code holding function(code)
+
+    Lane i (bits 8i up to 8i+8) holds the value for codes[i]. Combining such
+    integers with bitwise operators processes all tiles at once.
+    """
+    table = bytes(function(code) if code else 0 for code in range(256))
+    return int.from_bytes(bytes(codes).translate(table), 'little')
+
+
+"""BIT_TABLES[d] translates 4 bit masks into bytes holding bit d"""
+BIT_TABLES = tuple(bytes(mask >> d & 1 for mask in range(256))
+                   for d in range(4))
+
+
+def borders(open_masks, width, height):
+    """
+    Combine the open sides of neighbouring tiles, all tiles at once.
+
+    open_masks holds a 4 bit mask per tile of a row major grid with bit d set
+    if the tile is open in direction d. Return a bytearray holding a 4 bit
+    mask per tile with bit d set if both the tile and its neighbour in
+    direction d are open on their shared border.
+    """
+    size = width * height
+    lanes = (1 << 8 * size) - 1
+    # o[d] has a 1 in the lane of every tile that is open in direction d
+    o = [int.from_bytes(bytes(open_masks).translate(BIT_TABLES[d]), 'little')
+         for d in range(4)]
+    not_last_column = int.from_bytes(
+        (b'\x01' * (width - 1) + b'\x00') * height, 'little')
+
+    east = o[1] & (o[3] >> 8) & not_last_column
+    south = o[2] & (o[0] >> 8 * width)
+    west = (east << 8) & lanes
+    north = (south << 8 * width) & lanes
+    mask = north | east << 1 | south << 2 | west << 3
+    return bytearray(mask.to_bytes(size, 'little'))
+
+
+def decode_region(boundingbox, codes):
+    """
+    Return an iterator over the (coordinate, tile) tuples of the tiles in a
+    code grid (see Maze.code_grid) covering 'boundingbox', in row major order.
+    """
+    ((min_x, min_y), (max_x, max_y)) = boundingbox
+    width = max_x - min_x
+    decode = tiles.decode
+    for y in range(max_y - min_y):
+        row = codes[y * width:(y + 1) * width]
+        for x in compress(range(width), row):
+            yield ((min_x + x, min_y + y), decode(row[x]))
+
+
+class MazeGrid(object):
+    """
+    Compiled representation of a Maze.
+
+    The bounding box of the maze is laid out as a row major grid. For each
+    cell the grid holds
+        - walls: the wall mask of the tile (see Tile.wall_mask)
+        - present: 1 if there is a tile, 0 otherwise
+        - passable: a 4 bit mask with bit d set if a robot can drive from the
+          tile into the neighbouring tile in direction d, i.e. both tiles
+          exist, neither of them has a wall on the shared border and neither
+          of them is a blocked seesaw (see tiles.OPEN_MASKS).
+    Cells without a tile have all walls set and are not passable.
+
+    The tile codes are kept in the codes attribute so that single tiles can
+    be replaced with set_tile, e.g. when a seesaw toggles.
+
+    A MazeGrid only holds bytes and can be shipped cheaply to worker
+    processes.
+    """
+
+    def __init__(self, maze, boundingbox=None):
+        if boundingbox is None:
+            boundingbox = maze.get_boundingbox()
+        ((self.min_x, self.min_y), (max_x, max_y)) = boundingbox
+        self.width = max_x - self.min_x
+        self.height = max_y - self.min_y
+        self._compile(maze.code_grid(boundingbox))
+
+    def _compile(self, codes):
+        """derive the grids from the tile codes, all tiles at once"""
+        size = self.width * self.height
+        present = _lanes(codes, lambda code: 1)
+
+        self.codes = bytearray(codes)
+        self.walls = self.codes.translate(tiles.WALL_MASKS)
+        self.present = bytearray(present.to_bytes(size, 'little'))
+        self.passable = borders(self.codes.translate(tiles.OPEN_MASKS),
+                                self.width, self.height)
+
+    def tile(self, coordinate):
+        """return a new Tile object for the tile at a coordinate, or None"""
+        if not self.contains(coordinate):
+            return None
+        return tiles.decode(self.codes[self.index(coordinate)])
+
+    def set_tile(self, coordinate, tile):
+        """
+        Replace the tile at a coordinate within the grid, None removes it.
+
+        Return the list of indices whose passable mask changed.
+        """
+        if not self.contains(coordinate):
+            raise ValueError('coordinate {!s} lies outside the grid'.format(
+                coordinate))
+        index = self.index(coordinate)
+        code = tiles.NO_TILE if tile is None else tiles.encode(tile)
+        self.codes[index] = code
+        self.walls[index] = tiles.WALL_MASKS[code]
+        self.present[index] = 1 if code else 0
+
+        (x, y) = (index % self.width, index // self.width)
+        own = tiles.OPEN_MASKS[code]
+        changed = []
+        mask = 0
+        for (direction, (dx, dy)) in enumerate(OFFSETS):
+            if not (0 <= x + dx < self.width and 0 <= y + dy < self.height):
+                continue
+            neighbour = index + self.deltas()[direction]
+            back = (direction + 2) % 4
+            open_ = own >> direction & \
+                    tiles.OPEN_MASKS[self.codes[neighbour]] >> back & 1
+            mask |= open_ << direction
+            old = self.passable[neighbour]
+            new = old & ~(1 << back) | open_ << back
+            if new != old:
+                self.passable[neighbour] = new
+                changed.append(neighbour)
+        if mask != self.passable[index]:
+            self.passable[index] = mask
+            changed.append(index)
+        return changed
+
+    def deltas(self):
+        """return the index offset of a step in each direction"""
+        return (-self.width, 1, self.width, -1)
+
+    def index(self, coordinate):
+        """return the grid index of a maze coordinate"""
+        (x, y) = coordinate
+        return (y - self.min_y) * self.width + (x - self.min_x)
+
+    def coordinate(self, index):
+        """return the maze coordinate of a grid index"""
+        return (self.min_x + index % self.width, self.min_y + index // self.width)
+
+    def contains(self, coordinate):
+        """return True if a coordinate lies within the grid"""
+        (x, y) = coordinate
+        return 0 <= x - self.min_x < self.width and \
+               0 <= y - self.min_y < self.height
+
+    def passable_indices(self):
+        """return the indices of all tiles a robot can leave"""
+        return [index for (index, mask) in enumerate(self.passable) if mask]
+
+    def neighbours(self, index):
+        """return the indices of the tiles a robot can drive to from a tile"""
+        mask = self.passable[index]
+        return [index + delta for (direction, delta) in enumerate(self.deltas())
+                if mask >> direction & 1]
+
+    def shortest_path(self, start, goal):
+        """
+        Return a shortest list of coordinates leading from coordinate 'start'
+        to coordinate 'goal', both included, using a breadth first search.
+
+        Return None if the goal can't be reached.
+        """
+        if not (self.contains(start) and self.contains(goal)):
+            return None
+        (source, target) = (self.index(start), self.index(goal))
+        if not self.present[source] or not self.present[target]:
+            return None
+
+        passable = self.passable
+        deltas = self.deltas()
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            index = queue.popleft()
+            if index == target:
+                break
+            mask = passable[index]
+            for direction in range(4):
+                if mask >> direction & 1:
+                    neighbour = index + deltas[direction]
+                    if neighbour not in parents:
+                        parents[neighbour] = index
+                        queue.append(neighbour)
+        else:
+            return None
+
+        path = []
+        index = target
+        while index is not None:
+            path.append(self.coordinate(index))
+            index = parents[index]
+        path.reverse()
+        return path
@@ -0,0 +1,298 @@
+'''
+File: hierarchical.py
+Author: Jeroen De Vlieger
+Description:
+
+Hierarchical path planning (HPA*) for very large mazes.
+
+The grid of the maze is cut into square clusters. Every tile from which a
+robot can drive into another cluster is an entrance. The abstract graph
+connects the two entrances on either side of a cluster border with an edge
+of length 1, and every two entrances of the same cluster with the length of
+the shortest path between them within the cluster. A query connects the
+start and goal to the entrances of their clusters, searches the abstract
+graph with A* and only then looks up the tiles between consecutive
+entrances. Every passage out of a cluster is an entrance, hence the abstract
+graph yields the same distances as a search through all tiles.
+
+Replacing a tile only rebuilds the clusters of the tiles whose passable mask
+changed.
+
+Run its benchmark to compare it with a tile level breadth first search
+
+    python3 -m penomazefiles.benchmarks hierarchical [width height]
+'''
+from array import array
+from collections import deque
+import heapq
+
+from .grid import MazeGrid
+
+
+"""stand-ins for the start and goal of a query in the abstract graph"""
+_START = -1
+_GOAL = -2
+
+
+class HierarchicalPlanner(object):
+    """
+    Abstract graph of the clusters of a maze.
+
+    Attributes:
+        grid         the MazeGrid of the maze
+        cluster_size width and height of a cluster in tiles
+        entrances    { cluster -> [grid index, ...] } the entrances of each
+                     cluster, clusters are numbered row major
+        edges        { entrance -> { entrance -> distance } }
+    """
+
+    def __init__(self, maze, cluster_size=16):
+        """
+        Cut a maze, or a MazeGrid, into clusters of cluster_size by
+        cluster_size tiles and compute the abstract graph.
+        """
+        if cluster_size < 1:
+            raise ValueError('the cluster size must be positive')
+        self.grid = maze if isinstance(maze, MazeGrid) else MazeGrid(maze)
+        self.cluster_size = cluster_size
+        grid = self.grid
+        self._columns = -(-grid.width // cluster_size)
+        self.cluster_of = array('l', (
+            y // cluster_size * self._columns + x // cluster_size
+            for y in range(grid.height) for x in range(grid.width)))
+        self.entrances = {}
+        self.edges = {}
+        # cached local search trees of the entrances, for refining paths
+        self._trees = {}
+        self._rebuild(range(self._columns * -(-grid.height // cluster_size)))
+
+    def _local_search(self, source):
+        """
+        Breadth first search from a grid index that stays within its cluster.
+
+        Return a { grid index -> parent grid index } dictionary of the tiles
+        reached, the order of the dictionary is the order of their distance.
+        """
+        passable = self.grid.passable
+        cluster_of = self.cluster_of
+        cluster = cluster_of[source]
+        deltas = self.grid.deltas()
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            index = queue.popleft()
+            mask = passable[index]
+            for direction in range(4):
+                if mask >> direction & 1:
+                    neighbour = index + deltas[direction]
+                    if neighbour not in parents and \
+                       cluster_of[neighbour] == cluster:
+                        parents[neighbour] = index
+                        queue.append(neighbour)
+        return parents
+
+    def _distances(self, source, targets):
+        """
+        Breadth first search from a grid index that stays within its cluster.
+
+        Return { target -> distance } of the targets in 'targets', a set of
+        grid indices, that can be reached without passing another target.
+        A target behind another target is left out, its distance follows
+        from the distances of the target in between.
+        """
+        passable = self.grid.passable
+        cluster_of = self.cluster_of
+        cluster = cluster_of[source]
+        deltas = self.grid.deltas()
+        distances = {}
+        seen = {source}
+        level = [source]
+        distance = 0
+        while level:
+            distance += 1
+            following = []
+            for index in level:
+                mask = passable[index]
+                for direction in range(4):
+                    if mask >> direction & 1:
+                        neighbour = index + deltas[direction]
+                        if neighbour not in seen and \
+                           cluster_of[neighbour] == cluster:
+                            seen.add(neighbour)
+                            if neighbour in targets:
+                                distances[neighbour] = distance
+                            else:
+                                following.append(neighbour)
+            level = following
+        return distances
+
+    def _rebuild(self, clusters):
+        """recompute the entrances and edges of a number of clusters"""
+        grid = self.grid
+        passable = grid.passable
+        cluster_of = self.cluster_of
+        deltas = grid.deltas()
+        clusters = set(clusters)
+
+        for cluster in clusters:
+            for entrance in self.entrances.pop(cluster, ()):
+                for neighbour in self.edges.pop(entrance):
+                    if cluster_of[neighbour] not in clusters:
+                        self.edges[neighbour].pop(entrance, None)
+                self._trees.pop(entrance, None)
+
+        for cluster in clusters:
+            entrances = [index for index in self._border(cluster)
+                         if any(passable[index] >> direction & 1 and
+                                cluster_of[index + deltas[direction]] !=
+                                cluster for direction in range(4))]
+            self.entrances[cluster] = entrances
+            targets = set(entrances)
+            for entrance in entrances:
+                self.edges[entrance] = self._distances(entrance, targets)
+            for entrance in entrances:
+                edges = self.edges[entrance]
+                mask = passable[entrance]
+                for direction in range(4):
+                    neighbour = entrance + deltas[direction]
+                    if mask >> direction & 1 and \
+                       cluster_of[neighbour] != cluster:
+                        edges[neighbour] = 1
+                        if cluster_of[neighbour] not in clusters:
+                            self.edges[neighbour][entrance] = 1
+
+    def _border(self, cluster):
+        """return the grid indices of the outer tiles of a cluster"""
+        grid = self.grid
+        size = self.cluster_size
+        min_x = cluster % self._columns * size
+        min_y = cluster // self._columns * size
+        max_x = min(min_x + size, grid.width) - 1
+        max_y = min(min_y + size, grid.height) - 1
+        return [y * grid.width + x
+                for y in range(min_y, max_y + 1)
+                for x in range(min_x, max_x + 1)
+                if x in (min_x, max_x) or y in (min_y, max_y)]
+
+    def set_tile(self, coordinate, tile):
+        """
+        Replace the tile at a coordinate within the grid, None removes it,
+        and rebuild the clusters it affects.
+        """
+        changed = self.grid.set_tile(coordinate, tile)
+        self._rebuild(self.cluster_of[index] for index in changed)
+
+    def _index(self, coordinate):
+        grid = self.grid
+        if not grid.contains(coordinate) or \
+           not grid.present[grid.index(coordinate)]:
+            raise ValueError('there is no tile at {!s}'.format(coordinate))
+        return grid.index(coordinate)
+
+    def _search(self, source, target):
+        """
+        A* through the abstract graph from grid index source to target.
+
+        Return (distance, [source, entrance, ..., target]) or None.
+        """
+        if source == target:
+            return (0, [source])
+        width = self.grid.width
+        (goal_x, goal_y) = (target % width, target // width)
+        edges = self.edges
+
+        entrances = set(self.entrances[self.cluster_of[source]])
+        starts = self._distances(source, entrances | {target})
+        goals = self._distances(
+            target, set(self.entrances[self.cluster_of[target]]))
+        if source in entrances:
+            starts[source] = 0
+        if target in self.edges:
+            goals[target] = 0
+
+        # the estimated distance to the goal is the manhattan distance
+        costs = {}
+        parents = {}
+        queue = []
+        for (entrance, distance) in starts.items():
+            node = _GOAL if entrance == target else entrance
+            costs[node] = distance
+            parents[node] = _START
+            heapq.heappush(queue, (distance + abs(entrance % width - goal_x) +
+                                   abs(entrance // width - goal_y), distance,
+                                   node))
+        while queue:
+            (estimate, cost, node) = heapq.heappop(queue)
+            if node == _GOAL:
+                break
+            if cost > costs[node]:
+                continue
+            if node in goals:
+                new_cost = cost + goals[node]
+                if new_cost < costs.get(_GOAL, new_cost + 1):
+                    costs[_GOAL] = new_cost
+                    parents[_GOAL] = node
+                    heapq.heappush(queue, (new_cost, new_cost, _GOAL))
+            for (neighbour, distance) in edges[node].items():
+                new_cost = cost + distance
+                if new_cost < costs.get(neighbour, new_cost + 1):
+                    costs[neighbour] = new_cost
+                    parents[neighbour] = node
+                    heapq.heappush(queue, (
+                        new_cost + abs(neighbour % width - goal_x) +
+                        abs(neighbour // width - goal_y), new_cost, neighbour))
+        else:
+            return None
+
+        nodes = [target]
+        node = parents[_GOAL]
+        while node != _START:
+            nodes.append(node)
+            node = parents[node]
+        nodes.append(source)
+        nodes.reverse()
+        return (costs[_GOAL], nodes)
+
+    def distance(self, start, goal):
+        """
+        Return the length of a shortest path from coordinate 'start' to
+        coordinate 'goal', None if the goal can't be reached.
+        """
+        result = self._search(self._index(start), self._index(goal))
+        return None if result is None else result[0]
+
+    def _segment(self, source, target):
+        """return the grid indices leading from source to target, excluded"""
+        if source in self.edges and source != target:
+            if source not in self._trees:
+                self._trees[source] = self._local_search(source)
+            parents = self._trees[source]
+        else:
+            parents = self._local_search(source)
+        if target not in parents:
+            # an edge between two clusters
+            return []
+        segment = []
+        index = parents[target]
+        while index != source:
+            segment.append(index)
+            index = parents[index]
+        segment.reverse()
+        return segment
+
+    def shortest_path(self, start, goal):
+        """
+        Return a shortest list of coordinates leading from coordinate 'start'
+        to coordinate 'goal', both included, None if the goal can't be reached.
+        """
+        result = self._search(self._index(start), self._index(goal))
+        if result is None:
+            return None
+        nodes = result[1]
+        path = [nodes[0]]
+        for (source, target) in zip(nodes, nodes[1:]):
+            if source == target:
+                continue
+            path.extend(self._segment(source, target))
+            path.append(target)
+        return [self.grid.coordinate(index) for index in path]
@@ -0,0 +1,248 @@
+'''
+File: imagerender.py
+Author: Jeroen De Vlieger
+Description:
+
+Renderers producing PNG and SVG images of a maze.
+
+Both renderers follow the AsciiArtRenderer interface, i.e. render(maze, stream)
+writes the image to the given stream. They work from tile codes and wall
+planes rather than from individual Tile objects so that large mazes can be
+rendered in a couple of seconds.
+'''
+import re
+import struct
+import zlib
+
+from .export import MazeArrays
+
+
+"""PNG palette: background, wall, missing tile, path and marker colours"""
+PALETTE = ((255, 255, 255), (0, 0, 0), (200, 200, 200), (220, 0, 0),
+           (0, 90, 220))
+(BACKGROUND, WALL, EMPTY, PATH, MARKER) = range(len(PALETTE))
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _png_chunk(stream, tag, data):
+    stream.write(struct.pack('>I', len(data)))
+    stream.write(tag)
+    stream.write(data)
+    stream.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag))))
+
+
+"""bit of the wall mask in the direction of a (dx, dy) step"""
+_DIRECTION_BITS = {(0, -1): 1, (1, 0): 2, (0, 1): 4, (-1, 0): 8}
+
+
+def _overlay(path, markers):
+    """
+    return a dictionary mapping coordinates to (connections, colour) tuples
+
+    connections is a 4 bit mask of the directions in which the path leaves
+    the tile, colour is PATH or MARKER.
+    """
+    overlay = {}
+    path = list(path or [])
+    for (index, coordinate) in enumerate(path):
+        connections = 0
+        for neighbour in path[max(index-1, 0):index] + path[index+1:index+2]:
+            (dx, dy) = (neighbour[0] - coordinate[0],
+                        neighbour[1] - coordinate[1])
+            if (dx, dy) in _DIRECTION_BITS:
+                connections |= _DIRECTION_BITS[(dx, dy)]
+        previous = overlay.get(coordinate, (0, PATH))[0]
+        overlay[coordinate] = (previous | connections, PATH)
+
+    for coordinate in markers or []:
+        overlay[coordinate] = (overlay.get(coordinate, (0, PATH))[0], MARKER)
+    return overlay
+
+
+class PngRenderer(object):
+    """
+    Render a maze to a palette based PNG image using only the standard library.
+
+    Each tile becomes a square of 'scale' by 'scale' pixels with its walls
+    drawn on the border pixels. Spots without a tile are grey.
+
+    The image is produced a band of 'band_rows' tile rows at a time and the
+    pixel rows are compressed as they are produced, hence memory use is
+    bounded by the width of the maze and not by its area.
+    """
+
+    def __init__(self, scale=8, band_rows=64, compression=1):
+        if scale < 3:
+            raise ValueError('scale must be at least 3, not {:d}'.format(scale))
+        self.scale = scale
+        self.band_rows = band_rows
+        self.compression = compression
+
+        # pixels of the top, middle and bottom rows of a tile for each code
+        self._rows = [self._tile_rows(code) for code in range(256)]
+
+    def _tile_rows(self, code):
+        scale = self.scale
+        if code == 0:
+            empty = bytes([EMPTY]) * scale
+            return (empty, empty, empty)
+
+        middle = bytearray([BACKGROUND]) * scale
+        if code & 8:
+            middle[0] = WALL
+        if code & 2:
+            middle[-1] = WALL
+        middle = bytes(middle)
+        full = bytes([WALL]) * scale
+        top = full if code & 1 else middle
+        bottom = full if code & 4 else middle
+        return (top, middle, bottom)
+
+    def render(self, maze, stream, boundingbox=None, path=None, markers=None):
+        """Render a maze as PNG image to the given binary stream
+
+        'path' is an optional sequence of coordinates drawn as a line through
+        the centre of the tiles, 'markers' an optional iterable of coordinates
+        of tiles to highlight.
+        """
+        if boundingbox is None:
+            boundingbox = maze.get_boundingbox()
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        scale = self.scale
+        width = max_x - min_x
+
+        stream.write(_PNG_SIGNATURE)
+        _png_chunk(stream, b'IHDR', struct.pack(
+            '>IIBBBBB', width * scale, (max_y - min_y) * scale, 8, 3, 0, 0, 0))
+        _png_chunk(stream, b'PLTE', b''.join(bytes(colour) for colour in PALETTE))
+
+        overlay = _overlay(path, markers)
+        overlay_rows = {}
+        for ((x, y), value) in overlay.items():
+            if min_x <= x < max_x:
+                overlay_rows.setdefault(y, []).append((x - min_x, value))
+
+        compressor = zlib.compressobj(self.compression)
+        pending = []
+        pending_size = 0
+        tops = [rows[0] for rows in self._rows]
+        middles = [rows[1] for rows in self._rows]
+        bottoms = [rows[2] for rows in self._rows]
+
+        for band_start in range(min_y, max_y, self.band_rows):
+            band_end = min(band_start + self.band_rows, max_y)
+            codes = maze.code_grid(((min_x, band_start), (max_x, band_end)))
+            for y in range(band_start, band_end):
+                row_codes = codes[(y - band_start) * width:
+                                  (y - band_start + 1) * width]
+                pixel_rows = (b''.join(map(tops.__getitem__, row_codes)),
+                              b''.join(map(middles.__getitem__, row_codes)),
+                              b''.join(map(bottoms.__getitem__, row_codes)))
+                for r in range(scale):
+                    pixels = pixel_rows[0 if r == 0 else
+                                        2 if r == scale - 1 else 1]
+                    if y in overlay_rows:
+                        pixels = self._draw_overlay(pixels, r, overlay_rows[y])
+                    data = compressor.compress(b'\0' + pixels)
+                    if data:
+                        pending.append(data)
+                        pending_size += len(data)
+                    if pending_size > 1 << 16:
+                        _png_chunk(stream, b'IDAT', b''.join(pending))
+                        pending = []
+                        pending_size = 0
+
+        pending.append(compressor.flush())
+        _png_chunk(stream, b'IDAT', b''.join(pending))
+        _png_chunk(stream, b'IEND', b'')
+
+    def _draw_overlay(self, pixels, r, tiles):
+        """draw pixel row r of the overlays of a row of tiles"""
+        scale = self.scale
+        thickness = max(1, scale // 4)
+        start = scale // 2 - thickness // 2
+        end = start + thickness
+        pixels = bytearray(pixels)
+        for (column, (connections, colour)) in tiles:
+            offset = column * scale
+            spans = []
+            if colour == MARKER and scale // 4 <= r < scale - scale // 4:
+                spans.append((scale // 4, scale - scale // 4))
+            if start <= r < end:
+                spans.append((0 if connections & 8 else start,
+                              scale if connections & 2 else end))
+            elif (r < start and connections & 1) or \
+                 (r >= end and connections & 4):
+                spans.append((start, end))
+            for (left, right) in spans:
+                pixels[offset + left:offset + right] = \
+                    bytes([colour]) * (right - left)
+        return pixels
+
+
+class SvgRenderer(object):
+    """
+    Render a maze to a SVG image.
+
+    Walls are taken from the edge planes of MazeArrays, a run of consecutive
+    walls along a grid line is written as a single line segment.
+    """
+
+    def __init__(self, scale=8):
+        self.scale = scale
+
+    def render(self, maze, stream, boundingbox=None, path=None, markers=None):
+        """Render a maze as SVG image to the given text stream
+
+        'path' is an optional sequence of coordinates drawn as a polyline
+        through the centre of the tiles, 'markers' an optional iterable of
+        coordinates of tiles to highlight.
+        """
+        arrays = MazeArrays.from_maze(maze, boundingbox)
+        (min_x, min_y) = arrays.origin
+        (width, height) = (arrays.width, arrays.height)
+        scale = self.scale
+
+        stream.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                     'width="{:d}" height="{:d}" viewBox="0 0 {:d} {:d}">\n'
+                     .format(width * scale, height * scale,
+                             width * scale, height * scale))
+        stream.write('<g stroke="black" stroke-width="1" '
+                     'stroke-linecap="square">\n')
+
+        run = re.compile(b'\x01+')
+        horizontal = arrays.horizontal.tobytes()
+        for y in range(height + 1):
+            row = horizontal[y * width:(y + 1) * width]
+            for match in run.finditer(row):
+                stream.write('<line x1="{:d}" y1="{:d}" x2="{:d}" y2="{:d}"/>\n'
+                             .format(match.start() * scale, y * scale,
+                                     match.end() * scale, y * scale))
+
+        vertical = arrays.vertical.tobytes()
+        for x in range(width + 1):
+            column = vertical[x::width + 1]
+            for match in run.finditer(column):
+                stream.write('<line x1="{:d}" y1="{:d}" x2="{:d}" y2="{:d}"/>\n'
+                             .format(x * scale, match.start() * scale,
+                                     x * scale, match.end() * scale))
+        stream.write('</g>\n')
+
+        def centre(coordinate):
+            return ((coordinate[0] - min_x + 0.5) * scale,
+                    (coordinate[1] - min_y + 0.5) * scale)
+
+        if path:
+            points = ' '.join('{:g},{:g}'.format(*centre(coordinate))
+                              for coordinate in path)
+            stream.write('<polyline points="{:s}" fill="none" '
+                         'stroke="rgb{!s}" stroke-width="{:g}"/>\n'
+                         .format(points, PALETTE[PATH], max(1, scale / 4)))
+
+        for coordinate in markers or []:
+            stream.write('<circle cx="{:g}" cy="{:g}" r="{:g}" '
+                         'fill="rgb{!s}"/>\n'.format(
+                             *centre(coordinate), scale / 4, PALETTE[MARKER]))
+
+        stream.write('</svg>\n')
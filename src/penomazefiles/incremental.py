@@ -0,0 +1,358 @@
+'''
+File: incremental.py
+Author: Jeroen De Vlieger
+Description:
+
+Incremental parsing of mazefiles that are being edited.
+
+An IncrementalMazeParser keeps the tokens of every line of the previous
+version of a mazefile. A new version is diffed against it line by line and
+only the changed lines are tokenized again. Tile coordinates are implicit in a
+mazefile, hence the tiles after a change only have to be moved if the change
+altered the number of tokens. Wall consistency is only rechecked around the
+tiles that changed, unless most of the tiles changed.
+
+Run this module to watch mazefiles and report their diagnostics on every save
+
+    python3 -m penomazefiles.incremental some.maze other.maze
+'''
+from bisect import bisect_right
+from itertools import accumulate
+from itertools import repeat
+import difflib
+import os
+import sys
+import time
+
+from .maze import Maze
+from .maze import inconsistent_borders
+from .mazefileparser import MazeTokenParser
+from .mazefileparser import SpecificationViolationError
+from .tiles import Tile
+from . import tiles
+
+
+def _tokenize(line):
+    """return the tokens of a single mazefile line"""
+    comment_start_index = line.find('#')
+    if comment_start_index != -1:
+        line = line[0:comment_start_index]
+    return line.split()
+
+
+class IncrementalMazeParser(object):
+    """
+    Parse successive versions of a mazefile into a single Maze object.
+
+    After each update the maze attribute holds the tiles of the latest
+    version. Invalid tile tokens don't abort the parse, they are reported by
+    diagnostics() and leave their coordinate empty.
+    """
+
+    def __init__(self):
+        self.maze = Maze()
+        self.width = None
+        self.height = None
+
+        self.lines = []
+        # the tokens of each line and the index of the first token of each
+        # line, _line_starts[-1] is the total number of tokens
+        self._line_tokens = []
+        self._line_starts = [0]
+
+        # problems found in the current version
+        self._dimension_error = None
+        self._token_errors = {}
+        self.inconsistent = set()
+
+    def update(self, text):
+        """
+        Parse a new version of the mazefile given as a single string.
+
+        Return the set of coordinates whose tile may have changed.
+        """
+        new_lines = text.splitlines()
+        matcher = difflib.SequenceMatcher(None, self.lines, new_lines,
+                                          autojunk=False)
+        opcodes = [opcode for opcode in matcher.get_opcodes()
+                   if opcode[0] != 'equal']
+        if not opcodes:
+            return set()
+
+        old_starts = self._line_starts
+        old_total = old_starts[-1]
+
+        # tokenize the changed lines only
+        line_tokens = []
+        shifted = False
+        for (tag, i1, i2, j1, j2) in matcher.get_opcodes():
+            if tag == 'equal':
+                line_tokens.extend(self._line_tokens[i1:i2])
+                continue
+            new_tokens = [_tokenize(line) for line in new_lines[j1:j2]]
+            line_tokens.extend(new_tokens)
+            if sum(map(len, new_tokens)) != old_starts[i2] - old_starts[i1]:
+                shifted = True
+
+        self.lines = new_lines
+        self._line_tokens = line_tokens
+        self._line_starts = [0] + list(accumulate(map(len, line_tokens)))
+
+        first = old_starts[opcodes[0][1]]
+        if first < 2 or self.width is None:
+            # the dimensions of the maze might have changed
+            return self._reparse()
+
+        if shifted:
+            # all tiles after the first change move to another coordinate
+            affected = range(first, max(old_total, self._line_starts[-1]))
+        else:
+            affected = set()
+            for (tag, i1, i2, j1, j2) in opcodes:
+                affected.update(range(self._line_starts[j1],
+                                      self._line_starts[j2]))
+        return self._update_tokens(affected)
+
+    def _reparse(self):
+        """parse all tokens from scratch"""
+        old_coordinates = {coordinate for (coordinate, tile) in self.maze}
+        self.maze = Maze()
+        self.width = None
+        self.height = None
+        self._dimension_error = None
+        self._token_errors = {}
+        self.inconsistent = set()
+
+        header = self._tokens(0, 2)
+        try:
+            if len(header) < 2:
+                raise SpecificationViolationError(
+                    'The mazefile must start with the width and height of the maze')
+            try:
+                (width, height) = (int(header[0]), int(header[1]))
+            except ValueError:
+                raise SpecificationViolationError(
+                    'The first two tokens must be integers')
+            if width <= 0 or height < 0:
+                raise SpecificationViolationError('Invalid maze dimensions')
+        except SpecificationViolationError as e:
+            self._dimension_error = str(e.args[0])
+            return old_coordinates
+
+        (self.width, self.height) = (width, height)
+        affected = self._update_tokens(range(2, self._line_starts[-1]))
+        return affected | old_coordinates
+
+    def _tokens(self, start, end):
+        """return the list of tokens with an index in range(start, end)"""
+        tokens = []
+        line = bisect_right(self._line_starts, start) - 1
+        while len(tokens) < end - start and line < len(self._line_tokens):
+            offset = max(start - self._line_starts[line], 0)
+            tokens.extend(self._line_tokens[line][offset:])
+            line += 1
+        return tokens[0:end - start]
+
+    def _update_tokens(self, indices):
+        """
+        update the tiles of the tokens with the given indices
+
+        A range of indices, i.e. a whole file or all tokens after a change of
+        the number of tokens, is added a row of tiles at a time. Other
+        indices, i.e. the tokens of in place edits, are updated one by one.
+        """
+        if isinstance(indices, range):
+            affected = self._update_rows(indices)
+        else:
+            affected = self._update_tiles(indices)
+        self._check_consistency(affected)
+        return affected
+
+    def _update_rows(self, indices):
+        """update the tiles of a range of token indices with add_code_row"""
+        total = self._line_starts[-1]
+        width = self.width
+        capacity = width * self.height
+        token_code = MazeTokenParser.token_code
+
+        (start, stop) = (max(indices.start, 2), indices.stop)
+        tokens = self._tokens(start, min(stop, total))
+        for tile_index in [tile_index for tile_index in self._token_errors
+                           if start - 2 <= tile_index < stop - 2]:
+            del self._token_errors[tile_index]
+        # the code of each distinct token and the message of invalid tokens
+        (codes, invalid) = ({}, {})
+
+        affected = set()
+        end = min(stop - 2, capacity)
+        for y in range((start - 2) // width, (end + width - 1) // width):
+            row_start = max(y * width, start - 2)
+            row_end = min((y + 1) * width, end)
+            row_tokens = tokens[row_start + 2 - start:row_end + 2 - start]
+            for token in set(row_tokens).difference(codes):
+                try:
+                    codes[token] = token_code(token)
+                except SpecificationViolationError as e:
+                    codes[token] = tiles.NO_TILE
+                    invalid[token] = str(e.args[0])
+            if invalid:
+                for (tile_index, token) in enumerate(row_tokens, row_start):
+                    if token in invalid:
+                        self._token_errors[tile_index] = invalid[token]
+
+            # spots past the last token are left without a tile
+            row = bytearray(map(codes.__getitem__, row_tokens))
+            row.extend(bytes(row_end - row_start - len(row)))
+            x0 = row_start - y * width
+            for (x, code) in enumerate(row, x0):
+                if code == tiles.NO_TILE:
+                    self.maze.remove_tile((x, y))
+            self.maze.add_code_row((x0, y), row)
+            affected.update(zip(range(x0, x0 + len(row)), repeat(y)))
+
+        # tokens beyond the tiles of the maze
+        for tile_index in range(max(start - 2, capacity), min(stop, total) - 2):
+            self._token_errors[tile_index] = 'To many tiles'
+        return affected
+
+    def _update_tiles(self, indices):
+        """update the tiles of the tokens with the given indices one by one"""
+        total = self._line_starts[-1]
+        width = self.width
+        capacity = width * self.height
+        token_code = MazeTokenParser.token_code
+
+        indices = sorted(indices)
+        tokens = self._tokens(indices[0], indices[-1] + 1) if indices else []
+        first = indices[0] if indices else 0
+
+        affected = set()
+        for index in indices:
+            tile_index = index - 2
+            coordinate = (tile_index % width, tile_index // width)
+            if index >= total or tile_index >= capacity:
+                self.maze.remove_tile(coordinate)
+                self._token_errors.pop(tile_index, None)
+                if index < total:
+                    self._token_errors[tile_index] = 'To many tiles'
+                if tile_index < capacity:
+                    affected.add(coordinate)
+                continue
+
+            affected.add(coordinate)
+            try:
+                code = token_code(tokens[index - first])
+            except SpecificationViolationError as e:
+                self.maze.remove_tile(coordinate)
+                self._token_errors[tile_index] = str(e.args[0])
+            else:
+                self.maze.add_tile(coordinate, tiles.decode(code))
+                self._token_errors.pop(tile_index, None)
+        return affected
+
+    def _check_consistency(self, coordinates):
+        """recheck the borders of the tiles at the given coordinates"""
+        if 2 * len(coordinates) >= self.width * self.height:
+            # most tiles changed, checking all borders at once is cheaper
+            self.inconsistent = inconsistent_borders(self.maze)
+            return
+        for (x, y) in coordinates:
+            self.inconsistent.discard(((x, y), Tile.EAST))
+            self.inconsistent.discard(((x, y), Tile.SOUTH))
+            self.inconsistent.discard(((x-1, y), Tile.EAST))
+            self.inconsistent.discard(((x, y-1), Tile.SOUTH))
+        self.inconsistent |= inconsistent_borders(self.maze, coordinates)
+
+    def line_number(self, token_index):
+        """return the (1 based) line number of the token with a given index"""
+        return bisect_right(self._line_starts, token_index)
+
+    def diagnostics(self):
+        """return a list of messages describing the problems of the mazefile"""
+        messages = []
+        if self._dimension_error is not None:
+            messages.append('line {:d}: {!s}'.format(
+                self.line_number(0), self._dimension_error))
+            return messages
+
+        for tile_index in sorted(self._token_errors):
+            messages.append('line {:d}: tile ({:d},{:d}): {!s}'.format(
+                self.line_number(tile_index + 2),
+                tile_index % self.width, tile_index // self.width,
+                self._token_errors[tile_index]))
+
+        for ((x, y), direction) in sorted(self.inconsistent):
+            neighbour = (x+1, y) if direction == Tile.EAST else (x, y+1)
+            messages.append(
+                'inconsistent walls between tile ({:d},{:d}) and ({:d},{:d})'
+                .format(x, y, neighbour[0], neighbour[1]))
+        return messages
+
+
+class MazeFileWatcher(object):
+    """
+    Watch a number of mazefiles and reparse them incrementally when their
+    modification time or size changes.
+    """
+
+    def __init__(self, paths):
+        self.parsers = {path: IncrementalMazeParser() for path in paths}
+        self._stamps = {}
+
+    def poll(self):
+        """
+        Check all files once.
+
+        Return a list of (path, diagnostics, seconds) tuples for the files
+        that changed, where seconds is the time it took to update the maze.
+        """
+        reports = []
+        for (path, parser) in self.parsers.items():
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                stamp = None
+                if self._stamps.get(path, 0) is not None:
+                    reports.append((path, [str(e)], 0.0))
+                self._stamps[path] = stamp
+                continue
+
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if self._stamps.get(path) == stamp:
+                continue
+            self._stamps[path] = stamp
+
+            with open(path, 'r') as stream:
+                text = stream.read()
+            start = time.perf_counter()
+            parser.update(text)
+            diagnostics = parser.diagnostics()
+            reports.append((path, diagnostics, time.perf_counter() - start))
+        return reports
+
+    def run(self, interval=0.2, stream=sys.stdout):
+        """Poll the files every 'interval' seconds and report changes"""
+        while True:
+            for (path, diagnostics, seconds) in self.poll():
+                stream.write('{!s}: {:d} problem(s), checked in {:.1f} ms\n'
+                             .format(path, len(diagnostics), seconds * 1000))
+                for message in diagnostics:
+                    stream.write('    {!s}\n'.format(message))
+                stream.flush()
+            time.sleep(interval)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='check mazefiles every time they are saved')
+    parser.add_argument('mazefiles', nargs='+')
+    parser.add_argument('--interval', type=float, default=0.2,
+                        help='polling interval in seconds')
+    args = parser.parse_args()
+
+    try:
+        MazeFileWatcher(args.mazefiles).run(args.interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,269 @@
+'''
+File: lazymaze.py
+Author: Jeroen De Vlieger
+Description:
+
+Module containing a lazy, read only Maze view of a mazefile.
+
+Opening the view scans the mazefile once to locate the start of each row of
+tiles. Tiles are only parsed when they are requested, which makes it cheap to
+inspect a few rows of a huge mazefile.
+'''
+from array import array
+from collections import OrderedDict
+import locale
+import sys
+
+from .maze import Maze
+from .mazefileparser import MazeTokenParser
+from .mazefileparser import SpecificationViolationError
+from . import tiles
+
+
+class LazyMazeFile(Maze):
+    """
+    A read only Maze backed by a mazefile on disk.
+
+    The constructor builds an index with for each row of tiles the byte
+    offset of the line holding its first tile token and the position of that
+    token within the line. get_tile reads and splits a single row, the token
+    lists of the most recently used rows are kept in a LRU cache. Only the
+    requested token is turned into a Tile object.
+
+    Tile coordinates are assigned as done by the MazeFileParser, i.e. the
+    view covers the rectangle ((0,0),(width,height)) declared by the
+    mazefile.
+    """
+
+    def __init__(self, path, cache_rows=64, encoding=None):
+        """
+        Open a view on the mazefile at 'path'. At most 'cache_rows' rows are
+        kept in memory. The tokens are decoded with 'encoding', which
+        defaults to the encoding open() uses for text files, like the
+        MazeFileTokenizer reading a file opened in text mode.
+
+        Raises a SpecificationViolationError if the maze dimensions are
+        invalid or if the file holds to many tiles.
+        """
+        # don't call Maze.__init__, this view has no use for its dictionary
+        self.path = path
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self._file = open(path, 'rb')
+        self._cache = OrderedDict()
+        self._cache_rows = cache_rows
+        try:
+            self._build_index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _build_index(self):
+        """scan the mazefile once to locate the first token of each row"""
+        self.width = None
+        self.height = None
+        self._row_offsets = array('q')
+        self._row_skips = array('l')
+
+        tile_count = 0
+        offset = 0
+        for line in self._file:
+            line_offset = offset
+            offset += len(line)
+
+            comment_start_index = line.find(b'#')
+            if comment_start_index != -1:
+                line = line[0:comment_start_index]
+            tokens = line.split()
+
+            # the first two tokens are the maze dimensions
+            skip = 0
+            while self.height is None and skip < len(tokens):
+                self._read_dimension(tokens[skip])
+                skip += 1
+
+            count = len(tokens) - skip
+            if count <= 0:
+                continue
+
+            # record every row whose first tile is on this line
+            row = -(-tile_count // self.width)
+            while row * self.width < tile_count + count:
+                self._row_offsets.append(line_offset)
+                self._row_skips.append(skip + row * self.width - tile_count)
+                row += 1
+            tile_count += count
+
+        if self.height is None:
+            raise SpecificationViolationError(
+                'The mazefile must start with the width and height of the maze')
+
+        if tile_count > self.width * self.height:
+            raise SpecificationViolationError('To many tiles')
+
+    def _read_dimension(self, token):
+        try:
+            value = int(token)
+        except ValueError:
+            print('token value: {!s}'.format(token))
+            raise SpecificationViolationError(
+                'The first two tokens must be integers')
+
+        if self.width is None:
+            if value <= 0:
+                raise SpecificationViolationError(
+                    'The maze width must be positive')
+            self.width = value
+        else:
+            if value < 0:
+                raise SpecificationViolationError(
+                    'The maze height can not be negative')
+            self.height = value
+
+    def __reduce__(self):
+        """
+        Pickle this view as the path of its mazefile, unpickling opens a new
+        view on it.
+        """
+        return (self.__class__, (self.path, self._cache_rows, self.encoding))
+
+    def close(self):
+        """Close the underlying mazefile"""
+        self._file.close()
+
+    def __del__(self):
+        # close the mazefile of a view that was never closed
+        if getattr(self, '_file', None) is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def row_tokens(self, y):
+        """
+        Return the list of tile tokens of row y.
+
+        The list is shorter than the maze width if the mazefile lacks tiles.
+        """
+        tokens = self._cache.get(y)
+        if tokens is not None:
+            self._cache.move_to_end(y)
+            return tokens
+
+        tokens = self._read_row(y)
+        self._cache[y] = tokens
+        if len(self._cache) > self._cache_rows:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def _read_row(self, y):
+        if y >= len(self._row_offsets):
+            return []
+
+        self._file.seek(self._row_offsets[y])
+        skip = self._row_skips[y]
+        tokens = []
+        while len(tokens) < self.width:
+            line = self._file.readline()
+            if not line:
+                break
+            comment_start_index = line.find(b'#')
+            if comment_start_index != -1:
+                line = line[0:comment_start_index]
+            line_tokens = line.split()
+            tokens.extend(line_tokens[skip:skip + self.width - len(tokens)])
+            skip = 0
+        # cached rows share the strings of recurring tokens
+        encoding = self.encoding
+        return [sys.intern(token.decode(encoding)) for token in tokens]
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('a LazyMazeFile is a read only view of a mazefile')
+
+    add_tile = remove_tile = add_tiles = add_code_row = _read_only
+
+    def build_spatial_index(self):
+        """iter_region only reads the rows within its box, no index needed"""
+
+    def get_tile(self, coordinate):
+        """
+        Return the tile at a given coordinate.
+
+        Return None if there is no tile at the given coordinate
+        """
+        (x, y) = coordinate
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+
+        tokens = self.row_tokens(y)
+        if x >= len(tokens):
+            return None
+        return MazeTokenParser.parse_tile_token(tokens[x])
+
+    def _wall_masks(self, xs, ys):
+        """
+        look up the cached tile code of each token, see Maze.walls_at.
+        Raises a SpecificationViolationError if a token is invalid.
+        """
+        (width, height) = (self.width, self.height)
+        code = MazeTokenParser.token_code
+        codes = bytearray(len(xs))
+        for (i, x, y) in zip(range(len(codes)), xs, ys):
+            if 0 <= x < width and 0 <= y < height:
+                tokens = self.row_tokens(y)
+                if x < len(tokens):
+                    codes[i] = code(tokens[x])
+        return codes.translate(tiles.WALL_MASKS)
+
+    def get_boundingbox(self):
+        """
+        Return the bounding box ((0,0),(width,height)) declared by the
+        mazefile.
+        """
+        return ((0, 0), (self.width, self.height))
+
+    def fork(self):
+        """
+        Return a Maze holding all tiles of this view, i.e. the whole mazefile
+        gets parsed.
+        """
+        maze = Maze()
+        for (coordinate, tile) in self:
+            maze.add_tile(coordinate, tile)
+        return maze
+
+    def snapshot(self):
+        return self.fork()
+
+    def iter_region(self, boundingbox):
+        """
+        Return an iterator over the (coordinate, tile) tuples of the tiles
+        within 'boundingbox' in row major order, see Maze.iter_region. Only
+        the rows and tokens inside the box are read and parsed.
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        (min_x, max_x) = (max(min_x, 0), min(max_x, self.width))
+        parse = MazeTokenParser.parse_tile_token
+        for y in range(max(min_y, 0), min(max_y, self.height)):
+            tokens = self.row_tokens(y)
+            for x in range(min_x, min(max_x, len(tokens))):
+                yield ((x, y), parse(tokens[x]))
+
+    def __iter__(self):
+        """return an Iterator for this maze object
+
+        The iterator traverses the maze row by row returning (coordinate, tile)
+        tuples. The rows are read without polluting the row cache.
+        """
+        parse = MazeTokenParser.parse_tile_token
+        for y in range(self.height):
+            tokens = self._cache.get(y)
+            if tokens is None:
+                tokens = self._read_row(y)
+            for (x, token) in enumerate(tokens):
+                yield ((x, y), parse(token))
+
+    def _tiles_dict(self):
+        return dict(iter(self))
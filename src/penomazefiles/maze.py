@@ -5,7 +5,17 @@ Description:
 
 Module for code related to maze files
 '''
+from array import array
+from bisect import bisect_left
+from bisect import insort
+from itertools import chain
+from itertools import groupby
+from itertools import product
+from itertools import repeat
+from operator import attrgetter
+
 from .tiles import Tile
+from . import tiles
 
 class Maze(object):
     """A Maze is a collection of 'Tile' objects
@@ -45,10 +55,22 @@ class Maze(object):
     This ensures that each coordinate can only be
     associated with one tile.
 
+    Region queries look up each coordinate of a box that holds fewer spots
+    than the maze holds tiles and scan the dictionary otherwise. A maze that
+    answers many large region queries can build an ordered spatial index
+    with build_spatial_index
+            { y -> ([x, ...], [Tile, ...]) }
+    with the x coordinates of each row in increasing order, the Tile objects
+    in the same order and the rows with tiles in _row_keys in increasing
+    order. The index is kept up to date from then on, which makes add_tile
+    and remove_tile linear in the width of a row, until drop_spatial_index is
+    called.
     """
     def __init__(self):
         super(Maze, self).__init__()
         self._maze = {}
+        self._rows = None
+        self._row_keys = None
 
     def add_tile(self, coordinate, tile):
         """Add a tile to this maze on a specific coordinate
@@ -58,6 +80,83 @@ class Maze(object):
         If a tile is already present on that coordinate then it gets replaced.
         """
         self._maze[coordinate] = tile
+        if self._rows is not None:
+            self._index_tile(coordinate, tile)
+
+    def remove_tile(self, coordinate):
+        """Remove the tile at a given coordinate, if any"""
+        if self._maze.pop(coordinate, None) is None or self._rows is None:
+            return
+        (x, y) = coordinate
+        (xs, tiles) = self._rows[y]
+        position = bisect_left(xs, x)
+        del xs[position]
+        del tiles[position]
+        if not xs:
+            del self._rows[y]
+            del self._row_keys[bisect_left(self._row_keys, y)]
+
+    def add_tiles(self, coordinates, tiles=None):
+        """Add a number of tiles to this maze at once
+
+        Either 'coordinates' is an iterable of (coordinate, tile) tuples and
+        'tiles' is None, or 'coordinates' and 'tiles' are two iterables of
+        equal length holding the coordinates and the tiles respectively.
+        Existing tiles get replaced.
+        """
+        items = coordinates if tiles is None else zip(coordinates, tiles)
+        if self._rows is not None:
+            for (coordinate, tile) in items:
+                self.add_tile(coordinate, tile)
+        else:
+            self._maze.update(items)
+
+    def add_code_row(self, coordinate, codes):
+        """Add a horizontal run of tiles given by their tile codes
+
+        The tile with code codes[i] is added at (x+i, y), where (x, y) is
+        'coordinate'. Entries equal to tiles.NO_TILE are skipped, i.e. they
+        leave the maze unchanged at their coordinate. See tiles.encode for the
+        meaning of a tile code.
+        """
+        (x, y) = coordinate
+        decode = tiles.decode
+        if self._rows is not None:
+            for (x, code) in enumerate(codes, x):
+                if code != tiles.NO_TILE:
+                    self.add_tile((x, y), decode(code))
+        elif tiles.NO_TILE not in codes:
+            self._maze.update(zip(zip(range(x, x+len(codes)), [y]*len(codes)),
+                                  map(decode, codes)))
+        else:
+            for (x, code) in enumerate(codes, x):
+                if code != tiles.NO_TILE:
+                    self._maze[(x, y)] = decode(code)
+
+    @classmethod
+    def from_grid(cls, grid, origin=(0,0), codes=False):
+        """Create a new maze from a 2 dimensional grid
+
+        'grid' is a sequence of rows, the first row is the top row of the
+        maze. Each row is a sequence of wall masks (see Tile.wall_mask) or, if
+        'codes' is True, a sequence of tile codes (see tiles.encode). A wall
+        mask is turned into the regular tile with those walls, e.g. a Corner.
+        A tile code of tiles.NO_TILE leaves the spot empty.
+
+        The first tile of the first row is placed at coordinate 'origin'.
+        """
+        maze = cls()
+        (x, y) = origin
+        for row in grid:
+            row = bytes(row)
+            if not codes:
+                if row and max(row) > 15:
+                    raise ValueError(
+                        'wall masks must be in range(16), not {:d}'.format(max(row)))
+                row = row.translate(tiles.MASK_CODES)
+            maze.add_code_row((x, y), row)
+            y += 1
+        return maze
 
     def get_tile(self, coordinate):
         """
@@ -69,6 +168,29 @@ class Maze(object):
         fallback_value = None
         return self._maze.get(coordinate,fallback_value)
 
+    def fork(self):
+        """
+        Return a copy of this maze that can be modified independently.
+
+        The tile dictionary is copied but the Tile objects are shared, hence
+        replace a tile with add_tile rather than modifying it in place. Forking
+        takes time linear in the number of tiles, use a ChunkedMaze for cheap
+        forks of large mazes.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone._maze = dict(self._maze)
+        (clone._rows, clone._row_keys) = (None, None)
+        return clone
+
+    def snapshot(self):
+        """
+        Return a snapshot of the current state of this maze.
+
+        The snapshot is a fork, i.e. neither the snapshot nor this maze is
+        affected by later calls to add_tile on the other.
+        """
+        return self.fork()
+
     def get_boundingbox(self):
         """
         compute a bounding box of the current maze.
@@ -76,9 +198,14 @@ class Maze(object):
         Returns  a tuple of coordinates (lu, rl). lu is the coordinate of the
         left upper point of the bounding box while rl is the coordinate of the
         right lower point of the bounding box
+
+        Raises a ValueError if the maze holds no tiles.
         """
         tile_iterator = iter(self)
-        (coordinate,tile) = next(tile_iterator)
+        try:
+            (coordinate,tile) = next(tile_iterator)
+        except StopIteration:
+            raise ValueError('an empty maze has no bounding box')
         assert(tile is not None)
         min_x = coordinate[0]
         max_x = min_x + 1
@@ -99,9 +226,36 @@ class Maze(object):
         return ((min_x, min_y), (max_x, max_y))
 
 
+    def code_grid(self, boundingbox=None):
+        """
+        Return the tile codes (see tiles.encode) of this maze as a bytearray
+
+        The grid covers 'boundingbox', a ((min_x, min_y), (max_x, max_y))
+        tuple that defaults to the bounding box of the maze, in row major
+        order. Spots without a tile hold tiles.NO_TILE.
+
+        Like iter_region, a box with fewer spots than the maze has tiles is
+        filled by looking up each coordinate, hence filling a large grid a
+        band of rows at a time costs about as much as filling it at once.
+        """
+        if boundingbox is None:
+            boundingbox = self.get_boundingbox()
+        ((min_x,min_y),(max_x,max_y)) = boundingbox
+        width = max_x - min_x
+        grid = bytearray(width * (max_y - min_y))
+        encode = tiles.encode
+        if len(grid) < len(self._maze):
+            for ((x, y), tile) in self.iter_region(boundingbox):
+                grid[(y - min_y) * width + x - min_x] = encode(tile)
+            return grid
+        for ((x,y),tile) in self:
+            if min_x <= x < max_x and min_y <= y < max_y:
+                grid[(y - min_y) * width + x - min_x] = encode(tile)
+        return grid
+
     def __eq__(self,other):
-        if isinstance(other,self.__class__):
-            return other._maze == self._maze
+        if isinstance(other,Maze):
+            return other._tiles_dict() == self._tiles_dict()
         else:
             return False
 
@@ -115,28 +269,291 @@ class Maze(object):
         """
         return iter(self._maze.items())
 
+    def _tiles_dict(self):
+        """return the tiles of this maze as a { (x,y) -> Tile } dictionary
+
+        Used to compare mazes with a different storage backend.
+        """
+        return self._maze
+
+    def __getstate__(self):
+        """
+        Pickle the tiles as tile codes instead of a dictionary of Tile
+        objects.
+
+        A dense maze is stored as the code grid of its bounding box, a sparse
+        one as an array of packed (x, y) coordinates and a bytes object with
+        the code of each tile. Mazes holding tiles of a type without a tile
+        code are pickled as usual.
+        """
+        try:
+            codes = bytes(map(tiles.encode, self._maze.values()))
+        except ValueError:
+            return {'_maze': self._maze}
+        if codes:
+            ((min_x, min_y), (max_x, max_y)) = boundingbox = \
+                self.get_boundingbox()
+            if (max_x - min_x) * (max_y - min_y) <= 16 * len(codes):
+                return {'origin': (min_x, min_y), 'width': max_x - min_x,
+                        'grid': self.code_grid(boundingbox)}
+        return {'coordinates': array('q', chain.from_iterable(self._maze)),
+                'codes': codes}
+
+    def __setstate__(self, state):
+        (self._rows, self._row_keys) = (None, None)
+        if 'grid' in state:
+            self._maze = {}
+            ((x, y), width, grid) = (state['origin'], state['width'],
+                                     state['grid'])
+            for row in range(0, len(grid), width):
+                self.add_code_row((x, y), grid[row:row + width])
+                y += 1
+        elif 'codes' in state:
+            coordinates = state['coordinates']
+            self._maze = dict(zip(zip(coordinates[0::2], coordinates[1::2]),
+                                  map(tiles.decode, state['codes'])))
+        else:
+            self.__dict__.update(state)
+
+    def _index_tile(self, coordinate, tile):
+        """add or replace a tile in the spatial index"""
+        (x, y) = coordinate
+        row = self._rows.get(y)
+        if row is None:
+            row = self._rows[y] = ([], [])
+            insort(self._row_keys, y)
+        (xs, tiles) = row
+        position = bisect_left(xs, x)
+        if position < len(xs) and xs[position] == x:
+            tiles[position] = tile
+        else:
+            xs.insert(position, x)
+            tiles.insert(position, tile)
+
+    def build_spatial_index(self):
+        """
+        Build the spatial index that speeds up iter_region, see Maze. The
+        index is kept up to date by later modifications of this maze.
+        """
+        rows = {}
+        for ((x, y), tile) in sorted(self._maze.items(),
+                                     key=lambda item: item[0][::-1]):
+            row = rows.get(y)
+            if row is None:
+                row = rows[y] = ([], [])
+            row[0].append(x)
+            row[1].append(tile)
+        (self._rows, self._row_keys) = (rows, sorted(rows))
+
+    def drop_spatial_index(self):
+        """Drop the spatial index, modifications no longer maintain it"""
+        (self._rows, self._row_keys) = (None, None)
+
+    def iter_region(self, boundingbox):
+        """
+        Return an iterator over the (coordinate, tile) tuples of the tiles
+        within 'boundingbox', a ((min_x, min_y), (max_x, max_y)) tuple as
+        returned by get_boundingbox, in row major order.
+
+        The cost grows with the size of the region or with the number of
+        tiles of the maze, whichever is smaller, or only with the number of
+        tiles within the region once build_spatial_index was called.
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        if self._rows is None and \
+           (max_x - min_x) * (max_y - min_y) < len(self._maze):
+            maze = self._maze
+            for y in range(min_y, max_y):
+                for x in range(min_x, max_x):
+                    tile = maze.get((x, y))
+                    if tile is not None:
+                        yield ((x, y), tile)
+            return
+        if self._rows is None:
+            for item in sorted(((coordinate, tile) for (coordinate, tile)
+                                in self._maze.items()
+                                if min_x <= coordinate[0] < max_x and
+                                min_y <= coordinate[1] < max_y),
+                               key=lambda item: item[0][::-1]):
+                yield item
+            return
+        rows = self._rows
+        keys = self._row_keys
+        for y in keys[bisect_left(keys, min_y):bisect_left(keys, max_y)]:
+            (xs, tiles) = rows[y]
+            (start, stop) = (bisect_left(xs, min_x), bisect_left(xs, max_x))
+            for (x, tile) in zip(xs[start:stop], tiles[start:stop]):
+                yield ((x, y), tile)
+
+    def iter_rows(self):
+        """
+        Return an iterator over the rows of this maze that hold tiles, from
+        top to bottom. Each row is a (y, [(x, tile), ...]) tuple with the
+        tiles of the row from left to right.
+        """
+        if next(iter(self), None) is None:
+            return
+        for (y, items) in groupby(self.iter_region(self.get_boundingbox()),
+                                  key=lambda item: item[0][1]):
+            yield (y, [(coordinate[0], tile) for (coordinate, tile) in items])
+
+    def neighbours(self, coordinate):
+        """
+        Return a list of (direction, coordinate, tile) tuples of the tiles
+        next to a coordinate, in the order north, east, south, west.
+        """
+        (x, y) = coordinate
+        neighbours = []
+        for (direction, (dx, dy)) in enumerate(((0, -1), (1, 0), (0, 1),
+                                                (-1, 0))):
+            tile = self.get_tile((x + dx, y + dy))
+            if tile is not None:
+                neighbours.append((direction, (x + dx, y + dy), tile))
+        return neighbours
+
+    def iter_edges(self):
+        """
+        Return an iterator over the borders between two touching tiles of
+        this maze, row by row. Each border is a (coordinate, direction, tile,
+        neighbour) tuple where direction is Tile.EAST or Tile.SOUTH, tile is
+        the tile at coordinate and neighbour the tile across the border.
+        """
+        (above, above_y) = ({}, None)
+        for (y, row) in self.iter_rows():
+            if above_y != y - 1:
+                above = {}
+            for (x, tile) in row:
+                neighbour = above.get(x)
+                if neighbour is not None:
+                    yield ((x, y - 1), Tile.SOUTH, neighbour, tile)
+            for ((x, tile), (next_x, next_tile)) in zip(row, row[1:]):
+                if next_x == x + 1:
+                    yield ((x, y), Tile.EAST, tile, next_tile)
+            (above, above_y) = (dict(row), y)
+
+    def walls_at(self, xs, ys):
+        """
+        Return a bytearray with the wall mask (see Tile.wall_mask) of the tile
+        at each coordinate (xs[i], ys[i]).
+
+        Spots without a tile have all walls set, as in a MazeGrid.
+        """
+        if len(xs) != len(ys):
+            raise ValueError('expected as many y as x coordinates, not {:d} '
+                             'and {:d}'.format(len(ys), len(xs)))
+        return self._wall_masks(xs, ys)
+
+    def _wall_masks(self, xs, ys):
+        """return the walls_at of coordinates that have been validated"""
+        found = map(self._maze.get, zip(xs, ys), repeat(_NO_TILE))
+        return bytearray(map(_WALL_LIST_MASKS.__getitem__,
+                             map(tuple, map(attrgetter('walls'), found))))
+
+    def is_open_batch(self, xs, ys, directions):
+        """
+        Return a bytearray holding 1 where the tile at (xs[i], ys[i]) is open
+        in direction directions[i] and 0 where it has a wall, the same as
+        Tile.is_open. Spots without a tile are never open.
+
+        The directions are validated once for the whole batch, a ValueError
+        is raised if any of them is not 0, 1, 2 or 3.
+        """
+        try:
+            directions = bytes(directions)
+        except (TypeError, ValueError):
+            raise ValueError('directions must be integers 0, 1, 2 or 3')
+        if directions and max(directions) > 3:
+            raise ValueError('directions must be 0, 1, 2 or 3, not {:d}'
+                             .format(max(directions)))
+        if len(directions) != len(xs):
+            raise ValueError('expected {:d} directions, not {:d}'.format(
+                len(xs), len(directions)))
+
+        masks = self.walls_at(xs, ys)
+        # the lanes of the masks shifted by 2 don't overlap the directions
+        keys = int.from_bytes(masks, 'little') << 2 | \
+            int.from_bytes(directions, 'little')
+        return bytearray(keys.to_bytes(len(masks), 'little')
+                         .translate(_OPEN_BITS))
+
+
+"""stand in for a missing tile in a batch query, it has all walls set"""
+_NO_TILE = tiles.Closed()
+
+"""the wall mask of each tuple of 4 wall booleans, see Tile.walls"""
+_WALL_LIST_MASKS = {walls: walls[0] | walls[1] << 1 | walls[2] << 2 |
+                    walls[3] << 3 for walls in product((False, True), repeat=4)}
+
+
+"""
+_OPEN_BITS[wall_mask << 2 | direction] is 1 if a tile with the given walls is
+open in the given direction
+"""
+_OPEN_BITS = bytes(1 ^ (key >> 2 >> (key & 3) & 1) for key in range(256))
+
+
 class AsciiArtRenderer(object):
     """docstring for AsciiArtMaze"""
 
-    def render(self,maze,stream):
-        """Render an ascii art representation of a maze to the given text stream"""
-        ((min_x,min_y),(max_x,max_y)) = maze.get_boundingbox()
+    def render(self,maze,stream,boundingbox=None):
+        """Render an ascii art representation of a maze to the given text stream
+
+        Only the tiles within 'boundingbox' are rendered, a ((min_x, min_y),
+        (max_x, max_y)) tuple as returned by Maze.get_boundingbox. The
+        bounding box of the maze is used by default.
+        """
+        if boundingbox is None:
+            boundingbox = maze.get_boundingbox()
+        ((min_x,min_y),(max_x,max_y)) = boundingbox
 
         # each tile in 8 by 5 character
+        blank = [' '*9] * 5
+        rows = groupby(_iter_region(maze, boundingbox),
+                       key=lambda item: item[0][1])
+        (row_index, row) = next(rows, (None, None))
         for major_row_index in range(min_y, max_y):
+            art = {}
+            if row_index == major_row_index:
+                art = {coordinate[0]: tile.ascii_art()
+                       for (coordinate, tile) in row}
+                (row_index, row) = next(rows, (None, None))
             for minor_row_index in range(0,5):
                 # print a line
                 for major_column_index in  range(min_x,max_x):
-                    tile = maze.get_tile((major_column_index,major_row_index))
-                    if tile is not None:
-                        stream.write(tile.ascii_art()[minor_row_index])
-                    else:
-                        stream.write(' '*9)
+                    stream.write(art.get(major_column_index, blank)
+                                 [minor_row_index])
                 # end the line with a newline
                 stream.write('\n')
 
 
 
+def _iter_region(maze, boundingbox):
+    """
+    maze.iter_region, or the same tiles read with get_tile for mazes that
+    only provide get_tile and __iter__
+    """
+    if hasattr(maze, 'iter_region'):
+        return maze.iter_region(boundingbox)
+    ((min_x, min_y), (max_x, max_y)) = boundingbox
+    return ((coordinate, tile)
+            for (coordinate, tile) in (((x, y), maze.get_tile((x, y)))
+                                       for y in range(min_y, max_y)
+                                       for x in range(min_x, max_x))
+            if tile is not None)
+
+
+def _iter_edges(maze):
+    """maze.iter_edges, or the same borders found with get_tile"""
+    if hasattr(maze, 'iter_edges'):
+        return maze.iter_edges()
+    return (((x, y), direction, tile, bordering_tile)
+            for ((x, y), tile) in iter(maze)
+            for (direction, bordering_tile) in
+            ((Tile.SOUTH, maze.get_tile((x, y + 1))),
+             (Tile.EAST, maze.get_tile((x + 1, y))))
+            if bordering_tile is not None)
+
+
 def are_walls_consistent(maze):
     """
     when two tiles touch then they should both have a wall or both be open.
@@ -145,31 +562,54 @@ def are_walls_consistent(maze):
     Return False if any two touching tiles are inconsistent. Return True otherwise
     """
     
-    # check South and East border of each Tile
-    for ((x,y), current_tile) in iter(maze):
-
-        # check to the South of the current tile
-        bordering_tile = maze.get_tile((x,y+1))
-        if bordering_tile is None:
-            # if there is no bordering tile then there can't be any consistency
-            # problems :-)
-            pass
-        else:
-            if bordering_tile.has_wall(Tile.NORTH) !=  \
-               current_tile.has_wall(Tile.SOUTH):
-                return False
-
-        # check to the East of the current tile
-        bordering_tile = maze.get_tile((x+1,y))
-        if bordering_tile is None:
-            # if there is no bordering tile then there can't be any consistency
-            # problems :-)
-            pass
-        else:
-            if bordering_tile.has_wall(Tile.WEST) != \
-               current_tile.has_wall(Tile.EAST):
-                return False
-
+    # check the South and East border of each Tile that touches another one
+    for (coordinate, direction, current_tile, bordering_tile) in \
+            _iter_edges(maze):
+        if bordering_tile.has_wall((direction + 2) % 4) != \
+           current_tile.has_wall(direction):
+            return False
 
     # all tiles are consistent
     return True
+
+
+def inconsistent_borders(maze, coordinates=None):
+    """
+    Return the set of borders where two touching tiles are inconsistent.
+
+    A border is identified by the (coordinate, direction) tuple of the tile
+    to the west or north of it, i.e. direction is Tile.EAST or Tile.SOUTH.
+
+    If 'coordinates' is given only the borders of the tiles at those
+    coordinates are checked, otherwise all borders of the maze are checked.
+    """
+    if coordinates is None:
+        return {(coordinate, direction)
+                for (coordinate, direction, tile, bordering_tile)
+                in _iter_edges(maze)
+                if bordering_tile.has_wall((direction + 2) % 4) !=
+                tile.has_wall(direction)}
+
+    borders = set()
+    for (x,y) in coordinates:
+        # the west and north border of a tile are the east and south border
+        # of its neighbours
+        for (coordinate, direction) in (((x,y), Tile.EAST),
+                                        ((x,y), Tile.SOUTH),
+                                        ((x-1,y), Tile.EAST),
+                                        ((x,y-1), Tile.SOUTH)):
+            if (coordinate, direction) in borders:
+                continue
+            current_tile = maze.get_tile(coordinate)
+            if current_tile is None:
+                continue
+            if direction == Tile.EAST:
+                bordering_tile = maze.get_tile((coordinate[0]+1,coordinate[1]))
+            else:
+                bordering_tile = maze.get_tile((coordinate[0],coordinate[1]+1))
+            if bordering_tile is None:
+                continue
+            if bordering_tile.has_wall((direction + 2) % 4) != \
+               current_tile.has_wall(direction):
+                borders.add((coordinate, direction))
+    return borders
@@ -15,7 +15,8 @@ the presence of an object.
 see Toledo for specifications of mazefiles
 '''
 from .maze import Maze
-import copy
+from . import tiles
+import sys
 
 def MazeFileBuilder(stream):
     """
@@ -245,15 +246,14 @@ class MazeTokenParser(object):
 
     _maze = None
 
-    # dictionary of valid tile tokens mapped to actual tiles
-    from . import tiles
-    _TILES = {'Straight': tiles.Straight(),
-              'Corner': tiles.Corner(),
-              'T': tiles.T(),
-              'DeadEnd':tiles.DeadEnd(),
-              'Cross':tiles.Cross(),
-              'Closed':tiles.Closed(),
-              'Seesaw':tiles.Seesaw()}
+    # dictionary of valid tile tokens mapped to their tile class
+    _TILE_TYPES = {'Straight': tiles.Straight,
+                   'Corner': tiles.Corner,
+                   'T': tiles.T,
+                   'DeadEnd': tiles.DeadEnd,
+                   'Cross': tiles.Cross,
+                   'Closed': tiles.Closed,
+                   'Seesaw': tiles.Seesaw}
 
 
     # dictionary of valid orientation tokens mapped to the required number or
@@ -263,21 +263,88 @@ class MazeTokenParser(object):
                   'S': 2,
                   'W': 3}
 
+    # table of tile tokens mapped to their tile code. It is compiled on first
+    # use with every tile and orientation token pair. Tokens with extra parts
+    # such as a barcode are never added, they are parsed on every use.
+    _TOKEN_CODES = None
+
     def __init__(self):
         """docstring for # TODO: write """
         self._maze= Maze()
 
+        # tile codes of the current row that still need to be added to the
+        # maze, starting at coordinate _row_start
+        self._row_start = None
+        self._row_codes = bytearray()
+
 
     def getMaze(self):
         """
         Return the maze object
         """
+        self._commit_row()
         return self._maze
 
     def consume(self,token):
-        coordinate = token[0]
-        token = token[1]
+        """
+        Consume a (coordinate, token) tuple.
+
+        Tiles are added to the maze a row at a time. Consecutive tiles on a row
+        are collected as tile codes and committed in a single add_code_row
+        call once the row is complete.
+        """
+        (x, y) = token[0]
+        code = (self._TOKEN_CODES or self._compile_token_codes()).get(token[1])
+        if code is None:
+            code = self.token_code(token[1])
+
+        if self._row_start is None or \
+           self._row_start[1] != y or \
+           self._row_start[0] + len(self._row_codes) != x:
+            self._commit_row()
+            self._row_start = (x, y)
+        self._row_codes.append(code)
+
+    def _commit_row(self):
+        if self._row_codes:
+            self._maze.add_code_row(self._row_start, self._row_codes)
+        self._row_start = None
+        self._row_codes = bytearray()
+
+    @classmethod
+    def _compile_token_codes(cls):
+        """build the table of the tile codes of all plain tile tokens"""
+        codes = {}
+        for (name, tile_type) in cls._TILE_TYPES.items():
+            for (orientation, rotations) in cls._ROTATIONS.items():
+                token = sys.intern('{:s}.{:s}'.format(name, orientation))
+                codes[token] = tiles.encode(tile_type(rotations))
+        cls._TOKEN_CODES = codes
+        return codes
+
+    @classmethod
+    def token_code(cls,token):
+        """
+        Return the tile code (see tiles.encode) of a single tile token.
 
+        Raises a SpecificationViolationError if the token is invalid.
+        """
+        codes = cls._TOKEN_CODES
+        if codes is None:
+            codes = cls._compile_token_codes()
+        code = codes.get(token)
+        if code is None:
+            # tokens with extra parts are not added to the table, it would
+            # grow with every barcode or marker ever read
+            code = cls._unknown_token_code(token)
+        return code
+
+    @classmethod
+    def _unknown_token_code(cls,token):
+        """
+        Return the tile code of a token that is not in the table, i.e. a
+        token with extra parts or an invalid token.
+        """
         tokenparts = token.split('.')
 
         try: 
@@ -285,17 +352,12 @@ class MazeTokenParser(object):
                 raise SpecificationViolationError(
                     'Each tile token must consist of at least a tile and an orientation seperated by a point')
 
-            try:
-                tile = self._TILES[tokenparts[0]]
-            except KeyError:
+            if tokenparts[0] not in cls._TILE_TYPES:
                 raise SpecificationViolationError(
                         "Invalid tile token '{:s}'".format(tokenparts[0]))
-            else:
-                #todo: replace with a proper Tile specific deepcopy routine
-                tile = copy.deepcopy(tile)
 
             try:
-                rotations = self._ROTATIONS[tokenparts[1]]
+                return cls._TOKEN_CODES['.'.join(tokenparts[0:2])]
             except KeyError as e:
                 raise SpecificationViolationError(
                         "Invalid Orientation Token '{:s}'".format(tokenparts[1])) from e
@@ -304,5 +366,11 @@ class MazeTokenParser(object):
             print('token value: {:s}'.format(token))
             raise
 
-        self._maze.add_tile(coordinate,tile.rotate(rotations))
+    @classmethod
+    def parse_tile_token(cls,token):
+        """
+        Return a new Tile object for a single tile token, e.g. 'Corner.E'
 
+        Raises a SpecificationViolationError if the token is invalid.
+        """
+        return tiles.decode(cls.token_code(token))
@@ -0,0 +1,491 @@
+'''
+File: mazeserver.py
+Author: Jeroen De Vlieger
+Description:
+
+A local server that parses mazefiles once and serves them to other processes.
+
+The server keeps the most recently requested mazes in a LRU cache, in the
+compact binary form described below, and reparses a file when it changed on
+disk. Clients can subscribe to a mazefile to be notified when it changes.
+
+The protocol is line based, every request is a single line:
+
+    GET <path>        answered by 'OK <length>' followed by <length> bytes of
+                      maze data, or by 'ERR <message>'
+    SUBSCRIBE <path>  answered by 'OK 0', afterwards the server sends a line
+                      'CHANGED <path>' every time the mazefile changes
+
+Maze data is a header of 4 little endian signed 64 bit integers: min_x,
+min_y, width and height of the bounding box of the maze, followed by its
+tile codes in row major order (see Maze.code_grid).
+
+Run this module to start a server
+
+    python3 -m penomazefiles.mazeserver --socket /tmp/mazes.sock
+'''
+from collections import OrderedDict
+import contextlib
+import io
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from .maze import Maze
+from .mazefileparser import MazeFileBuilder
+
+
+_HEADER = struct.Struct('<qqqq')
+
+"""
+The parser prints its diagnostics, which must not end up on the stdout of the
+server. redirect_stdout replaces sys.stdout for all threads at once, hence
+the parses that redirect it take turns.
+"""
+_PARSE_LOCK = threading.Lock()
+
+
+def encode_maze(maze):
+    """return the maze data of a maze, see the module description"""
+    if next(iter(maze), None) is None:
+        return _HEADER.pack(0, 0, 0, 0)
+    boundingbox = maze.get_boundingbox()
+    ((min_x, min_y), (max_x, max_y)) = boundingbox
+    return _HEADER.pack(min_x, min_y, max_x - min_x, max_y - min_y) + \
+        bytes(maze.code_grid(boundingbox))
+
+
+def decode_maze(data, maze_class=Maze):
+    """return a new maze of class 'maze_class' holding the tiles of maze data"""
+    (min_x, min_y, width, height) = _HEADER.unpack_from(data)
+    codes = memoryview(data)[_HEADER.size:]
+    rows = [codes[y * width:(y + 1) * width] for y in range(height)]
+    return maze_class.from_grid(rows, (min_x, min_y), codes=True)
+
+
+def _stamp(path):
+    """return a value that changes when the file at a path is modified"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class MazeServerError(Exception):
+    """Error reported by a MazeServer, e.g. an invalid mazefile"""
+
+
+class _MazeRequestHandler(socketserver.StreamRequestHandler):
+    """Serve the requests of a single connection until it is closed"""
+
+    def setup(self):
+        super().setup()
+        # notifications are written from the watcher thread
+        self.lock = threading.Lock()
+
+    def handle(self):
+        server = self.server.maze_server
+        for line in self.rfile:
+            (command, _, path) = line.decode('utf-8').rstrip('\r\n') \
+                .partition(' ')
+            try:
+                if command == 'GET':
+                    self.send('OK', server.get(path))
+                elif command == 'SUBSCRIBE':
+                    server.subscribe(path, self)
+                    self.send('OK', b'')
+                else:
+                    raise MazeServerError(
+                        'unknown command {!r}'.format(command))
+            except Exception as e:
+                # whatever goes wrong with one request, answer it and keep
+                # serving the connection
+                message = str(e) or e.__class__.__name__
+                self.send('ERR', message.replace('\n', ' ').encode('utf-8'))
+
+    def send(self, status, payload):
+        with self.lock:
+            if status == 'ERR':
+                self.wfile.write(b'ERR ' + payload + b'\n')
+            else:
+                self.wfile.write('OK {:d}\n'.format(len(payload))
+                                 .encode('ascii') + payload)
+            self.wfile.flush()
+
+    def notify(self, path):
+        with self.lock:
+            self.wfile.write('CHANGED {!s}\n'.format(path).encode('utf-8'))
+            self.wfile.flush()
+
+    def finish(self):
+        self.server.maze_server.unsubscribe(self)
+        super().finish()
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _ThreadingUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class MazeServer(object):
+    """
+    Server parsing mazefiles on request, see the module description.
+
+    'address' is either the path of a Unix socket or a (host, port) tuple of
+    a TCP socket, a port of 0 picks a free port (see the address attribute).
+    At most 'cache_size' parsed mazes are kept in memory. Subscribed files
+    are checked for modifications every 'poll_interval' seconds.
+
+    Only the files within the directory 'root', the current working
+    directory by default, are served. Relative paths are relative to it.
+    """
+
+    def __init__(self, address, cache_size=16, poll_interval=0.5, root=None):
+        if isinstance(address, str):
+            self._server = _ThreadingUnixServer(address, _MazeRequestHandler)
+        else:
+            self._server = _ThreadingTCPServer(address, _MazeRequestHandler)
+        self._server.maze_server = self
+        self.address = self._server.server_address
+        self.cache_size = cache_size
+        self.poll_interval = poll_interval
+        self.root = os.path.realpath(os.getcwd() if root is None else root)
+
+        self._lock = threading.Lock()
+        # { path -> (stamp, maze data) } in least recently used order
+        self._cache = OrderedDict()
+        # { path -> set of handlers }, and the last seen stamp of each path
+        self._subscribers = {}
+        self._stamps = {}
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def _resolve(self, path):
+        """return the real path of a requested file within the root"""
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            raise MazeServerError(
+                '{!s} lies outside the served directory'.format(path))
+        return resolved
+
+    def get(self, path):
+        """
+        Return the maze data of the mazefile at a path, parsing it only if it
+        is not cached or changed since it was parsed.
+        """
+        path = self._resolve(path)
+        stamp = _stamp(path)
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._cache.move_to_end(path)
+                return entry[1]
+
+        # parse without holding the lock, other requests go on meanwhile
+        with open(path, 'r') as stream, _PARSE_LOCK, \
+                contextlib.redirect_stdout(io.StringIO()):
+            data = encode_maze(MazeFileBuilder(stream))
+        with self._lock:
+            self._cache[path] = (stamp, data)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+    def subscribe(self, path, handler):
+        """send a notification to a handler every time a mazefile changes"""
+        path = self._resolve(path)
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            stamp = None
+        with self._lock:
+            if path not in self._subscribers:
+                self._subscribers[path] = set()
+                self._stamps[path] = stamp
+            self._subscribers[path].add(handler)
+
+    def unsubscribe(self, handler):
+        """stop all notifications to a handler"""
+        with self._lock:
+            for path in list(self._subscribers):
+                self._subscribers[path].discard(handler)
+                if not self._subscribers[path]:
+                    del self._subscribers[path]
+                    del self._stamps[path]
+
+    def check(self):
+        """
+        Check the subscribed mazefiles once, drop the changed ones from the
+        cache and notify their subscribers. Return the changed paths.
+        """
+        with self._lock:
+            watched = list(self._stamps.items())
+        changed = []
+        for (path, old) in watched:
+            try:
+                stamp = _stamp(path)
+            except OSError:
+                stamp = None
+            if stamp == old:
+                continue
+            with self._lock:
+                if path not in self._stamps:
+                    continue
+                self._stamps[path] = stamp
+                self._cache.pop(path, None)
+                handlers = list(self._subscribers[path])
+            changed.append(path)
+            for handler in handlers:
+                try:
+                    handler.notify(path)
+                except OSError:
+                    # the connection is gone, finish() unsubscribes it
+                    pass
+        return changed
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            self.check()
+
+    def serve_forever(self):
+        """Serve requests and watch the subscribed files until shutdown"""
+        watcher = threading.Thread(target=self._watch, daemon=True)
+        watcher.start()
+        self._threads.append(watcher)
+        self._server.serve_forever(min(self.poll_interval, 0.5))
+
+    def start(self):
+        """Serve requests in a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def shutdown(self):
+        """Stop serving and close the socket"""
+        self._stopped.set()
+        if self._threads:
+            self._server.shutdown()
+        self._server.server_close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+def _connect(address, timeout):
+    """return a socket connected to a MazeServer"""
+    if not isinstance(address, str):
+        return socket.create_connection(address, timeout)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        connection.connect(address)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+class _Connection(object):
+    """a connection of a MazeClient to a MazeServer"""
+
+    def __init__(self, address, timeout):
+        self.socket = _connect(address, timeout)
+        self.rfile = self.socket.makefile('rb')
+
+    def request(self, command, path):
+        """send a request and return the (status, payload) of the answer"""
+        self.socket.sendall('{:s} {:s}\n'.format(command, path).encode('utf-8'))
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError('the maze server closed the connection')
+        (status, _, value) = line.decode('utf-8').rstrip('\n').partition(' ')
+        if status != 'OK':
+            return (status, value)
+        length = int(value)
+        payload = self.rfile.read(length)
+        if len(payload) != length:
+            raise ConnectionError('the maze server closed the connection')
+        return (status, payload)
+
+    def close(self):
+        self.rfile.close()
+        self.socket.close()
+
+
+class Subscription(object):
+    """
+    Notifications about a mazefile, see MazeClient.subscribe. Each
+    subscription has a connection of its own.
+    """
+
+    def __init__(self, address, path, timeout):
+        self.path = path
+        self._socket = _connect(address, timeout)
+        self._buffer = b''
+        try:
+            self._socket.sendall('SUBSCRIBE {:s}\n'.format(path).encode(
+                'utf-8'))
+            line = self._read_line(timeout)
+            if line is None:
+                raise socket.timeout('the maze server did not answer')
+        except Exception:
+            self._socket.close()
+            raise
+        (status, _, value) = line.partition(' ')
+        if status != 'OK':
+            self._socket.close()
+            raise MazeServerError(value)
+
+    def _read_line(self, timeout):
+        """return the next line sent by the server, or None after a timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b'\n' not in self._buffer:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._socket.settimeout(remaining)
+            else:
+                self._socket.settimeout(None)
+            try:
+                data = self._socket.recv(4096)
+            except socket.timeout:
+                return None
+            if not data:
+                raise ConnectionError('the maze server closed the connection')
+            self._buffer += data
+        (line, _, self._buffer) = self._buffer.partition(b'\n')
+        return line.decode('utf-8')
+
+    def wait(self, timeout=None):
+        """
+        Wait until the mazefile changes and return its path as seen by the
+        server. Return None if it did not change within 'timeout' seconds.
+        """
+        line = self._read_line(timeout)
+        return None if line is None else line.partition(' ')[2]
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MazeClient(object):
+    """
+    Client of a MazeServer keeping a pool of up to 'pool_size' idle
+    connections, which can be used by several threads at once.
+
+    Paths are sent as given, the server resolves relative paths against the
+    directory it serves.
+    """
+
+    def __init__(self, address, pool_size=4, timeout=30.0):
+        self.address = address
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _acquire(self):
+        """return (connection, reused)"""
+        try:
+            return (self._pool.get_nowait(), True)
+        except queue.Empty:
+            return (_Connection(self.address, self.timeout), False)
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _request(self, command, path):
+        while True:
+            (connection, reused) = self._acquire()
+            try:
+                answer = connection.request(command, path)
+            except (OSError, ConnectionError):
+                connection.close()
+                if reused:
+                    # the server might have closed an idle connection, retry
+                    # on a new one
+                    continue
+                raise
+            self._release(connection)
+            (status, payload) = answer
+            if status != 'OK':
+                raise MazeServerError(payload)
+            return payload
+
+    def get_maze(self, path, maze_class=Maze):
+        """
+        Return a new maze of class 'maze_class' holding the tiles of the
+        mazefile at a path. A ChunkedMaze is built straight from the maze
+        data, a Maze needs a Tile object per tile.
+
+        Raises a MazeServerError if the server can't parse the file.
+        """
+        return decode_maze(self._request('GET', path), maze_class)
+
+    def subscribe(self, path):
+        """
+        Return a Subscription to the changes of the mazefile at a path.
+        """
+        return Subscription(self.address, path, self.timeout)
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='serve parsed mazefiles to local processes')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--socket', help='path of the Unix socket')
+    group.add_argument('--port', type=int, help='TCP port on localhost')
+    parser.add_argument('--cache-size', type=int, default=16,
+                        help='number of parsed mazes kept in memory')
+    parser.add_argument('--interval', type=float, default=0.5,
+                        help='polling interval of subscribed files in seconds')
+    parser.add_argument('--root', default='.',
+                        help='directory holding the mazefiles to serve')
+    args = parser.parse_args()
+
+    address = args.socket if args.socket else ('127.0.0.1', args.port)
+    server = MazeServer(address, args.cache_size, args.interval, args.root)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
@@ -0,0 +1,273 @@
+'''
+File: merging.py
+Author: Jeroen De Vlieger
+Description:
+
+Merging of partial mazes that were explored in different coordinate frames,
+e.g. by several robots.
+
+Two mazes are aligned by cross-correlating their wall planes. Every border of
+a tile contributes +1 if there is a wall, -1 if it is known to be open and 0
+if neither maze has a tile on either side of it. The correlation at a
+translation is the number of borders both mazes agree on minus the number of
+borders they disagree on, the best translation is the one with the highest
+correlation.
+
+The correlation at all translations at once is a single product of two
+polynomials, one per maze, holding the plane values as coefficients. The
+product is computed by Kronecker substitution: the coefficients are written
+as fixed width lanes of digits of a decimal.Decimal, whose multiplication of
+huge numbers is a number theoretic transform, i.e. a FFT over integers.
+'''
+import decimal
+
+from .grid import BIT_TABLES
+from . import tiles
+
+
+"""exact arithmetic on numbers with millions of digits"""
+_CONTEXT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX,
+                           Emin=decimal.MIN_EMIN)
+
+"""translate 0/1 bytes into the digits '0'/'1'"""
+_DIGITS = bytes(range(48, 50)) + bytes(254)
+
+
+class Alignment(object):
+    """
+    Transformation of the coordinate frame of a maze into the frame of a
+    reference maze: first 'rotation' rotations (see Tile.rotate) around the
+    origin, then a translation by 'offset'.
+
+    The score is the correlation of the wall planes of both mazes (see the
+    module description) after the transformation.
+    """
+
+    def __init__(self, rotation, offset, score):
+        self.rotation = rotation
+        self.offset = offset
+        self.score = score
+
+    def transform(self, coordinate):
+        """return a coordinate of the maze in the frame of the reference"""
+        (x, y) = coordinate
+        for rotation in range(self.rotation):
+            # a rotation turns the north direction into the east direction
+            (x, y) = (-y, x)
+        return (x + self.offset[0], y + self.offset[1])
+
+    def transform_tile(self, tile):
+        """return a rotated copy of a tile of the maze"""
+        return tiles.decode(tiles.encode(tile)).rotate(self.rotation)
+
+    def __eq__(self, other):
+        return isinstance(other, Alignment) and \
+            (self.rotation, self.offset, self.score) == \
+            (other.rotation, other.offset, other.score)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'Alignment(rotation={:d}, offset={!s}, score={:d})'.format(
+            self.rotation, self.offset, self.score)
+
+
+class _CodeGrid(object):
+    """the tile codes of the bounding box of a maze"""
+
+    def __init__(self, origin, width, height, codes):
+        self.origin = origin
+        self.width = width
+        self.height = height
+        self.codes = bytes(codes)
+
+    @classmethod
+    def from_maze(cls, maze):
+        if next(iter(maze), None) is None:
+            return None
+        boundingbox = maze.get_boundingbox()
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        return cls((min_x, min_y), max_x - min_x, max_y - min_y,
+                   maze.code_grid(boundingbox))
+
+    def rotate(self):
+        """return the grid rotated once, see Alignment"""
+        (width, height) = (self.width, self.height)
+        codes = b''.join(self.codes[column::width][::-1]
+                         for column in range(width))
+        (min_x, min_y) = self.origin
+        return _CodeGrid((-(min_y + height - 1), min_x), height, width,
+                         codes.translate(tiles.ROTATE_CODES))
+
+    def rows(self):
+        width = self.width
+        return [self.codes[y * width:(y + 1) * width]
+                for y in range(self.height)]
+
+    def planes(self):
+        """
+        Return the (wall, open) planes of the horizontal and the vertical
+        borders as a list of two tuples of bytes objects.
+
+        Both planes have height+1 rows of width+1 values, such that the
+        border above (horizontal) or left of (vertical) the tile at (x, y)
+        is at index y*(width+1) + x. The last column of the horizontal plane
+        and the last row of the vertical plane are 0.
+        """
+        (width, height) = (self.width, self.height)
+        stride = width + 1
+        # the codes with an empty column appended to each row and an empty
+        # row appended to the grid
+        codes = b''.join(row + b'\0' for row in self.rows()) + bytes(stride)
+        lanes = 8 * stride * (height + 1)
+
+        def plane(table):
+            return int.from_bytes(codes.translate(table), 'little')
+
+        # the low 4 bits of a code are the wall mask, NO_TILE has no walls
+        (north, east, south, west) = [plane(table) for table in BIT_TABLES]
+        present = plane(tiles.PRESENT)
+
+        horizontal_wall = north | south << 8 * stride
+        horizontal_known = present | present << 8 * stride
+        vertical_wall = west | east << 8
+        vertical_known = present | present << 8
+
+        planes = []
+        for (wall, known) in ((horizontal_wall, horizontal_known),
+                              (vertical_wall, vertical_known)):
+            wall &= (1 << lanes) - 1
+            known &= (1 << lanes) - 1
+            planes.append((wall.to_bytes(lanes // 8, 'little'),
+                           (known & ~wall).to_bytes(lanes // 8, 'little')))
+        # borders beyond the grid get nothing from the padding
+        return planes
+
+
+def _polynomial(plane, width, height, stride, digits, reverse):
+    """
+    Return the plane (see _CodeGrid.planes) as a decimal number with a lane
+    of 'digits' digits per value, row y starting at lane y*stride.
+
+    If reverse is True the order of the values is reversed, i.e. the plane
+    is rotated by 180 degrees.
+    """
+    rows = [plane[y * width:(y + 1) * width] for y in range(height)]
+    if reverse:
+        rows = [row[::-1] for row in reversed(rows)]
+    padding = bytes(stride - width)
+    values = b''.join(row + padding for row in rows)
+    # the most significant lane comes first in the digit string
+    text = bytearray(b'0') * (len(values) * digits)
+    text[digits - 1::digits] = values[::-1].translate(_DIGITS)
+    return decimal.Decimal(text.decode('ascii'))
+
+
+def _correlate(reference, other):
+    """
+    Return (score, (dx, dy)) of the best translation of the grid 'other' onto
+    the grid 'reference', in coordinates relative to the origins of the
+    grids.
+    """
+    (width, height) = (reference.width + 1, reference.height + 1)
+    (other_width, other_height) = (other.width + 1, other.height + 1)
+    stride = width + other_width - 1
+    lags = stride * (height + other_height - 1)
+    # the correlation can't exceed the number of borders
+    bound = 2 * min(width * height, other_width * other_height)
+    digits = len(str(2 * bound)) + 1
+
+    total = decimal.Decimal(0)
+    for ((wall, open_), (other_wall, other_open)) in \
+            zip(reference.planes(), other.planes()):
+        a = _CONTEXT.subtract(
+            _polynomial(wall, width, height, stride, digits, False),
+            _polynomial(open_, width, height, stride, digits, False))
+        b = _CONTEXT.subtract(
+            _polynomial(other_wall, other_width, other_height, stride, digits,
+                        True),
+            _polynomial(other_open, other_width, other_height, stride, digits,
+                        True))
+        total = _CONTEXT.add(total, _CONTEXT.multiply(a, b))
+
+    # add half the lane range to every lane so that all lanes are positive,
+    # lanes then compare as strings
+    half = '5' + '0' * (digits - 1)
+    total = _CONTEXT.add(total, decimal.Decimal(half * lags))
+    text = str(total).rjust(lags * digits, '0')
+    lanes = [text[i:i + digits] for i in range(0, len(text), digits)]
+    best = max(lanes)
+    # lanes are in order of decreasing lag index
+    index = lags - 1 - lanes.index(best)
+    (row, column) = divmod(index, stride)
+    score = int(best) - int(half)
+    return (score, (column - (other_width - 1), row - (other_height - 1)))
+
+
+def align(reference, other, rotations=False):
+    """
+    Return the Alignment of maze 'other' onto maze 'reference' with the
+    highest score, or None if either maze has no tiles.
+
+    Only translations are considered unless 'rotations' is True.
+    """
+    reference_grid = _CodeGrid.from_maze(reference)
+    grid = _CodeGrid.from_maze(other)
+    if reference_grid is None or grid is None:
+        return None
+
+    best = None
+    for rotation in range(4 if rotations else 1):
+        if rotation:
+            grid = grid.rotate()
+        (score, (dx, dy)) = _correlate(reference_grid, grid)
+        if best is None or score > best.score:
+            offset = (reference_grid.origin[0] - grid.origin[0] + dx,
+                      reference_grid.origin[1] - grid.origin[1] + dy)
+            best = Alignment(rotation, offset, score)
+    return best
+
+
+def merge(reference, other, alignment=None, rotations=False):
+    """
+    Merge maze 'other' into a copy of maze 'reference'.
+
+    'alignment' defaults to the best alignment found by align. Where both
+    mazes have a tile the tile of the reference is kept.
+
+    Return a (maze, conflicts, alignment) tuple where maze is the merged maze,
+    of the same class as a fork of the reference, and conflicts is the set of
+    coordinates, in the frame of the reference, where the tiles of both mazes
+    differ.
+    """
+    if alignment is None:
+        alignment = align(reference, other, rotations)
+    merged = reference.fork()
+    grid = _CodeGrid.from_maze(other)
+    if alignment is None or grid is None:
+        return (merged, set(), alignment)
+
+    for rotation in range(alignment.rotation):
+        grid = grid.rotate()
+    (min_x, min_y) = (grid.origin[0] + alignment.offset[0],
+                      grid.origin[1] + alignment.offset[1])
+    width = grid.width
+    box = ((min_x, min_y), (min_x + width, min_y + grid.height))
+    reference_codes = reference.code_grid(box)
+
+    conflicts = set()
+    for (y, row) in enumerate(grid.rows()):
+        reference_row = reference_codes[y * width:(y + 1) * width]
+        if not any(reference_row):
+            merged.add_code_row((min_x, min_y + y), row)
+            continue
+        # keep the tiles of the reference
+        new = bytearray(row)
+        for (x, (code, reference_code)) in enumerate(zip(row, reference_row)):
+            if reference_code:
+                new[x] = tiles.NO_TILE
+                if code and code != reference_code:
+                    conflicts.add((min_x + x, min_y + y))
+        merged.add_code_row((min_x, min_y + y), new)
+    return (merged, conflicts, alignment)
@@ -0,0 +1,165 @@
+'''
+File: raycast.py
+Author: Jeroen De Vlieger
+Description:
+
+Precomputed distance to wall tables for simulating distance sensors, e.g.
+ultrasonic and IR sensors.
+
+For every tile and direction the table holds the number of tiles a ray can
+travel before it hits a wall. The tables are built with one cumulative scan
+per row and per column, where each run of open borders is filled with a
+single slice assignment. A query is a single array lookup.
+'''
+from array import array
+import re
+
+from .grid import MazeGrid
+from .grid import OFFSETS
+from .grid import BIT_TABLES
+from .grid import borders
+
+
+"""directions in which the tile index increases along a ray"""
+_FORWARD = (False, True, True, False)
+
+"""translates a wall mask into the mask of the open sides"""
+_OPEN_SIDES = bytes(~mask & 15 for mask in range(16)) + bytes(240)
+
+_RUN = re.compile(b'\x01+')
+
+
+class RayCastTable(object):
+    """
+    Distance to the nearest wall from every tile of a maze, in each direction.
+
+    A ray stops at a wall on either side of a border, at a spot without a
+    tile and at the bounding box of the maze. A distance of 0 means the ray
+    can't leave the tile.
+
+    Attributes:
+        grid     the MazeGrid of the maze
+        tables   tables[d][index] is the distance to the wall in direction d
+                 from the tile with the given grid index
+        crossing crossing[index] is a 4 bit mask with bit d set if a ray can
+                 leave the tile in direction d
+    """
+
+    def __init__(self, maze, boundingbox=None):
+        """
+        Build the tables for a maze, or a MazeGrid. The tables of a maze are
+        kept up to date by add_tile and remove_tile of the table.
+        """
+        if isinstance(maze, MazeGrid):
+            (self.maze, self.grid) = (None, maze)
+        else:
+            (self.maze, self.grid) = (maze, MazeGrid(maze, boundingbox))
+        grid = self.grid
+        size = grid.width * grid.height
+
+        self.crossing = borders(grid.walls.translate(_OPEN_SIDES),
+                                grid.width, grid.height)
+        # _ramp[0:n] is 1, 2, ... n
+        self._ramp = array('I', range(1, max(grid.width, grid.height) + 1))
+        self.tables = [array('I', bytes(4 * size)) for direction in range(4)]
+
+        for direction in range(4):
+            crossing = self.crossing.translate(BIT_TABLES[direction])
+            for line in self._lines(direction):
+                self._scan(direction, line, crossing[line])
+
+    def _lines(self, direction):
+        """return the slices of the grid indices of all rows or columns"""
+        (width, height) = (self.grid.width, self.grid.height)
+        if direction % 2:
+            return [slice(y * width, (y + 1) * width) for y in range(height)]
+        return [slice(x, width * height, width) for x in range(width)]
+
+    def _scan(self, direction, line, crossing):
+        """
+        Fill the distances of the tiles of a single row or column given as a
+        slice of grid indices, crossing holds their crossing bit of the
+        direction.
+        """
+        table = self.tables[direction]
+        forward = _FORWARD[direction]
+        indices = range(*line.indices(len(table)))
+        table[line] = array('I', bytes(4 * len(crossing)))
+        for match in _RUN.finditer(crossing):
+            (start, end) = match.span()
+            run = end - start
+            # travelling forward the first tile of a run of crossable borders
+            # sees the whole run ahead, travelling backward the last one does
+            values = self._ramp[run-1::-1] if forward else self._ramp[0:run]
+            table[indices[start]:indices[end-1] + indices.step:indices.step] = \
+                values
+
+    def distance(self, coordinate, direction):
+        """
+        return the number of tiles a ray leaving the tile at a coordinate in
+        a direction travels before it hits a wall
+        """
+        grid = self.grid
+        (x, y) = (coordinate[0] - grid.min_x, coordinate[1] - grid.min_y)
+        if not (0 <= x < grid.width and 0 <= y < grid.height):
+            raise ValueError('coordinate {!s} lies outside the maze'.format(
+                coordinate))
+        return self.tables[direction][y * grid.width + x]
+
+    def distances(self, coordinate):
+        """return the distances in the north, east, south and west direction"""
+        return tuple(self.distance(coordinate, direction)
+                     for direction in range(4))
+
+    def set_tile(self, coordinate, tile):
+        """
+        Replace the tile at a coordinate of the grid, None removes it, and
+        rescan the row and the column of the tile.
+        """
+        grid = self.grid
+        grid.set_tile(coordinate, tile)
+        index = grid.index(coordinate)
+        (x, y) = (index % grid.width, index // grid.width)
+
+        walls = grid.walls
+        for (direction, (dx, dy)) in enumerate(OFFSETS):
+            if not (0 <= x + dx < grid.width and 0 <= y + dy < grid.height):
+                continue
+            (neighbour, back) = (index + grid.deltas()[direction],
+                                 (direction + 2) % 4)
+            bit = not (walls[index] >> direction & 1 or
+                       walls[neighbour] >> back & 1)
+            self.crossing[index] = self.crossing[index] & ~(1 << direction) | \
+                bit << direction
+            self.crossing[neighbour] = self.crossing[neighbour] & ~(1 << back) | \
+                bit << back
+
+        rows = slice(y * grid.width, (y + 1) * grid.width)
+        columns = slice(x, grid.width * grid.height, grid.width)
+        for direction in range(4):
+            line = columns if direction % 2 == 0 else rows
+            self._scan(direction, line, self.crossing[line].translate(
+                BIT_TABLES[direction]))
+
+    def add_tile(self, coordinate, tile):
+        """add a tile to the maze and update the tables accordingly"""
+        self._check_coordinate(coordinate)
+        if self.maze is not None:
+            self.maze.add_tile(coordinate, tile)
+        self.set_tile(coordinate, tile)
+
+    def remove_tile(self, coordinate):
+        """remove a tile from the maze and update the tables accordingly"""
+        self._check_coordinate(coordinate)
+        if self.maze is not None:
+            self.maze.remove_tile(coordinate)
+        self.set_tile(coordinate, None)
+
+    def _check_coordinate(self, coordinate):
+        """
+        raise a ValueError for a coordinate outside the grid, before the maze
+        is modified
+        """
+        if not self.grid.contains(coordinate):
+            raise ValueError('coordinate {!s} lies outside the grid'.format(
+                coordinate))
@@ -0,0 +1,519 @@
+'''
+File: shardedmaze.py
+Author: Jeroen De Vlieger
+Description:
+
+A Maze whose tiles are spread over a number of worker processes.
+
+The coordinate space is cut in horizontal bands of band_rows rows: band b
+holds the rows b * band_rows up to (b + 1) * band_rows. Band b is owned by
+shard b % shards, a worker process that stores the tile codes of its bands
+in a ChunkedMaze. The ShardedMaze object in the calling process is the
+coordinator, it forwards every query to the shards owning the rows involved.
+
+Coordinator and shards exchange (command, arguments) tuples over a
+multiprocessing Pipe. Commands that modify the maze are not answered, hence
+adding tiles doesn't wait for the shards. An error raised by such a command
+is reported by the next command that is answered.
+
+Whole maze operations run on all shards at once:
+    - inconsistent_borders checks every band of a shard with a few byte
+      translations per row. The borders between two bands are checked by the
+      shard owning the lower band, after the coordinator handed it the last
+      row of the band above it (the halo row).
+    - bfs is a level synchronous breadth first search. Each shard expands its
+      part of the frontier, steps into a band of another shard are sent to
+      the coordinator which passes them on to the owning shard for the next
+      level.
+'''
+from itertools import compress
+import multiprocessing
+
+from .chunkedmaze import ChunkedMaze
+from .grid import BIT_TABLES
+from .grid import OFFSETS
+from .grid import decode_region
+from .maze import Maze
+from .tiles import Tile
+from .tiles import encode
+from . import tiles
+
+
+def _mismatches(codes, direction, other_codes):
+    """
+    Return the positions i at which both codes[i] and other_codes[i] are a
+    tile and exactly one of them has a wall on their shared border, where
+    other_codes[i] lies in 'direction' of codes[i].
+    """
+    count = len(codes)
+    walls = int.from_bytes(codes.translate(BIT_TABLES[direction]), 'little')
+    other_walls = int.from_bytes(
+        other_codes.translate(BIT_TABLES[(direction + 2) % 4]), 'little')
+    present = int.from_bytes(codes.translate(tiles.PRESENT), 'little') & \
+        int.from_bytes(other_codes.translate(tiles.PRESENT), 'little')
+    lanes = ((walls ^ other_walls) & present).to_bytes(count, 'little')
+    return compress(range(count), lanes)
+
+
+def grid_borders(codes, origin, width, above=None):
+    """
+    Return a list of the inconsistent borders (see maze.inconsistent_borders)
+    of a row major grid of tile codes with its first code at 'origin'.
+
+    'above' optionally holds the codes of the row above the grid, its borders
+    with the first row of the grid are checked as well.
+    """
+    (min_x, min_y) = origin
+    codes = bytes(codes)
+    borders = []
+    for (y, start) in enumerate(range(0, len(codes), width), min_y):
+        row = codes[start:start + width]
+        for x in _mismatches(row[:-1], Tile.EAST, row[1:]):
+            borders.append(((min_x + x, y), Tile.EAST))
+        if above is not None:
+            for x in _mismatches(above, Tile.SOUTH, row):
+                borders.append(((min_x + x, y - 1), Tile.SOUTH))
+        above = row
+    return borders
+
+
+class _Shard(object):
+    """
+    The part of a ShardedMaze held by a worker process, i.e. the bands b with
+    b % shards == index.
+    """
+
+    def __init__(self, index, shards, band_rows):
+        self.index = index
+        self.shards = shards
+        self.band_rows = band_rows
+        self.maze = ChunkedMaze()
+        # the bands a tile was ever added to
+        self.bands = set()
+        # state of a breadth first search: the coordinates reached and those
+        # reached at the current level
+        self._visited = set()
+        self._frontier = []
+        self._goal = None
+
+    def _code(self, x, y):
+        return self.maze.get_code((x, y))
+
+    def set_codes(self, items):
+        """add the (x, y, code) tuples"""
+        for (x, y, code) in items:
+            self.maze.add_code_row((x, y), bytes((code,)))
+            self.bands.add(y // self.band_rows)
+
+    def add_code_row(self, x, y, codes):
+        self.maze.add_code_row((x, y), codes)
+        self.bands.add(y // self.band_rows)
+
+    def remove_tile(self, x, y):
+        self.maze.remove_tile((x, y))
+
+    def codes(self, xs, ys):
+        """return the tile codes at a number of coordinates"""
+        code = self._code
+        return bytes(code(x, y) for (x, y) in zip(xs, ys))
+
+    def boundingbox(self):
+        """return the bounding box of the tiles of this shard, or None"""
+        try:
+            return self.maze.get_boundingbox()
+        except ValueError:
+            return None
+
+    def code_grid(self, boundingbox):
+        return bytes(self.maze.code_grid(boundingbox))
+
+    def halo_rows(self, min_x, max_x):
+        """
+        return a dictionary mapping the index of each band of this shard on
+        the codes of its last row, over the columns min_x up to max_x
+        """
+        rows = {}
+        for band in self.bands:
+            y = (band + 1) * self.band_rows - 1
+            rows[band] = self.code_grid(((min_x, y), (max_x, y + 1)))
+        return rows
+
+    def check(self, min_x, max_x, halos):
+        """
+        return the inconsistent borders of the bands of this shard, 'halos'
+        maps the index of a band on the codes of the row above it
+        """
+        borders = []
+        for band in sorted(self.bands):
+            y = band * self.band_rows
+            codes = self.code_grid(((min_x, y), (max_x, y + self.band_rows)))
+            borders.extend(grid_borders(codes, (min_x, y), max_x - min_x,
+                                        halos.get(band)))
+        return borders
+
+    def bfs_reset(self, goal):
+        self._visited = set()
+        self._frontier = []
+        self._goal = goal
+
+    def bfs_step(self, incoming):
+        """
+        Run a level of a breadth first search.
+
+        'incoming' holds (x, y, back) tuples of steps from another shard into
+        the tile at (x, y) through its side 'back', or back None for the
+        start tile. Return a (reached, goal_found, pending, outgoing) tuple:
+        the number of new tiles at this level, whether the goal is among them,
+        the number of tiles of this shard at the next level and a dictionary
+        mapping a shard index on the steps into its bands.
+        """
+        open_masks = tiles.OPEN_MASKS
+        visited = self._visited
+        frontier = self._frontier
+        code = self._code
+        for (x, y, back) in incoming:
+            if (x, y) in visited:
+                continue
+            mask = open_masks[code(x, y)]
+            if (mask >> back & 1) if back is not None else code(x, y):
+                visited.add((x, y))
+                frontier.append((x, y))
+
+        (band_rows, shards) = (self.band_rows, self.shards)
+        reached = len(frontier)
+        # the goal wasn't reached before, the search would have stopped
+        goal_found = self._goal in visited
+        outgoing = {}
+        level = []
+        for (x, y) in frontier:
+            mask = open_masks[code(x, y)]
+            for (direction, (dx, dy)) in enumerate(OFFSETS):
+                if not mask >> direction & 1:
+                    continue
+                (nx, ny) = (x + dx, y + dy)
+                back = (direction + 2) % 4
+                owner = ny // band_rows % shards
+                if owner != self.index:
+                    outgoing.setdefault(owner, []).append((nx, ny, back))
+                elif (nx, ny) not in visited and \
+                        open_masks[code(nx, ny)] >> back & 1:
+                    visited.add((nx, ny))
+                    level.append((nx, ny))
+        self._frontier = level
+        return (reached, goal_found, len(level), outgoing)
+
+
+"""commands that are not answered by a shard"""
+_ONE_WAY = frozenset(('set_codes', 'add_code_row', 'remove_tile'))
+
+
+def _serve(connection, index, shards, band_rows):
+    """run a shard in a worker process until the coordinator closes it"""
+    shard = _Shard(index, shards, band_rows)
+    error = None
+    while True:
+        (command, arguments) = connection.recv()
+        if command == 'close':
+            break
+        try:
+            result = getattr(shard, command)(*arguments)
+        except Exception as e:
+            if command in _ONE_WAY:
+                error = error or e
+            else:
+                connection.send((False, e))
+            continue
+        if command in _ONE_WAY:
+            continue
+        if error is not None:
+            (result, error) = (error, None)
+            connection.send((False, result))
+        else:
+            connection.send((True, result))
+    connection.close()
+
+
+class ShardedMaze(Maze):
+    """
+    A Maze partitioned in bands of rows held by worker processes, see the
+    module description.
+
+    Only tiles of the types in tiles.TILE_TYPES can be stored. get_tile
+    returns a new Tile object on every call. Close the maze to stop its
+    workers, e.g. by using it as a context manager.
+    """
+
+    def __init__(self, shards=4, band_rows=256):
+        # don't call Maze.__init__, the tiles live in the shards
+        if shards < 1 or band_rows < 1:
+            raise ValueError('a ShardedMaze needs at least one shard and one '
+                             'row per band')
+        self.shards = shards
+        self.band_rows = band_rows
+        self._connections = []
+        self._processes = []
+        for index in range(shards):
+            (connection, child) = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve, args=(child, index, shards, band_rows),
+                daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def close(self):
+        """Stop the worker processes, the tiles are lost"""
+        for connection in self._connections:
+            connection.send(('close', ()))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __reduce__(self):
+        raise TypeError('a ShardedMaze can not be pickled, its tiles live in '
+                        'its worker processes')
+
+    def _owner(self, y):
+        """return the index of the shard owning row y"""
+        return y // self.band_rows % self.shards
+
+    def _send(self, shard, command, *arguments):
+        self._connections[shard].send((command, arguments))
+
+    def _receive(self, shard):
+        (ok, result) = self._connections[shard].recv()
+        if not ok:
+            raise result
+        return result
+
+    def _call(self, shard, command, *arguments):
+        self._send(shard, command, *arguments)
+        return self._receive(shard)
+
+    def _broadcast(self, command, *arguments):
+        """run a command on all shards at once, return their results"""
+        for shard in range(self.shards):
+            self._send(shard, command, *arguments)
+        return [self._receive(shard) for shard in range(self.shards)]
+
+    def add_tile(self, coordinate, tile):
+        """Add a tile to this maze on a specific coordinate
+
+        'coordinate' is a 2 dimensional tuple of integers (int, int) denoting
+        the position if the maze where 'tile' should be added.
+        If a tile is already present on that coordinate then it gets replaced.
+        """
+        (x, y) = coordinate
+        self._send(self._owner(y), 'set_codes', [(x, y, encode(tile))])
+
+    def add_tiles(self, coordinates, tiles=None):
+        """Add a number of tiles to this maze at once, see Maze.add_tiles
+
+        The tiles are sent to each shard in a single message.
+        """
+        items = coordinates if tiles is None else zip(coordinates, tiles)
+        batches = {}
+        for ((x, y), tile) in items:
+            batches.setdefault(self._owner(y), []).append((x, y, encode(tile)))
+        for (shard, batch) in batches.items():
+            self._send(shard, 'set_codes', batch)
+
+    def add_code_row(self, coordinate, codes):
+        """Add a horizontal run of tiles given by their tile codes, see
+        Maze.add_code_row"""
+        (x, y) = coordinate
+        self._send(self._owner(y), 'add_code_row', x, y, bytes(codes))
+
+    def remove_tile(self, coordinate):
+        """Remove the tile at a given coordinate, if any"""
+        (x, y) = coordinate
+        self._send(self._owner(y), 'remove_tile', x, y)
+
+    def get_tile(self, coordinate):
+        """
+        Return the tile at a given coordinate.
+
+        Return None if there is no tile at the given coordinate
+        """
+        (x, y) = coordinate
+        return tiles.decode(self._call(self._owner(y), 'codes', [x], [y])[0])
+
+    def _wall_masks(self, xs, ys):
+        """look up the tile codes on all shards at once, see Maze.walls_at"""
+        positions = {}
+        for (index, y) in enumerate(ys):
+            positions.setdefault(self._owner(y), []).append(index)
+        for (shard, indices) in positions.items():
+            self._send(shard, 'codes', [xs[i] for i in indices],
+                       [ys[i] for i in indices])
+        codes = bytearray(len(xs))
+        for (shard, indices) in positions.items():
+            for (index, code) in zip(indices, self._receive(shard)):
+                codes[index] = code
+        return codes.translate(tiles.WALL_MASKS)
+
+    def get_boundingbox(self):
+        """
+        compute a bounding box of the current maze.
+
+        Returns  a tuple of coordinates (lu, rl). lu is the coordinate of the
+        left upper point of the bounding box while rl is the coordinate of the
+        right lower point of the bounding box
+
+        Raises a ValueError if the maze holds no tiles, like Maze does.
+        """
+        boxes = [box for box in self._broadcast('boundingbox')
+                 if box is not None]
+        if not boxes:
+            raise ValueError('an empty maze has no bounding box')
+        return ((min(box[0][0] for box in boxes),
+                 min(box[0][1] for box in boxes)),
+                (max(box[1][0] for box in boxes),
+                 max(box[1][1] for box in boxes)))
+
+    def _band_boxes(self, boundingbox):
+        """
+        return the (shard, box) tuples of the parts of a bounding box that
+        lie in a single band, from top to bottom
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        y = min_y
+        while y < max_y:
+            end = min(max_y, (y // self.band_rows + 1) * self.band_rows)
+            yield (self._owner(y), ((min_x, y), (max_x, end)))
+            y = end
+
+    def code_grid(self, boundingbox=None):
+        """
+        Return the tile codes (see tiles.encode) of this maze as a bytearray,
+        see Maze.code_grid. Each band of the box is requested from its shard,
+        all shards work at once.
+        """
+        if boundingbox is None:
+            boundingbox = self.get_boundingbox()
+        parts = list(self._band_boxes(boundingbox))
+        for (shard, box) in parts:
+            self._send(shard, 'code_grid', box)
+        grid = bytearray()
+        for (shard, box) in parts:
+            grid += self._receive(shard)
+        return grid
+
+    def build_spatial_index(self):
+        """iter_region only reads the bands within its box, no index needed"""
+
+    def iter_region(self, boundingbox):
+        """
+        Return an iterator over the (coordinate, tile) tuples of the tiles
+        within 'boundingbox' in row major order, see Maze.iter_region. The
+        region is requested a band at a time.
+        """
+        for (shard, box) in self._band_boxes(boundingbox):
+            for item in decode_region(box,
+                                       self._call(shard, 'code_grid', box)):
+                yield item
+
+    def __iter__(self):
+        """return an Iterator for this maze object
+
+        The iterator traverses the maze band by band returning (coordinate,
+        tile) tuples in row major order.
+        """
+        try:
+            boundingbox = self.get_boundingbox()
+        except ValueError:
+            return iter(())
+        return self.iter_region(boundingbox)
+
+    def _tiles_dict(self):
+        return dict(iter(self))
+
+    def fork(self):
+        """
+        Return a ChunkedMaze holding all tiles of this maze, in the current
+        process
+        """
+        maze = ChunkedMaze()
+        try:
+            boundingbox = self.get_boundingbox()
+        except ValueError:
+            return maze
+        for (shard, box) in self._band_boxes(boundingbox):
+            ((min_x, min_y), (max_x, max_y)) = box
+            codes = self._call(shard, 'code_grid', box)
+            width = max_x - min_x
+            for y in range(min_y, max_y):
+                start = (y - min_y) * width
+                maze.add_code_row((min_x, y), codes[start:start + width])
+        return maze
+
+    def snapshot(self):
+        return self.fork()
+
+    def inconsistent_borders(self):
+        """
+        Return the set of borders where two touching tiles are inconsistent,
+        see maze.inconsistent_borders. All shards check their bands at once.
+        """
+        try:
+            ((min_x, min_y), (max_x, max_y)) = self.get_boundingbox()
+        except ValueError:
+            return set()
+        # halo exchange: the last row of every band goes to the shard owning
+        # the band below it
+        halos = [{} for shard in range(self.shards)]
+        for rows in self._broadcast('halo_rows', min_x, max_x):
+            for (band, row) in rows.items():
+                halos[(band + 1) % self.shards][band + 1] = row
+        for shard in range(self.shards):
+            self._send(shard, 'check', min_x, max_x, halos[shard])
+        borders = set()
+        for shard in range(self.shards):
+            borders.update(self._receive(shard))
+        return borders
+
+    def bfs(self, start, goal=None):
+        """
+        Run a breadth first search from coordinate 'start' through the open,
+        passable sides of the tiles (see tiles.OPEN_MASKS).
+
+        Return a (reached, distance) tuple. Without a goal the search covers
+        everything that can be reached, 'reached' is the number of tiles
+        reached including the start tile and 'distance' the number of steps to
+        the farthest of them. With a goal the search stops at the goal,
+        'distance' is its number of steps from the start or None if it can't
+        be reached.
+        """
+        self._broadcast('bfs_reset', None if goal is None else tuple(goal))
+        incoming = {self._owner(start[1]): [(start[0], start[1], None)]}
+        (reached, level, farthest, pending) = (0, 0, None, 0)
+        while incoming or pending:
+            for shard in range(self.shards):
+                self._send(shard, 'bfs_step', incoming.get(shard, []))
+            (incoming, pending, found, count) = ({}, 0, False, 0)
+            for shard in range(self.shards):
+                (shard_count, goal_found, next_level, outgoing) = \
+                    self._receive(shard)
+                count += shard_count
+                pending += next_level
+                found = found or goal_found
+                for (owner, steps) in outgoing.items():
+                    incoming.setdefault(owner, []).extend(steps)
+            reached += count
+            if found:
+                return (reached, level)
+            if count:
+                farthest = level
+            level += 1
+        if goal is not None:
+            return (reached, None)
+        return (reached, farthest)
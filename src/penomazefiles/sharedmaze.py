@@ -0,0 +1,212 @@
+'''
+File: sharedmaze.py
+Author: Jeroen De Vlieger
+Description:
+
+Module containing a read only Maze stored in shared memory.
+
+A SharedMemoryMaze keeps the tile codes (see tiles.encode) of the bounding
+box of a maze in a multiprocessing.shared_memory block. Pickling it only
+pickles the name of the block, hence sending it to worker processes costs
+the same for every maze size and the workers read the tiles without copying
+them.
+'''
+from itertools import compress
+from multiprocessing import shared_memory
+import struct
+
+from .maze import Maze
+from . import tiles
+
+
+"""layout of the header of the block: min_x, min_y, width and height"""
+_HEADER = struct.Struct('<qqqq')
+
+
+class SharedMemoryMaze(Maze):
+    """
+    A read only Maze backed by a shared memory block.
+
+    Create the block with SharedMemoryMaze.create in one process and pass the
+    maze to other processes, e.g. as argument of a multiprocessing.Pool task.
+    Every process must close its maze when done with it, the creating
+    process must also unlink it to free the block.
+    """
+
+    def __init__(self, name):
+        """Attach to the existing shared memory block with a given name"""
+        # don't call Maze.__init__, this view has no use for its dictionary
+        self._block = shared_memory.SharedMemory(name=name)
+        (self.min_x, self.min_y, self.width, self.height) = \
+            _HEADER.unpack_from(self._block.buf)
+        self._codes = self._block.buf[_HEADER.size:
+                                      _HEADER.size + self.width * self.height]
+
+    @classmethod
+    def create(cls, maze, boundingbox=None):
+        """
+        Copy a maze into a new shared memory block and return a
+        SharedMemoryMaze attached to it.
+
+        The block covers 'boundingbox', which defaults to the bounding box of
+        the maze.
+        """
+        if boundingbox is None:
+            boundingbox = maze.get_boundingbox()
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        (width, height) = (max_x - min_x, max_y - min_y)
+        codes = maze.code_grid(boundingbox)
+
+        block = shared_memory.SharedMemory(
+            create=True, size=_HEADER.size + max(len(codes), 1))
+        try:
+            _HEADER.pack_into(block.buf, 0, min_x, min_y, width, height)
+            block.buf[_HEADER.size:_HEADER.size + len(codes)] = codes
+            return cls(block.name)
+        finally:
+            block.close()
+
+    @property
+    def name(self):
+        """the name of the shared memory block"""
+        return self._block.name
+
+    def __reduce__(self):
+        """pickle this maze as the name of its shared memory block"""
+        return (self.__class__, (self.name,))
+
+    def close(self):
+        """Detach this process from the shared memory block"""
+        if self._codes is not None:
+            self._codes.release()
+            self._codes = None
+            self._block.close()
+
+    def __del__(self):
+        # release the view on the block before the block itself goes away
+        if getattr(self, '_codes', None) is not None:
+            self.close()
+
+    def unlink(self):
+        """Free the shared memory block, once all processes closed it"""
+        self._block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('a SharedMemoryMaze is read only')
+
+    add_tile = remove_tile = add_tiles = add_code_row = _read_only
+
+    def build_spatial_index(self):
+        """iter_region only reads the rows within its box, no index needed"""
+
+    def _index(self, coordinate):
+        """return the index of a coordinate in the block, or None"""
+        (x, y) = (coordinate[0] - self.min_x, coordinate[1] - self.min_y)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def get_tile(self, coordinate):
+        """
+        Return a new Tile object for the tile at a given coordinate.
+
+        Return None if there is no tile at the given coordinate
+        """
+        index = self._index(coordinate)
+        if index is None:
+            return None
+        return tiles.decode(self._codes[index])
+
+    def _wall_masks(self, xs, ys):
+        """look up the tile codes in the shared block, see Maze.walls_at"""
+        (min_x, min_y) = (self.min_x, self.min_y)
+        (width, height) = (self.width, self.height)
+        codes = self._codes
+        return bytearray(
+            codes[(y - min_y) * width + x - min_x]
+            if 0 <= x - min_x < width and 0 <= y - min_y < height else 0
+            for (x, y) in zip(xs, ys)).translate(tiles.WALL_MASKS)
+
+    def get_boundingbox(self):
+        """
+        Return the bounding box covered by the shared memory block, which
+        might be larger than the bounding box of the tiles.
+        """
+        return ((self.min_x, self.min_y),
+                (self.min_x + self.width, self.min_y + self.height))
+
+    def code_grid(self, boundingbox=None):
+        """
+        Return the tile codes (see tiles.encode) of this maze as a bytearray,
+        see Maze.code_grid
+        """
+        own = self.get_boundingbox()
+        if boundingbox is None or boundingbox == own:
+            return bytearray(self._codes)
+
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        width = max_x - min_x
+        grid = bytearray(width * (max_y - min_y))
+        # the part of the requested box that overlaps the block
+        left = max(min_x, self.min_x)
+        right = min(max_x, self.min_x + self.width)
+        if left >= right:
+            return grid
+        for y in range(max(min_y, self.min_y),
+                       min(max_y, self.min_y + self.height)):
+            source = self._index((left, y))
+            target = (y - min_y) * width + left - min_x
+            grid[target:target + right - left] = \
+                self._codes[source:source + right - left]
+        return grid
+
+    def fork(self):
+        """Return a modifiable Maze holding the tiles of this maze"""
+        maze = Maze()
+        for y in range(self.height):
+            maze.add_code_row((self.min_x, self.min_y + y),
+                              self._codes[y * self.width:(y + 1) * self.width])
+        return maze
+
+    def snapshot(self):
+        """Return a snapshot of this maze, see fork"""
+        return self.fork()
+
+    def iter_region(self, boundingbox):
+        """
+        Return an iterator over the (coordinate, tile) tuples of the tiles
+        within 'boundingbox' in row major order, see Maze.iter_region.
+
+        The tiles are decoded straight from the rows of the block that
+        overlap the box.
+        """
+        ((min_x, min_y), (max_x, max_y)) = boundingbox
+        left = max(min_x, self.min_x) - self.min_x
+        right = min(max_x, self.min_x + self.width) - self.min_x
+        if left >= right:
+            return
+        decode = tiles.decode
+        (codes, width) = (self._codes, self.width)
+        for y in range(max(min_y, self.min_y) - self.min_y,
+                       min(max_y, self.min_y + self.height) - self.min_y):
+            start = y * width
+            for x in compress(range(left, right),
+                              codes[start + left:start + right]):
+                yield ((self.min_x + x, self.min_y + y),
+                       decode(codes[start + x]))
+
+    def __iter__(self):
+        """
+        return an iterator over the (coordinate, tile) tuples of this maze, in
+        row major order
+        """
+        return self.iter_region(self.get_boundingbox())
+
+    def _tiles_dict(self):
+        return dict(self)
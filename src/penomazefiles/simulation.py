@@ -0,0 +1,298 @@
+'''
+File: simulation.py
+Author: Jeroen De Vlieger
+Description:
+
+Simulation of many exploring robots in a maze.
+
+The robots of many episodes share flat arrays holding their positions and
+headings, and every move is a table lookup into the compiled passable masks
+of the maze, hence no Tile objects are touched while simulating. The robots
+are still moved one at a time by a Python loop, a single Simulation runs on
+a single core. run_episodes spreads batches of episodes over a process pool
+to use more of them.
+'''
+from array import array
+import random
+import time
+
+from .grid import MazeGrid
+from .raycast import RayCastTable
+
+
+def _left_hand_table():
+    """
+    Precompute the heading chosen by a left hand wall follower.
+
+    table[passable_mask << 2 | heading] is the new heading, or -1 if the
+    robot can't move at all.
+    """
+    table = array('b', [-1]) * 64
+    for mask in range(16):
+        for heading in range(4):
+            for turn in (3, 0, 1, 2):
+                direction = (heading + turn) % 4
+                if mask >> direction & 1:
+                    table[mask << 2 | heading] = direction
+                    break
+    return table
+
+
+def _random_table():
+    """
+    Precompute the headings a random walker can choose from.
+
+    table[passable_mask << 2 | heading] is a tuple of possible headings. A
+    random walker only turns back when it is in a dead end.
+    """
+    table = []
+    for mask in range(16):
+        for heading in range(4):
+            options = tuple(direction for direction in range(4)
+                            if mask >> direction & 1 and
+                            direction != (heading + 2) % 4)
+            if not options and mask >> ((heading + 2) % 4) & 1:
+                options = ((heading + 2) % 4,)
+            table.append(options)
+    return tuple(table)
+
+
+_LEFT_HAND = _left_hand_table()
+_RANDOM = _random_table()
+
+"""Exploration policies supported by the Simulation"""
+POLICIES = ('random', 'left_hand')
+
+
+class SimulationReport(object):
+    """Summary of a number of simulated episodes"""
+
+    def __init__(self, steps, seconds, coverage):
+        """
+        'steps' is the total number of robot steps simulated, 'seconds' the
+        wall clock time it took and 'coverage' a list with for each episode
+        the fraction of the passable tiles visited by at least one robot.
+        """
+        self.steps = steps
+        self.seconds = seconds
+        self.coverage = coverage
+
+    @property
+    def steps_per_second(self):
+        if self.seconds == 0:
+            return float('inf')
+        return self.steps / self.seconds
+
+    def merge(self, other):
+        """Return a report combining this report with another one
+
+        The episodes of both reports are assumed to run concurrently.
+        """
+        return SimulationReport(self.steps + other.steps,
+                                max(self.seconds, other.seconds),
+                                self.coverage + other.coverage)
+
+    def __str__(self):
+        return '{:d} episodes, {:d} steps, {:.0f} steps/sec'.format(
+            len(self.coverage), self.steps, self.steps_per_second)
+
+
+class Simulation(object):
+    """
+    Step a number of robots in a number of independent episodes.
+
+    The robots of all episodes share a set of flat arrays holding their
+    position (grid index) and heading. Robots don't block each other.
+    A step moves the robots one after the other, see step.
+    """
+
+    def __init__(self, grid, episodes=1, robots=4, policy='random',
+                 starts=None, seed=None):
+        """
+        Create a simulation on a MazeGrid.
+
+        'starts' is an optional list of ((x,y), heading) start poses, one for
+        each robot of an episode. Each episode starts all robots on the same
+        poses. Without it the robots start on random passable tiles.
+        """
+        if policy not in POLICIES:
+            raise ValueError('unknown policy {!r}'.format(policy))
+        if starts is not None and len(starts) != robots:
+            raise ValueError('expected {:d} start poses, not {:d}'.format(
+                robots, len(starts)))
+        for (coordinate, heading) in starts or ():
+            if not grid.contains(coordinate):
+                raise ValueError('start coordinate {!s} lies outside the '
+                                 'grid'.format(coordinate))
+            if heading not in range(4):
+                raise ValueError('a heading must be in range(4), not '
+                                 '{!s}'.format(heading))
+
+        self.grid = grid
+        self.episodes = episodes
+        self.robots = robots
+        self.policy = policy
+        self.random = random.Random(seed)
+
+        candidates = grid.passable_indices()
+        if not candidates:
+            raise ValueError('the maze has no passable tiles')
+
+        self.positions = array('l')
+        self.headings = array('b')
+        for episode in range(episodes):
+            for robot in range(robots):
+                if starts is None:
+                    self.positions.append(self.random.choice(candidates))
+                    self.headings.append(self.random.randrange(4))
+                else:
+                    (coordinate, heading) = starts[robot]
+                    self.positions.append(grid.index(coordinate))
+                    self.headings.append(heading)
+
+        self.visited = [bytearray(grid.width * grid.height)
+                        for episode in range(episodes)]
+        for (robot, position) in enumerate(self.positions):
+            self.visited[robot // robots][position] = 1
+
+        self.steps = 0
+        # distance to wall tables, built on the first range reading
+        self._rays = None
+
+    def step(self, count=1):
+        """
+        Advance every robot 'count' steps.
+
+        Each step loops over the robots and moves them one at a time, the
+        cost is a few table lookups per robot.
+        """
+        passable = self.grid.passable
+        deltas = self.grid.deltas()
+        positions = self.positions
+        headings = self.headings
+        visited = self.visited
+        robots = self.robots
+        choice = self.random.choice
+        left_hand = self.policy == 'left_hand'
+
+        for step in range(count):
+            for robot in range(len(positions)):
+                position = positions[robot]
+                key = passable[position] << 2 | headings[robot]
+                if left_hand:
+                    heading = _LEFT_HAND[key]
+                    if heading < 0:
+                        continue
+                else:
+                    options = _RANDOM[key]
+                    if not options:
+                        continue
+                    heading = choice(options)
+                position += deltas[heading]
+                positions[robot] = position
+                headings[robot] = heading
+                visited[robot // robots][position] = 1
+
+        self.steps += count * len(positions)
+
+    def sense(self, robot):
+        """return the wall mask of the tile a robot is standing on"""
+        return self.grid.walls[self.positions[robot]]
+
+    def ranges(self, robot):
+        """
+        return the distances in tiles to the nearest wall north, east, south
+        and west of the tile a robot is standing on, as a distance sensor
+        would see them
+        """
+        if self._rays is None:
+            self._rays = RayCastTable(self.grid)
+        position = self.positions[robot]
+        return tuple(table[position] for table in self._rays.tables)
+
+    def poses(self, episode):
+        """return the ((x,y), heading) poses of the robots in an episode"""
+        first = episode * self.robots
+        return [(self.grid.coordinate(self.positions[robot]),
+                 self.headings[robot])
+                for robot in range(first, first + self.robots)]
+
+    def coverage(self):
+        """
+        return for each episode the fraction of passable tiles visited by at
+        least one of its robots
+        """
+        passable = bytes(1 if mask else 0 for mask in self.grid.passable)
+        total = passable.count(1)
+        return [sum(visit & tile for (visit, tile) in zip(visited, passable))
+                / total for visited in self.visited]
+
+    def run(self, steps):
+        """Run all episodes for a number of steps and return a SimulationReport"""
+        steps_before = self.steps
+        start = time.perf_counter()
+        self.step(steps)
+        seconds = time.perf_counter() - start
+        return SimulationReport(self.steps - steps_before, seconds,
+                                self.coverage())
+
+
+def _run_batch(arguments):
+    (grid, episodes, steps, robots, policy, starts, seed) = arguments
+    simulation = Simulation(grid, episodes, robots, policy, starts, seed)
+    return simulation.run(steps)
+
+
+def run_episodes(maze, episodes, steps, robots=4, policy='random',
+                 starts=None, seed=None, processes=None, batch_size=64):
+    """
+    Simulate a number of episodes of 'steps' steps on a maze.
+
+    The episodes are split in batches of at most 'batch_size' episodes which
+    are simulated in a process pool of 'processes' workers. Use processes=0
+    to run everything in the current process.
+
+    Return a SimulationReport of all episodes.
+    """
+    grid = maze if isinstance(maze, MazeGrid) else MazeGrid(maze)
+    seeds = random.Random(seed)
+
+    batches = []
+    for first in range(0, episodes, batch_size):
+        batches.append((grid, min(batch_size, episodes - first), steps,
+                        robots, policy, starts, seeds.getrandbits(32)))
+
+    start = time.perf_counter()
+    if processes == 0:
+        reports = [_run_batch(batch) for batch in batches]
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(processes) as pool:
+            reports = pool.map(_run_batch, batches)
+
+    report = SimulationReport(0, 0.0, [])
+    for batch_report in reports:
+        report = report.merge(batch_report)
+    # report the throughput as seen by the caller
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    from .mazefileparser import MazeFileBuilder
+
+    parser = argparse.ArgumentParser(
+        description='simulate exploring robots in a mazefile and report '
+                    'the robot steps per second of all worker processes')
+    parser.add_argument('mazefile')
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.mazefile, 'r') as stream:
+        maze = MazeFileBuilder(stream)
+    print(run_episodes(maze, args.episodes, args.steps, policy=args.policy,
+                       processes=args.processes))
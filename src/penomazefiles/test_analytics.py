@@ -0,0 +1,110 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+
+from .analytics import *
+from .generator import perfect_maze
+from .maze import inconsistent_borders
+from .mazefileparser import MazeFileBuilder
+
+
+class Test_Analytics(unittest.TestCase):
+    """
+    Test of the mazefile corpus statistics
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.lines = ['# header comment',
+                      '3 3 Straight.N.13',
+                      '',
+                      'Corner.E T.S # first row ends here',
+                      'DeadEnd.W.V Cross.N',
+                      '   Closed.N Seesaw.E Straight.E.13',
+                      'Corner.S.S1N']
+        self.path = self.write('small.maze', '\n'.join(self.lines))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as stream:
+            stream.write(text)
+        return path
+
+    def test_analyse_file(self):
+        report = analyse_file(self.path)
+        self.assertEqual((report.files, report.tiles), (1, 9))
+        self.assertEqual(report.tile_types,
+                         {'Straight': 2, 'Corner': 2, 'T': 1, 'DeadEnd': 1,
+                          'Cross': 1, 'Closed': 1, 'Seesaw': 1})
+        self.assertEqual(report.orientations['Straight.N'], 1)
+        self.assertEqual(report.orientations['Corner.S'], 1)
+        self.assertEqual(report.barcodes, {'13': 2})
+        self.assertEqual(report.markers, {'V': 1, 'S1N': 1})
+        self.assertEqual(report.sizes, {'3x3': 1})
+        self.assertEqual((report.dead_ends, report.junctions), (1, 2))
+        self.assertEqual(report.borders, 12)
+        self.assertEqual(report.inconsistent_borders,
+                         len(inconsistent_borders(MazeFileBuilder(self.lines))))
+        self.assertEqual(report.inconsistent_files, 1)
+
+    def test_consistent_maze(self):
+        maze = perfect_maze(7, 5, seed=2, loops=0.2)
+        tokens = ['{:s}.{:s}'.format(tile.__class__.__name__,
+                                     'NESW'[_orientation(tile)])
+                  for (coordinate, tile) in maze.iter_region(((0,0), (7,5)))]
+        path = self.write('perfect.maze', '7 5\n' + ' '.join(tokens))
+        with open(path) as stream:
+            self.assertEqual(MazeFileBuilder(stream), maze)
+        report = analyse_file(path)
+        self.assertEqual(report.borders, 6 * 5 + 7 * 4)
+        self.assertEqual(report.inconsistent_borders, 0)
+        self.assertEqual(report.failure_rate, 0.0)
+
+    def test_failures(self):
+        paths = [self.write('bad_token.maze', '2 1 Straight.N Bogus.N'),
+                 self.write('to_many.maze', '1 1 Straight.N Straight.N'),
+                 self.write('no_size.maze', '# nothing here'),
+                 os.path.join(self.directory.name, 'missing.maze')]
+        report = analyse_files(paths, processes=0)
+        self.assertEqual(report.files, 4)
+        self.assertEqual(sorted(report.failures), sorted(paths))
+        self.assertEqual(report.tiles, 0)
+        self.assertEqual(report.failure_rate, 1.0)
+
+    def test_process_pool(self):
+        paths = [self.path] * 5 + [self.write('bad.maze', 'x')]
+        expected = analyse_files(paths, processes=0)
+        report = analyse_files(paths, processes=2, chunksize=2)
+        self.assertEqual(report.to_dict(), expected.to_dict())
+        self.assertEqual((report.files, report.tiles), (6, 45))
+        self.assertEqual(report.tile_types['Straight'], 10)
+
+    def test_write(self):
+        report = analyse_file(self.path)
+        stream = io.StringIO()
+        report.write(stream, 'json')
+        self.assertEqual(json.loads(stream.getvalue())['barcodes'], {'13': 2})
+
+        stream = io.StringIO()
+        report.write(stream, 'csv')
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'section,key,value')
+        self.assertIn('totals,tiles,9', lines)
+        self.assertIn('markers,S1N,1', lines)
+        self.assertRaises(ValueError, report.write, stream, 'xml')
+
+
+def _orientation(tile):
+    """return the number of rotations of a tile of a generated maze"""
+    for rotations in range(4):
+        if tile.__class__().rotate(rotations) == tile:
+            return rotations
+
+
+if __name__ == '__main__':
+    unittest.main()
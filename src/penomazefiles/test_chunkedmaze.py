@@ -0,0 +1,244 @@
+import unittest
+import pickle
+import copy
+from .chunkedmaze import *
+from .maze import Maze
+
+from . import tiles
+
+
+class Test_ChunkedMaze(unittest.TestCase):
+    """
+    Test of the ChunkedMaze class
+    """
+
+    def setUp(self):
+        self.tiles = {(0,0): tiles.Straight(0),
+                      (1,0): tiles.Corner(1),
+                      (-1,-70): tiles.T(2),
+                      (130,5): tiles.Seesaw(1),
+                      (-64,64): tiles.Closed()}
+
+    def test_add_and_get_tile(self):
+        maze = ChunkedMaze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+
+        for (coordinate, tile) in self.tiles.items():
+            self.assertEqual(maze.get_tile(coordinate), tile)
+
+        self.assertIsNone(maze.get_tile((2,0)))
+        self.assertIsNone(maze.get_tile((-1000,1000)))
+
+    def test_replace_tile(self):
+        maze = ChunkedMaze()
+        maze.add_tile((-3,-3), tiles.Cross())
+        maze.add_tile((-3,-3), tiles.DeadEnd(3))
+        self.assertEqual(maze.get_tile((-3,-3)), tiles.DeadEnd(3))
+
+    def test_chunks_allocated_on_demand(self):
+        maze = ChunkedMaze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+
+        origins = sorted(origin for (origin, chunk) in maze.iter_chunks())
+        self.assertEqual(origins, [(-64,-128), (-64,64), (0,0), (128,0)])
+
+    def test_iteration(self):
+        maze = ChunkedMaze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+
+        self.assertEqual(dict(iter(maze)), self.tiles)
+
+    def test_get_boundingbox(self):
+        maze = ChunkedMaze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+
+        self.assertEqual(maze.get_boundingbox(), ((-64,-70),(131,65)))
+        self.assertRaises(ValueError, ChunkedMaze().get_boundingbox)
+
+    def test_equality_with_dict_maze(self):
+        chunked = ChunkedMaze()
+        maze = Maze()
+        for (coordinate, tile) in self.tiles.items():
+            chunked.add_tile(coordinate, tile)
+            maze.add_tile(coordinate, tile)
+
+        self.assertEqual(chunked, maze)
+        self.assertEqual(maze, chunked)
+
+        maze.add_tile((0,0), tiles.Seesaw())
+        self.assertNotEqual(chunked, maze)
+        self.assertNotEqual(maze, chunked)
+
+    def test_add_code_row_across_chunks(self):
+        codes = [tiles.encode(tiles.Corner(x % 4)) for x in range(150)]
+        codes[70] = tiles.NO_TILE
+
+        maze = ChunkedMaze()
+        maze.add_tile((-30 + 70, -1), tiles.Cross())
+        maze.add_code_row((-30,-1), codes)
+
+        expected = Maze()
+        expected.add_tile((-30 + 70, -1), tiles.Cross())
+        expected.add_code_row((-30,-1), codes)
+        self.assertEqual(maze, expected)
+
+    def test_from_grid(self):
+        grid = [[(x + y) % 16 for x in range(100)] for y in range(70)]
+        self.assertEqual(ChunkedMaze.from_grid(grid, origin=(-50,-20)),
+                         Maze.from_grid(grid, origin=(-50,-20)))
+
+    def test_add_tiles(self):
+        maze = ChunkedMaze()
+        maze.add_tiles(self.tiles.keys(), self.tiles.values())
+        self.assertEqual(dict(iter(maze)), self.tiles)
+
+    def test_get_code(self):
+        maze = ChunkedMaze()
+        maze.add_tile((-1,-70), tiles.T(2))
+        self.assertEqual(maze.get_code((-1,-70)), tiles.encode(tiles.T(2)))
+        self.assertEqual(maze.get_code((0,-70)), tiles.NO_TILE)
+        self.assertEqual(maze.get_code((500,500)), tiles.NO_TILE)
+
+    def test_tile_type_is_preserved(self):
+        maze = ChunkedMaze()
+        maze.add_tile((0,0), tiles.Seesaw())
+        self.assertNotEqual(maze.get_tile((0,0)), tiles.Straight())
+
+    def test_region_queries(self):
+        maze = ChunkedMaze()
+        reference = Maze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+            reference.add_tile(coordinate, tile)
+        maze.build_spatial_index()
+        for box in (((-70,-80), (140,70)), ((-2,-71), (2,1)), ((5,5), (6,6))):
+            self.assertEqual(list(maze.iter_region(box)),
+                             list(reference.iter_region(box)))
+            self.assertEqual(maze.code_grid(box), reference.code_grid(box))
+        self.assertEqual(list(maze.iter_rows()), list(reference.iter_rows()))
+        self.assertEqual(list(maze.iter_edges()), list(reference.iter_edges()))
+
+    def test_sparse_region_queries(self):
+        maze = ChunkedMaze()
+        maze.add_tile((0,0), tiles.Straight(0))
+        maze.add_tile((3000,3000), tiles.Corner(1))
+        maze.add_tile((3001,3000), tiles.Straight(1))
+        self.assertEqual([(y, [x for (x, tile) in row])
+                          for (y, row) in maze.iter_rows()],
+                         [(0, [0]), (3000, [3000, 3001])])
+        self.assertEqual([(coordinate, direction) for (coordinate, direction,
+                                                       tile, neighbour)
+                          in maze.iter_edges()],
+                         [((3000,3000), tiles.Tile.EAST)])
+        self.assertEqual(list(maze.iter_region(((-5,-5), (5000,2999)))),
+                         [((0,0), tiles.Straight(0))])
+
+    def test_batch_queries(self):
+        maze = ChunkedMaze()
+        reference = Maze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+            reference.add_tile(coordinate, tile)
+        xs = [x for (x, y) in self.tiles] + [1, 2, 1000]
+        ys = [y for (x, y) in self.tiles] + [1, 0, -1000]
+        self.assertEqual(maze.walls_at(xs, ys), reference.walls_at(xs, ys))
+        directions = [index % 4 for index in range(len(xs))]
+        self.assertEqual(maze.is_open_batch(xs, ys, directions),
+                         reference.is_open_batch(xs, ys, directions))
+
+class Test_ChunkedMazeFork(unittest.TestCase):
+    """
+    Test of copy on write forks of a ChunkedMaze
+    """
+
+    def setUp(self):
+        self.maze = ChunkedMaze()
+        for x in range(-10, 100):
+            self.maze.add_tile((x, 3), tiles.Straight(1))
+
+    def test_fork_is_equal(self):
+        fork = self.maze.fork()
+        self.assertEqual(fork, self.maze)
+
+    def test_fork_shares_chunks(self):
+        fork = self.maze.fork()
+        self.assertEqual(
+            {id(chunk) for (origin, chunk) in fork.iter_chunks()},
+            {id(chunk) for (origin, chunk) in self.maze.iter_chunks()})
+
+    def test_modifying_fork_leaves_original_untouched(self):
+        fork = self.maze.fork()
+        fork.add_tile((0, 3), tiles.Cross())
+        fork.add_tile((500, 500), tiles.Cross())
+
+        self.assertEqual(self.maze.get_tile((0, 3)), tiles.Straight(1))
+        self.assertIsNone(self.maze.get_tile((500, 500)))
+        self.assertEqual(fork.get_tile((0, 3)), tiles.Cross())
+
+        # only the modified chunk got copied
+        shared = {id(chunk) for (origin, chunk) in self.maze.iter_chunks()} & \
+                 {id(chunk) for (origin, chunk) in fork.iter_chunks()}
+        self.assertEqual(len(shared), 2)
+
+    def test_modifying_original_leaves_snapshot_untouched(self):
+        snapshot = self.maze.snapshot()
+        self.maze.add_tile((5, 3), tiles.Closed())
+        self.assertEqual(snapshot.get_tile((5, 3)), tiles.Straight(1))
+        self.assertEqual(self.maze.get_tile((5, 3)), tiles.Closed())
+
+    def test_pickle(self):
+        fork = self.maze.fork()
+        clone = pickle.loads(pickle.dumps(fork))
+        self.assertEqual(clone, self.maze)
+        clone.add_tile((0, 3), tiles.Cross())
+        self.assertEqual(fork.get_tile((0, 3)), tiles.Straight(1))
+
+    def test_pickle_with_fork(self):
+        fork = self.maze.fork()
+        for (maze, clone) in (pickle.loads(pickle.dumps([self.maze, fork])),
+                              copy.deepcopy([self.maze, fork])):
+            clone.add_tile((0, 3), tiles.Cross())
+            maze.add_tile((1, 3), tiles.Closed())
+            self.assertEqual(maze.get_tile((0, 3)), tiles.Straight(1))
+            self.assertEqual(clone.get_tile((1, 3)), tiles.Straight(1))
+            self.assertEqual(clone.get_tile((0, 3)), tiles.Cross())
+            self.assertEqual(maze.get_tile((1, 3)), tiles.Closed())
+
+    def test_fork_of_fork(self):
+        fork1 = self.maze.fork()
+        fork2 = fork1.fork()
+        fork1.add_tile((1, 3), tiles.T())
+        fork2.add_tile((1, 3), tiles.Corner())
+        self.assertEqual(self.maze.get_tile((1, 3)), tiles.Straight(1))
+        self.assertEqual(fork1.get_tile((1, 3)), tiles.T())
+        self.assertEqual(fork2.get_tile((1, 3)), tiles.Corner())
+
+
+class Test_TileCodes(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for cls in tiles.TILE_TYPES[1:]:
+            for rotations in range(4):
+                tile = cls(rotations)
+                self.assertEqual(tiles.decode(tiles.encode(tile)), tile)
+
+    def test_wall_mask(self):
+        self.assertEqual(tiles.Straight().wall_mask(), 0b1010)
+        self.assertEqual(tiles.Corner(1).wall_mask(), 0b0011)
+
+    def test_no_tile(self):
+        self.assertIsNone(tiles.decode(tiles.NO_TILE))
+
+    def test_pickle(self):
+        for tile in (tiles.Corner(3), tiles.Seesaw(1, passable=False),
+                     tiles.Tile([0, 1, 1, 0])):
+            self.assertEqual(pickle.loads(pickle.dumps(tile)), tile)
+            self.assertEqual(copy.deepcopy(tile), tile)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import random
+
+from .corridors import *
+from .assertions import PathAssertions
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .maze import Maze
+
+
+class Test_CorridorGraph(PathAssertions, unittest.TestCase):
+    """
+    Test of the CorridorGraph class
+    """
+
+    def test_matches_bfs(self):
+        generator = random.Random(4)
+        for (straightness, loops) in ((0.0, 0.0), (0.9, 0.0), (0.5, 0.1)):
+            maze = perfect_maze(15, 12, seed=5, straightness=straightness,
+                                loops=loops)
+            grid = MazeGrid(maze)
+            graph = CorridorGraph(grid)
+            self.assertLess(graph.node_count(), 15 * 12)
+            for query in range(100):
+                start = (generator.randrange(15), generator.randrange(12))
+                goal = (generator.randrange(15), generator.randrange(12))
+                expected = grid.shortest_path(start, goal)
+                path = graph.shortest_path(start, goal)
+                self.assertEqual(len(path), len(expected))
+                self.assertValidPath(grid, path, start, goal)
+
+    def test_straight_corridor(self):
+        # a dead end, 8 straights and a dead end
+        maze = Maze.from_grid([[0b1101] + [0b0101] * 8 + [0b0111]])
+        graph = CorridorGraph(maze)
+        self.assertEqual(graph.node_count(), 2)
+        self.assertEqual(len(graph.chains), 1)
+        self.assertEqual(graph.shortest_path((2, 0), (6, 0)),
+                         [(x, 0) for x in range(2, 7)])
+        self.assertEqual(graph.shortest_path((7, 0), (1, 0)),
+                         [(x, 0) for x in range(7, 0, -1)])
+        self.assertEqual(graph.shortest_path((0, 0), (9, 0)),
+                         [(x, 0) for x in range(10)])
+
+    def test_keep(self):
+        maze = Maze.from_grid([[0b1101] + [0b0101] * 8 + [0b0111]])
+        graph = CorridorGraph(maze, keep=[(4, 0)])
+        self.assertEqual(graph.node_count(), 3)
+        self.assertEqual(graph.shortest_path((2, 0), (6, 0)),
+                         [(x, 0) for x in range(2, 7)])
+
+    def test_closed_loop(self):
+        # a 2x2 loop of corners has no junction at all
+        maze = Maze.from_grid([[0b1001, 0b0011],
+                               [0b1100, 0b0110]])
+        graph = CorridorGraph(maze)
+        self.assertEqual(graph.node_count(), 1)
+        self.assertEqual(len(graph.shortest_path((0, 0), (1, 1))), 3)
+        self.assertEqual(len(graph.shortest_path((1, 0), (0, 1))), 3)
+
+    def test_unreachable(self):
+        maze = Maze.from_grid([[0b1011, 0b1110]])
+        graph = CorridorGraph(maze)
+        self.assertIsNone(graph.shortest_path((0, 0), (1, 0)))
+        self.assertIsNone(graph.shortest_path((0, 0), (9, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
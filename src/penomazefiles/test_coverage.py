@@ -0,0 +1,83 @@
+import unittest
+
+from .coverage import *
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .grid import OFFSETS
+from .maze import Maze
+from .tiles import Tile
+from . import tiles
+
+
+class Test_PathMoves(unittest.TestCase):
+
+    def test_moves(self):
+        path = [(0, 0), (0, 1), (1, 1), (1, 0), (1, 1)]
+        self.assertEqual(path_moves(path, Tile.NORTH), ('UFLFLFUF', Tile.SOUTH))
+        self.assertEqual(path_moves(path, Tile.SOUTH), ('FLFLFUF', Tile.SOUTH))
+        self.assertEqual(path_moves([(3, 3)], Tile.EAST), ('', Tile.EAST))
+
+
+class Test_CoveragePlanner(unittest.TestCase):
+    """
+    Test of the CoveragePlanner class
+    """
+
+    def assertValidTour(self, grid, tour, start, heading):
+        self.assertEqual(tour.path[0], start)
+        for (a, b) in zip(tour.path, tour.path[1:]):
+            self.assertIn(grid.index(b), grid.neighbours(grid.index(a)))
+
+        # driving the moves retraces the path
+        ((x, y), path) = (start, [start])
+        for command in tour.moves:
+            if command == FORWARD:
+                (x, y) = (x + OFFSETS[heading][0], y + OFFSETS[heading][1])
+                path.append((x, y))
+            else:
+                heading = (heading + {LEFT: 3, RIGHT: 1, U_TURN: 2}[command]) % 4
+        self.assertEqual(path, tour.path)
+        self.assertEqual(heading, tour.heading)
+
+    def test_perfect_maze(self):
+        maze = perfect_maze(15, 12, seed=4)
+        grid = MazeGrid(maze)
+        tour = CoveragePlanner(grid, (7, 6), Tile.EAST).plan()
+        self.assertValidTour(grid, tour, (7, 6), Tile.EAST)
+        self.assertEqual(len(set(tour.path)), 15 * 12)
+        # the optimal tour of a tree ends in a tile farthest from the start
+        farthest = max(len(grid.shortest_path((7, 6), coordinate))
+                       for (coordinate, tile) in maze) - 1
+        self.assertEqual(tour.length, 2 * (15 * 12 - 1) - farthest)
+
+    def test_loops(self):
+        for seed in range(3):
+            maze = perfect_maze(15, 12, seed=seed, loops=0.3)
+            grid = MazeGrid(maze)
+            tour = CoveragePlanner(maze, (0, 0)).plan(time_budget=0.5)
+            self.assertValidTour(grid, tour, (0, 0), Tile.NORTH)
+            self.assertEqual(len(set(tour.path)), 15 * 12)
+            self.assertLess(tour.length, 2 * (15 * 12 - 1))
+
+    def test_reachable_only(self):
+        maze = Maze.from_grid([[0b1001, 0b0011, 0b1111],
+                               [0b1100, 0b0110, 0b1111]])
+        tour = CoveragePlanner(maze, (0, 0), Tile.EAST).plan()
+        self.assertEqual(len(set(tour.path)), 4)
+        self.assertEqual(tour.length, 3)
+        self.assertEqual(tour.moves, 'FRFRF')
+
+    def test_single_tile(self):
+        maze = Maze()
+        maze.add_tile((0, 0), tiles.Closed())
+        tour = CoveragePlanner(maze, (0, 0)).plan()
+        self.assertEqual((tour.path, tour.moves, tour.length), ([(0, 0)], '', 0))
+
+    def test_no_tile(self):
+        maze = Maze()
+        maze.add_tile((0, 0), tiles.Cross())
+        self.assertRaises(ValueError, CoveragePlanner, maze, (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from . import deadends
+from .deadends import *
+from .assertions import PathAssertions
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .maze import Maze
+
+
+class Test_DeadEndFiller(PathAssertions, unittest.TestCase):
+    """
+    Test of the DeadEndFiller class
+    """
+
+    def setUp(self):
+        self.min_fill = deadends._MIN_FILL
+
+    def tearDown(self):
+        deadends._MIN_FILL = self.min_fill
+
+    def test_perfect_maze(self):
+        grid = MazeGrid(perfect_maze(23, 17, seed=2))
+        # whole-grid passes only, a walk after the first pass, the default
+        for min_fill in (0, 1, self.min_fill):
+            deadends._MIN_FILL = min_fill
+            filler = DeadEndFiller(grid)
+            for (start, goal) in (((0, 0), (22, 16)), ((5, 9), (17, 2)),
+                                  ((4, 4), (4, 4))):
+                (corridor, path) = filler.solve(start, goal)
+                self.assertEqual(path, grid.shortest_path(start, goal))
+                # only the solution is left open
+                self.assertEqual(sorted(grid.index(coordinate)
+                                        for coordinate in path),
+                                 [index for (index, flag) in enumerate(corridor)
+                                  if flag])
+
+    def test_loops(self):
+        maze = perfect_maze(23, 17, seed=2, loops=0.3, origin=(-4, 3))
+        grid = MazeGrid(maze)
+        for min_fill in (0, 1):
+            deadends._MIN_FILL = min_fill
+            (corridor, path) = DeadEndFiller(maze).solve((-4, 3), (18, 19))
+            self.assertValidPath(grid, path, (-4, 3), (18, 19))
+            self.assertEqual(len(path),
+                             len(grid.shortest_path((-4, 3), (18, 19))))
+            self.assertTrue(all(corridor[grid.index(coordinate)]
+                                for coordinate in path))
+            self.assertGreater(sum(corridor), len(path))
+
+    def test_unreachable(self):
+        # a U shaped corridor over a straight corridor
+        maze = Maze.from_grid([[0b1101, 0b0101, 0b0011],
+                               [0b1101, 0b0101, 0b0110],
+                               [0b1101, 0b0101, 0b0111]])
+        filler = DeadEndFiller(maze)
+        (corridor, path) = filler.solve((0, 0), (0, 2))
+        self.assertIsNone(path)
+        self.assertEqual(corridor, bytearray([1, 0, 0, 0, 0, 0, 1, 0, 0]))
+        (corridor, path) = filler.solve((0, 0), (0, 1))
+        self.assertEqual(path, [(0, 0), (1, 0), (2, 0), (2, 1), (1, 1), (0, 1)])
+        self.assertRaises(ValueError, filler.solve, (0, 0), (5, 5))
+
+    def test_no_tile(self):
+        maze = Maze.from_grid([[0b1101, 0b0111]])
+        maze.remove_tile((1, 0))
+        maze.add_tile((2, 0), maze.get_tile((0, 0)))
+        self.assertRaises(ValueError, DeadEndFiller(maze).fill, [(1, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
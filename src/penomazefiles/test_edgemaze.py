@@ -0,0 +1,156 @@
+import unittest
+import pickle
+import random
+from .edgemaze import *
+from .generator import perfect_maze
+from .maze import Maze
+from .maze import are_walls_consistent
+from .maze import inconsistent_borders
+from .tiles import Tile
+
+from . import tiles
+
+
+class Test_EdgeMaze(unittest.TestCase):
+    """
+    Test of the EdgeMaze class
+    """
+
+    def setUp(self):
+        self.tiles = {(0,0): tiles.Straight(0),
+                      (0,-1): tiles.Straight(0),
+                      (-1,-70): tiles.T(2),
+                      (130,5): tiles.Seesaw(1),
+                      (-64,64): tiles.Closed()}
+
+    def test_add_and_get_tile(self):
+        maze = EdgeMaze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+
+        for (coordinate, tile) in self.tiles.items():
+            self.assertEqual(maze.get_tile(coordinate), tile)
+        self.assertIsNone(maze.get_tile((1,0)))
+        self.assertIsNone(maze.get_tile((-1000,1000)))
+        self.assertEqual(maze.get_boundingbox(), ((-64,-70), (131,65)))
+
+    def test_shared_border(self):
+        maze = EdgeMaze()
+        maze.add_tile((0,0), tiles.Cross())
+        maze.add_tile((1,0), tiles.Closed())
+        # the wall of the closed tile is the wall of the cross
+        self.assertTrue(maze.has_wall((0,0), Tile.EAST))
+        self.assertEqual(maze.get_tile((0,0)), tiles.T(1))
+        self.assertTrue(are_walls_consistent(maze))
+
+        (converted, conflicts) = maze.to_maze()
+        self.assertEqual(conflicts, {(0,0)})
+        self.assertEqual(converted.get_tile((0,0)), tiles.T(1))
+
+    def test_seesaw(self):
+        maze = EdgeMaze()
+        maze.add_tile((0,0), tiles.Seesaw(2, passable=False))
+        self.assertEqual(maze.get_tile((0,0)), tiles.Seesaw(2, passable=False))
+        self.assertEqual(maze.to_maze()[1], set())
+        # a wall across the track of the seesaw
+        maze.add_tile((0,1), tiles.Closed())
+        self.assertEqual(maze.to_maze()[1], {(0,0)})
+
+    def test_remove_tile(self):
+        maze = EdgeMaze()
+        maze.add_tile((1,0), tiles.Cross())
+        maze.add_tile((0,0), tiles.Closed())
+        maze.remove_tile((0,0))
+        maze.remove_tile((5,5))
+        self.assertIsNone(maze.get_tile((0,0)))
+        self.assertEqual(maze.get_boundingbox(), ((1,0), (2,1)))
+        self.assertEqual(maze.get_tile((1,0)), tiles.T(3))
+
+    def test_from_maze(self):
+        reference = perfect_maze(30, 20, seed=3, loops=0.1)
+        (maze, conflicts) = EdgeMaze.from_maze(reference)
+        self.assertEqual(conflicts, set())
+        self.assertEqual(maze, reference)
+        self.assertEqual(maze.code_grid(), reference.code_grid())
+        self.assertEqual(maze.to_maze(), (reference, set()))
+
+        reference.add_tile((3,3), tiles.Cross())
+        reference.add_tile((4,3), tiles.Closed())
+        (maze, conflicts) = EdgeMaze.from_maze(reference)
+        self.assertEqual(conflicts, inconsistent_borders(reference))
+        # the wall wins
+        self.assertTrue(maze.has_wall((3,3), Tile.EAST))
+
+        self.assertEqual(EdgeMaze.from_maze(Maze())[1], set())
+
+    def test_grow(self):
+        reference = perfect_maze(12, 9, seed=2)
+        items = list(reference)
+        random.Random(1).shuffle(items)
+        (maze, expected) = (EdgeMaze(), Maze())
+        for ((x, y), tile) in items:
+            maze.add_tile((x - 50, y - 5), tile)
+            expected.add_tile((x - 50, y - 5), tile)
+        self.assertEqual(maze, expected)
+        self.assertEqual(maze.get_boundingbox(), ((-50,-5), (-38,4)))
+        for ((x, y), tile) in expected:
+            for direction in range(4):
+                self.assertEqual(maze.has_wall((x, y), direction),
+                                 tile.has_wall(direction))
+
+    def test_add_code_row(self):
+        maze = EdgeMaze()
+        maze.add_code_row((-2,4), bytes([0, tiles.MASK_CODES[0b1010],
+                                         tiles.MASK_CODES[0b1010], 0]))
+        self.assertEqual(maze._tiles_dict(),
+                         {(-1,4): tiles.Straight(), (0,4): tiles.Straight()})
+
+    def test_code_grid(self):
+        maze = EdgeMaze()
+        maze.add_tile((0,0), tiles.Corner(1))
+        grid = maze.code_grid(((-1,0), (2,2)))
+        self.assertEqual(grid, bytes([0, tiles.encode(tiles.Corner(1)), 0,
+                                      0, 0, 0]))
+
+    def test_fork_and_pickle(self):
+        maze = EdgeMaze()
+        for (coordinate, tile) in self.tiles.items():
+            maze.add_tile(coordinate, tile)
+        fork = maze.fork()
+        fork.add_tile((0,0), tiles.Cross())
+        self.assertEqual(maze.get_tile((0,0)), tiles.Straight(0))
+        self.assertEqual(pickle.loads(pickle.dumps(maze)), maze)
+
+    def test_empty(self):
+        maze = EdgeMaze()
+        self.assertEqual(list(maze), [])
+        self.assertFalse(maze.has_wall((0,0), Tile.NORTH))
+        self.assertRaises(ValueError, maze.get_boundingbox)
+
+    def test_region_queries(self):
+        reference = perfect_maze(9, 7, seed=5, origin=(-3, 2))
+        reference.remove_tile((0, 4))
+        (maze, conflicts) = EdgeMaze.from_maze(reference)
+        maze.build_spatial_index()
+        for box in (((-5,0), (8,12)), ((-1,3), (2,5)), ((20,20), (21,21))):
+            self.assertEqual(list(maze.iter_region(box)),
+                             list(reference.iter_region(box)))
+        self.assertEqual(list(maze.iter_rows()), list(reference.iter_rows()))
+        self.assertEqual(list(maze.iter_edges()), list(reference.iter_edges()))
+        self.assertEqual(maze.neighbours((0, 3)), reference.neighbours((0, 3)))
+
+    def test_batch_queries(self):
+        reference = perfect_maze(19, 7, seed=5, origin=(-3, 2), loops=0.2)
+        reference.remove_tile((0, 4))
+        (maze, conflicts) = EdgeMaze.from_maze(reference)
+        xs = [x for x in range(-5, 18) for y in range(0, 11)]
+        ys = [y for x in range(-5, 18) for y in range(0, 11)]
+        self.assertEqual(maze.walls_at(xs, ys), reference.walls_at(xs, ys))
+        for direction in range(4):
+            self.assertEqual(maze.is_open_batch(xs, ys, [direction] * len(xs)),
+                             reference.is_open_batch(xs, ys,
+                                                     [direction] * len(xs)))
+
+
+if __name__ == '__main__':
+    unittest.main()
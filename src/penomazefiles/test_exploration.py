@@ -0,0 +1,104 @@
+import unittest
+
+from .exploration import *
+from .generator import perfect_maze
+from .grid import OFFSETS
+from .tiles import Tile
+from . import tiles
+
+
+class Test_ExplorationMap(unittest.TestCase):
+    """
+    Test of the ExplorationMap class
+    """
+
+    def test_edges(self):
+        exploration = ExplorationMap()
+        self.assertEqual(exploration.edge((0, 0), Tile.EAST), UNKNOWN)
+        exploration.observe((0, 0), Tile.EAST, True)
+        self.assertEqual(exploration.edge((0, 0), Tile.EAST), WALL)
+        self.assertEqual(exploration.edge((1, 0), Tile.WEST), WALL)
+        exploration.ingest([((1, 0), Tile.WEST, False),
+                            ((0, 0), Tile.NORTH, False)])
+        self.assertEqual(exploration.edge((0, 0), Tile.EAST), OPEN)
+        self.assertEqual(exploration.edge((0, -1), Tile.SOUTH), OPEN)
+        self.assertEqual(exploration.edge((0, 0), Tile.WEST), UNKNOWN)
+        self.assertFalse(exploration.is_visited((0, 0)))
+        # only borders of visited tiles are frontier borders
+        self.assertEqual(len(exploration.frontier), 0)
+        self.assertIsNone(exploration.next_frontier())
+
+    def test_frontier(self):
+        exploration = ExplorationMap()
+        exploration.visit((0, 0), tiles.T(0))
+        # T(0) has a wall to the north
+        self.assertEqual(set(exploration.frontier),
+                         {((0, 0), Tile.EAST), ((0, 0), Tile.SOUTH),
+                          ((0, 0), Tile.WEST)})
+        self.assertEqual(exploration.next_frontier(), ((0, 0), Tile.WEST))
+
+        # a sensor sees a wall after all
+        exploration.observe((-1, 0), Tile.EAST, True)
+        self.assertNotIn(((0, 0), Tile.WEST), exploration.frontier)
+        self.assertEqual(exploration.next_frontier(), ((0, 0), Tile.SOUTH))
+
+        # visiting a tile removes the borders leading to it
+        exploration.visit((0, 1), tiles.Straight(0))
+        self.assertEqual(set(exploration.frontier),
+                         {((0, 0), Tile.EAST), ((0, 1), Tile.SOUTH)})
+        exploration.visit((1, 0), tiles.DeadEnd(1))
+        exploration.visit((0, 2), tiles.Closed())
+        self.assertEqual(sorted(exploration.visited()),
+                         [(0, 0), (0, 1), (0, 2), (1, 0)])
+        self.assertIsNone(exploration.next_frontier())
+
+        # a wall turns out to be open
+        exploration.observe((0, 2), Tile.EAST, False)
+        self.assertEqual(exploration.next_frontier(), ((0, 2), Tile.EAST))
+
+    def test_frontier_seeding(self):
+        exploration = ExplorationMap()
+        # borders seen ahead of the robot, neither tile is visited
+        exploration.ingest([((2, 0), Tile.EAST, False),
+                            ((3, 0), Tile.SOUTH, False)])
+        self.assertIsNone(exploration.next_frontier())
+        # visiting one of the tiles of a border seeds the frontier
+        exploration.visit((3, 0), tiles.Straight(1))
+        self.assertEqual(set(exploration.frontier),
+                         {((3, 0), Tile.EAST), ((3, 0), Tile.WEST)})
+        # the walls of the tile replace the observation of the sensor
+        self.assertEqual(exploration.edge((3, 0), Tile.SOUTH), WALL)
+        exploration.visit((2, 0), tiles.Closed())
+        self.assertEqual(set(exploration.frontier), {((3, 0), Tile.EAST)})
+
+    def test_to_maze(self):
+        exploration = ExplorationMap()
+        exploration.visit((0, 0), tiles.Cross())
+        exploration.visit((0, 1), tiles.Seesaw(0, passable=False))
+        exploration.visit((1, 0), tiles.Closed())
+        exploration.observe((2, 2), Tile.NORTH, False)
+
+        maze = exploration.to_maze()
+        # the Closed tile put a wall across the east side of the Cross
+        self.assertEqual(sorted(maze),
+                         [((0, 0), tiles.T(1)),
+                          ((0, 1), tiles.Seesaw(0, passable=False)),
+                          ((1, 0), tiles.Closed())])
+
+    def test_explore_maze(self):
+        maze = perfect_maze(15, 12, seed=3, loops=0.2, origin=(-3, 2))
+        exploration = ExplorationMap()
+        exploration.visit((-3, 2), maze.get_tile((-3, 2)))
+        steps = 0
+        while exploration.next_frontier() is not None:
+            ((x, y), direction) = exploration.next_frontier()
+            coordinate = (x + OFFSETS[direction][0], y + OFFSETS[direction][1])
+            self.assertFalse(exploration.is_visited(coordinate))
+            exploration.visit(coordinate, maze.get_tile(coordinate))
+            steps += 1
+        self.assertEqual(steps, 15 * 12 - 1)
+        self.assertEqual(exploration.to_maze(), maze)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import unittest
+import os
+import random
+import struct
+import tempfile
+import zipfile
+
+from .export import *
+from .export import _write_npy
+from .maze import Maze
+from .chunkedmaze import ChunkedMaze
+from .tiles import Tile
+from . import tiles
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Test_MazeArrays(unittest.TestCase):
+    """
+    Test of the export of a maze to dense arrays
+    """
+
+    def setUp(self):
+        generator = random.Random(5)
+        self.maze = Maze()
+        for y in range(-3, 4):
+            for x in range(-2, 6):
+                if generator.random() < 0.8:
+                    self.maze.add_tile((x, y), tiles.from_wall_mask(
+                        generator.randrange(16)))
+
+    def test_planes(self):
+        arrays = MazeArrays.from_maze(self.maze)
+        ((min_x, min_y), (max_x, max_y)) = self.maze.get_boundingbox()
+        self.assertEqual(arrays.origin, (min_x, min_y))
+        self.assertEqual(arrays.walls.shape, (max_y - min_y, max_x - min_x))
+
+        def wall(coordinate, direction):
+            tile = self.maze.get_tile(coordinate)
+            return tile is not None and tile.has_wall(direction)
+
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                (i, j) = (y - min_y, x - min_x)
+                tile = self.maze.get_tile((x, y))
+                if y < max_y and x < max_x:
+                    self.assertEqual(arrays.present[i, j], tile is not None)
+                    self.assertEqual(arrays.walls[i, j],
+                                     0 if tile is None else tile.wall_mask())
+                if x < max_x:
+                    self.assertEqual(arrays.horizontal[i, j],
+                                     wall((x, y), Tile.NORTH) or
+                                     wall((x, y-1), Tile.SOUTH))
+                if y < max_y:
+                    self.assertEqual(arrays.vertical[i, j],
+                                     wall((x, y), Tile.WEST) or
+                                     wall((x-1, y), Tile.EAST))
+
+    def test_chunked_backend(self):
+        chunked = ChunkedMaze()
+        chunked.add_tiles(iter(self.maze))
+        self.assertEqual(MazeArrays.from_maze(chunked).codes.tolist(),
+                         MazeArrays.from_maze(self.maze).codes.tolist())
+
+    def test_boundingbox(self):
+        arrays = MazeArrays.from_maze(self.maze, ((0, 0), (2, 1)))
+        self.assertEqual(arrays.codes.tolist(),
+                         [[tiles.encode(self.maze.get_tile((x, 0)))
+                           if self.maze.get_tile((x, 0)) else 0
+                           for x in range(2)]])
+
+    def test_to_maze(self):
+        self.assertEqual(MazeArrays.from_maze(self.maze).to_maze(), self.maze)
+
+    def test_save_and_load(self):
+        arrays = MazeArrays.from_maze(self.maze)
+        (handle, path) = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+        try:
+            arrays.save(path)
+            for mmap_mode in (True, False):
+                loaded = MazeArrays.load(path, mmap_mode)
+                self.assertEqual(loaded.origin, arrays.origin)
+                for name in MazeArrays.NAMES:
+                    self.assertEqual(getattr(loaded, name).tolist(),
+                                     getattr(arrays, name).tolist())
+                self.assertEqual(loaded.to_maze(), self.maze)
+                self.assertEqual(loaded.codes.readonly, mmap_mode)
+                del loaded
+        finally:
+            os.remove(path)
+
+    def test_load_validates_arrays(self):
+        arrays = MazeArrays.from_maze(self.maze)
+        (handle, path) = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+
+        def save(**changes):
+            members = {name: ('|u1', getattr(arrays, name).shape,
+                              getattr(arrays, name))
+                       for name in MazeArrays.NAMES}
+            members['origin'] = ('<i8', (2,), struct.pack('<2q', 0, 0))
+            members.update(changes)
+            with zipfile.ZipFile(path, 'w') as archive:
+                for (name, member) in members.items():
+                    if member is not None:
+                        _write_npy(archive, name, *member)
+
+        walls = arrays.walls
+        try:
+            for changes in (
+                    {'walls': ('<i8', walls.shape, walls)},
+                    {'walls': ('|u1', walls.shape, walls.tobytes()[1:])},
+                    {'walls': ('|u1', walls.shape, walls.tobytes() + b'\0')},
+                    {'walls': ('|u1', walls.shape[::-1], walls)},
+                    {'origin': ('<i8', (1,), struct.pack('<q', 0))},
+                    {'present': None}):
+                save(**changes)
+                for mmap_mode in (True, False):
+                    with self.assertRaises(ValueError):
+                        MazeArrays.load(path, mmap_mode)
+
+            # a fortran ordered array
+            save()
+            with zipfile.ZipFile(path) as archive:
+                data = {info.filename: archive.read(info)
+                        for info in archive.infolist()}
+            data['walls.npy'] = data['walls.npy'].replace(
+                b"'fortran_order': False", b"'fortran_order': True ")
+            with zipfile.ZipFile(path, 'w') as archive:
+                for (name, member) in data.items():
+                    archive.writestr(name, member)
+            with self.assertRaises(ValueError):
+                MazeArrays.load(path)
+        finally:
+            os.remove(path)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        arrays = MazeArrays.from_maze(self.maze)
+        (handle, path) = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+        try:
+            arrays.save(path)
+            with numpy.load(path) as saved:
+                for name in MazeArrays.NAMES:
+                    self.assertEqual(saved[name].tolist(),
+                                     getattr(arrays, name).tolist())
+        finally:
+            os.remove(path)
+
+        walls = arrays.as_numpy()['walls']
+        walls[0, 0] = 7
+        self.assertEqual(arrays.walls[0, 0], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
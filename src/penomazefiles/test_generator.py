@@ -0,0 +1,39 @@
+import unittest
+
+from .generator import *
+from .chunkedmaze import ChunkedMaze
+from .grid import MazeGrid
+from .maze import are_walls_consistent
+
+
+class Test_PerfectMaze(unittest.TestCase):
+
+    def count_passages(self, maze):
+        grid = MazeGrid(maze)
+        return sum(bin(mask).count('1') for mask in grid.passable) // 2
+
+    def test_perfect(self):
+        maze = perfect_maze(12, 9, seed=3)
+        self.assertEqual(maze.get_boundingbox(), ((0, 0), (12, 9)))
+        self.assertTrue(are_walls_consistent(maze))
+        # a spanning tree of the tiles
+        self.assertEqual(self.count_passages(maze), 12 * 9 - 1)
+        grid = MazeGrid(maze)
+        self.assertIsNotNone(grid.shortest_path((0, 0), (11, 8)))
+
+    def test_loops(self):
+        maze = perfect_maze(12, 9, seed=3, loops=0.2)
+        self.assertTrue(are_walls_consistent(maze))
+        self.assertGreater(self.count_passages(maze), 12 * 9 - 1)
+
+    def test_reproducible(self):
+        self.assertEqual(perfect_maze(5, 5, seed=1), perfect_maze(5, 5, seed=1))
+
+    def test_origin_and_class(self):
+        maze = perfect_maze(3, 2, seed=1, origin=(-1, -1), maze_class=ChunkedMaze)
+        self.assertIsInstance(maze, ChunkedMaze)
+        self.assertEqual(maze.get_boundingbox(), ((-1, -1), (2, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
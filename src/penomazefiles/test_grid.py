@@ -0,0 +1,100 @@
+import unittest
+import random
+
+from .grid import *
+from .maze import Maze
+from . import tiles
+
+
+class Test_MazeGrid(unittest.TestCase):
+    """
+    Test of the MazeGrid class
+    """
+
+    def setUp(self):
+        generator = random.Random(11)
+        self.maze = Maze()
+        for y in range(-2, 6):
+            for x in range(-4, 7):
+                if generator.random() < 0.9:
+                    self.maze.add_tile((x, y), tiles.from_wall_mask(
+                        generator.choice([0, 0, 1, 2, 4, 8, 5, 10, 3])))
+
+    def test_passable(self):
+        grid = MazeGrid(self.maze)
+        for y in range(-2, 6):
+            for x in range(-4, 7):
+                tile = self.maze.get_tile((x, y))
+                expected = 0
+                for (direction, (dx, dy)) in enumerate(OFFSETS):
+                    neighbour = self.maze.get_tile((x + dx, y + dy))
+                    if tile is not None and neighbour is not None and \
+                       tile.is_open(direction) and \
+                       neighbour.is_open((direction + 2) % 4):
+                        expected |= 1 << direction
+                index = grid.index((x, y))
+                self.assertEqual(grid.passable[index], expected)
+                self.assertEqual(grid.present[index], tile is not None)
+                self.assertEqual(grid.walls[index],
+                                 15 if tile is None else tile.wall_mask())
+
+    def test_decode_region(self):
+        box = ((-5, -1), (3, 4))
+        self.assertEqual(list(decode_region(box, self.maze.code_grid(box))),
+                         list(self.maze.iter_region(box)))
+
+    def test_index_and_coordinate(self):
+        grid = MazeGrid(self.maze)
+        self.assertEqual(grid.index((-4, -2)), 0)
+        self.assertEqual(grid.coordinate(grid.index((3, 4))), (3, 4))
+        self.assertTrue(grid.contains((6, 5)))
+        self.assertFalse(grid.contains((7, 5)))
+
+    def test_shortest_path(self):
+        maze = Maze.from_grid([[0b1001, 0b0101, 0b0011],
+                               [0b1110, 0b1001, 0b0110]])
+        grid = MazeGrid(maze)
+        self.assertEqual(grid.shortest_path((0, 0), (0, 1)), [(0, 0), (0, 1)])
+        self.assertEqual(grid.shortest_path((0, 0), (1, 1)),
+                         [(0, 0), (1, 0), (2, 0), (2, 1), (1, 1)])
+        self.assertIsNone(grid.shortest_path((0, 0), (5, 5)))
+
+    def test_set_tile(self):
+        grid = MazeGrid(self.maze)
+        generator = random.Random(2)
+        for step in range(50):
+            coordinate = (generator.randrange(-4, 7), generator.randrange(-2, 6))
+            tile = generator.choice([None, tiles.Seesaw(generator.randrange(4),
+                                                        generator.random() < 0.5),
+                                     tiles.from_wall_mask(generator.randrange(16))])
+            self.maze.remove_tile(coordinate)
+            if tile is not None:
+                self.maze.add_tile(coordinate, tile)
+            before = bytes(grid.passable)
+            changed = grid.set_tile(coordinate, tile)
+            expected = MazeGrid(self.maze, ((-4, -2), (7, 6)))
+            self.assertEqual(grid.passable, expected.passable)
+            self.assertEqual(grid.walls, expected.walls)
+            self.assertEqual(grid.present, expected.present)
+            self.assertEqual(grid.tile(coordinate), tile)
+            self.assertEqual(sorted(changed),
+                             [index for index in range(len(before))
+                              if before[index] != grid.passable[index]])
+        with self.assertRaises(ValueError):
+            grid.set_tile((7, 0), None)
+
+    def test_blocked_seesaw(self):
+        maze = Maze.from_grid([[0b1001, 0b0101, 0b0011]])
+        maze.add_tile((1, 0), tiles.Seesaw(1, passable=False))
+        grid = MazeGrid(maze)
+        self.assertEqual(list(grid.passable), [0, 0, 0])
+        grid.set_tile((1, 0), tiles.Seesaw(3))
+        self.assertEqual(list(grid.passable), [0b0010, 0b1010, 0b1000])
+
+    def test_unreachable(self):
+        maze = Maze.from_grid([[0b1011, 0b1110]])
+        self.assertIsNone(MazeGrid(maze).shortest_path((0, 0), (1, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import random
+
+from .hierarchical import *
+from .assertions import PathAssertions
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .maze import Maze
+from . import tiles
+
+
+class Test_HierarchicalPlanner(PathAssertions, unittest.TestCase):
+    """
+    Test of the HierarchicalPlanner class
+    """
+
+    def assertMatchesBFS(self, grid, planner, queries):
+        for (start, goal) in queries:
+            expected = grid.shortest_path(start, goal)
+            path = planner.shortest_path(start, goal)
+            if expected is None:
+                self.assertIsNone(path)
+                self.assertIsNone(planner.distance(start, goal))
+                continue
+            self.assertEqual(planner.distance(start, goal), len(expected) - 1)
+            self.assertEqual(len(path), len(expected))
+            self.assertValidPath(grid, path, start, goal)
+
+    def test_matches_bfs(self):
+        generator = random.Random(5)
+        for (cluster_size, loops) in ((5, 0.0), (4, 0.3), (1, 0.2), (40, 0.1)):
+            maze = perfect_maze(23, 17, seed=2, loops=loops, origin=(-3, 4))
+            grid = MazeGrid(maze)
+            planner = HierarchicalPlanner(maze, cluster_size)
+            queries = [((generator.randrange(-3, 20), generator.randrange(4, 21)),
+                        (generator.randrange(-3, 20), generator.randrange(4, 21)))
+                       for query in range(60)]
+            self.assertMatchesBFS(grid, planner, queries)
+
+    def test_set_tile(self):
+        generator = random.Random(6)
+        maze = perfect_maze(19, 13, seed=4, loops=0.2)
+        grid = MazeGrid(maze)
+        planner = HierarchicalPlanner(MazeGrid(maze), 4)
+        for change in range(30):
+            coordinate = (generator.randrange(19), generator.randrange(13))
+            tile = generator.choice([None, tiles.Cross(), tiles.Closed(),
+                                     tiles.Straight(generator.randrange(4)),
+                                     tiles.Seesaw(0, passable=False)])
+            grid.set_tile(coordinate, tile)
+            planner.set_tile(coordinate, tile)
+            queries = [(start, goal) for (start, goal) in
+                       [((generator.randrange(19), generator.randrange(13)),
+                         (generator.randrange(19), generator.randrange(13)))
+                        for query in range(10)]
+                       if grid.present[grid.index(start)] and
+                       grid.present[grid.index(goal)]]
+            self.assertMatchesBFS(grid, planner, queries)
+
+        # only the affected clusters were rebuilt, yet the graph is the same
+        fresh = HierarchicalPlanner(grid, 4)
+        self.assertEqual(planner.edges, fresh.edges)
+        self.assertEqual({cluster: sorted(entrances) for (cluster, entrances)
+                          in planner.entrances.items()},
+                         {cluster: sorted(entrances) for (cluster, entrances)
+                          in fresh.entrances.items()})
+
+    def test_unreachable(self):
+        # the corridor of the top row leads down to the middle row, the
+        # bottom row is a separate corridor
+        maze = Maze.from_grid([[0b1101, 0b0101, 0b0011],
+                               [0b1101, 0b0101, 0b0110],
+                               [0b1101, 0b0101, 0b0111]])
+        planner = HierarchicalPlanner(maze, 2)
+        self.assertEqual(planner.shortest_path((0, 0), (0, 1)),
+                         [(0, 0), (1, 0), (2, 0), (2, 1), (1, 1), (0, 1)])
+        self.assertIsNone(planner.shortest_path((0, 0), (2, 2)))
+        self.assertEqual(planner.shortest_path((2, 2), (2, 2)), [(2, 2)])
+        self.assertEqual(planner.distance((1, 1), (1, 1)), 0)
+
+    def test_errors(self):
+        maze = Maze.from_grid([[0b1101, 0b0111]])
+        self.assertRaises(ValueError, HierarchicalPlanner, maze, 0)
+        planner = HierarchicalPlanner(maze)
+        self.assertRaises(ValueError, planner.distance, (0, 0), (2, 0))
+        self.assertRaises(ValueError, planner.set_tile, (5, 5), tiles.Cross())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import io
+import struct
+import zlib
+
+from .imagerender import *
+from .maze import Maze
+from . import tiles
+
+
+def decode_png(data):
+    """return (width, height, rows of palette indices) of a PNG image"""
+    assert data.startswith(b'\x89PNG\r\n\x1a\n')
+    offset = 8
+    idat = b''
+    while offset < len(data):
+        (length,) = struct.unpack('>I', data[offset:offset+4])
+        tag = data[offset+4:offset+8]
+        body = data[offset+8:offset+8+length]
+        (crc,) = struct.unpack('>I', data[offset+8+length:offset+12+length])
+        assert crc == zlib.crc32(tag + body)
+        if tag == b'IHDR':
+            (width, height) = struct.unpack('>II', body[:8])
+        elif tag == b'IDAT':
+            idat += body
+        offset += 12 + length
+    raw = zlib.decompress(idat)
+    rows = [raw[y*(width+1)+1:(y+1)*(width+1)] for y in range(height)]
+    return (width, height, rows)
+
+
+class Test_PngRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.maze = Maze()
+        self.maze.add_tile((0,0), tiles.Corner(0))
+        self.maze.add_tile((1,0), tiles.Straight(1))
+        self.maze.add_tile((0,1), tiles.DeadEnd(2))
+
+    def render(self, **kwargs):
+        stream = io.BytesIO()
+        PngRenderer(scale=4, band_rows=1).render(self.maze, stream, **kwargs)
+        return decode_png(stream.getvalue())
+
+    def test_walls(self):
+        (width, height, rows) = self.render()
+        self.assertEqual((width, height), (8, 8))
+        self.assertEqual(rows[0], bytes([WALL]*8))
+        self.assertEqual(rows[1], bytes([WALL, BACKGROUND, BACKGROUND, BACKGROUND,
+                                         BACKGROUND, BACKGROUND, BACKGROUND, BACKGROUND]))
+        self.assertEqual(rows[3], bytes([WALL, BACKGROUND, BACKGROUND, BACKGROUND,
+                                         WALL, WALL, WALL, WALL]))
+        # DeadEnd(2) is open to the north
+        self.assertEqual(rows[4][0:4], bytes([WALL, BACKGROUND, BACKGROUND, WALL]))
+        self.assertEqual(rows[7][0:4], bytes([WALL]*4))
+        # there is no tile at (1,1)
+        self.assertEqual(rows[5][4:8], bytes([EMPTY]*4))
+
+    def test_path_and_markers(self):
+        (width, height, rows) = self.render(path=[(0,1), (0,0), (1,0)],
+                                            markers=[(1,0)])
+        # the path runs from the centre of (0,0) to the east and south
+        self.assertEqual(rows[2][0:4], bytes([WALL, BACKGROUND, PATH, PATH]))
+        self.assertEqual(rows[3][2], PATH)
+        self.assertEqual(rows[4][2], PATH)
+        self.assertEqual(rows[1][2], BACKGROUND)
+        self.assertEqual(rows[2][5:7], bytes([MARKER, MARKER]))
+
+    def test_scale_too_small(self):
+        with self.assertRaises(ValueError):
+            PngRenderer(scale=2)
+
+
+class Test_SvgRenderer(unittest.TestCase):
+
+    def test_merged_wall_runs(self):
+        maze = Maze()
+        for x in range(10):
+            maze.add_tile((x,0), tiles.Straight(1))
+
+        stream = io.StringIO()
+        SvgRenderer(scale=10).render(maze, stream, path=[(0,0), (1,0)],
+                                     markers=[(9,0)])
+        svg = stream.getvalue()
+
+        self.assertIn('<line x1="0" y1="0" x2="100" y2="0"/>', svg)
+        self.assertIn('<line x1="0" y1="10" x2="100" y2="10"/>', svg)
+        self.assertEqual(svg.count('<line'), 2)
+        self.assertIn('points="5,5 15,5"', svg)
+        self.assertEqual(svg.count('<circle'), 1)
+        self.assertTrue(svg.rstrip().endswith('</svg>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import os
+import random
+import tempfile
+
+from .incremental import *
+from .maze import are_walls_consistent
+from .mazefileparser import MazeFileBuilder
+
+
+class Test_IncrementalMazeParser(unittest.TestCase):
+    """
+    Test of the IncrementalMazeParser class
+    """
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), '..', 'testmazes',
+                               'demo2.consistent.maze')) as stream:
+            self.text = stream.read()
+
+    def assertMatchesBuilder(self, parser, text):
+        self.assertEqual(parser.maze, MazeFileBuilder(text.splitlines()))
+        self.assertEqual(not parser.inconsistent,
+                         are_walls_consistent(parser.maze))
+
+    def test_initial_parse(self):
+        parser = IncrementalMazeParser()
+        parser.update(self.text)
+        self.assertMatchesBuilder(parser, self.text)
+        self.assertEqual(parser.diagnostics(), [])
+
+    def test_edit_without_shift(self):
+        parser = IncrementalMazeParser()
+        parser.update(self.text)
+
+        text = self.text.replace('Cross.N T.E Closed.N DeadEnd.N.V',
+                                 'Cross.N T.E Closed.N DeadEnd.E.V')
+        affected = parser.update(text)
+        self.assertEqual(affected, {(x, 0) for x in range(10)})
+        self.assertMatchesBuilder(parser, text)
+        self.assertEqual(parser.diagnostics(), [
+            'inconsistent walls between tile (2,0) and (3,0)',
+            'inconsistent walls between tile (3,0) and (3,1)'])
+
+        # undo the edit
+        parser.update(self.text)
+        self.assertEqual(parser.diagnostics(), [])
+
+    def test_edit_with_shift(self):
+        parser = IncrementalMazeParser()
+        parser.update(self.text)
+
+        lines = self.text.splitlines()
+        index = lines.index(
+            'Cross.N T.E DeadEnd.S Straight.N.11 T.W T.E Straight.N.17 DeadEnd.S T.W Cross.N')
+        lines[index] = 'Cross.N T.E DeadEnd.S'
+        lines.insert(index + 1, '# the rest of the row')
+        lines.insert(index + 2, 'Straight.N.11 T.W T.E Straight.N.17 DeadEnd.S T.W')
+        text = '\n'.join(lines)
+        parser.update(text)
+        # one tile less, all following tiles moved one spot to the left
+        self.assertMatchesBuilder(parser, text)
+        self.assertIsNone(parser.maze.get_tile((9, 7)))
+
+    def test_invalid_token(self):
+        parser = IncrementalMazeParser()
+        parser.update(self.text)
+        text = self.text.replace('Seesaw.N DeadEnd.S', 'Seasaw.N DeadEnd.S')
+        parser.update(text)
+        self.assertIsNone(parser.maze.get_tile((3, 4)))
+        self.assertEqual(parser.diagnostics(), [
+            "line 24: tile (3,4): Invalid tile token 'Seasaw'"])
+
+    def test_to_many_tiles(self):
+        parser = IncrementalMazeParser()
+        parser.update('2 1\nCross.N Cross.N')
+        self.assertEqual(parser.diagnostics(), [])
+        parser.update('2 1\nCross.N Cross.N Cross.N')
+        self.assertEqual(parser.diagnostics(),
+                         ['line 2: tile (0,1): To many tiles'])
+        self.assertIsNone(parser.maze.get_tile((0, 1)))
+
+    def test_shift_clears_errors(self):
+        parser = IncrementalMazeParser()
+        parser.update('3 2\nCross.N Bogus.N Cross.N\nCross.N Cross.N Cross.N Cross.N')
+        self.assertEqual(parser.diagnostics(), [
+            "line 2: tile (1,0): Invalid tile token 'Bogus'",
+            'line 3: tile (0,2): To many tiles'])
+        self.assertIsNone(parser.maze.get_tile((1, 0)))
+        affected = parser.update('3 2\nCross.N Cross.N\nCross.N Cross.N Cross.N Cross.N')
+        self.assertEqual(affected, {(x, y) for x in range(3) for y in range(2)})
+        self.assertEqual(parser.diagnostics(), [])
+        self.assertEqual(len(list(parser.maze)), 6)
+        parser.update('3 2\nCross.N Cross.N\nCross.N')
+        self.assertEqual(len(list(parser.maze)), 3)
+
+    def test_dimension_change(self):
+        parser = IncrementalMazeParser()
+        parser.update('2 2\nCross.N Cross.N\nCross.N Cross.N')
+        parser.update('4 1\nCross.N Cross.N\nCross.N Cross.N')
+        self.assertEqual(parser.maze.get_boundingbox(), ((0, 0), (4, 1)))
+
+    def test_invalid_dimensions(self):
+        parser = IncrementalMazeParser()
+        parser.update('two 2\nCross.N Cross.N')
+        self.assertEqual(len(parser.diagnostics()), 1)
+
+    def test_random_edits(self):
+        generator = random.Random(7)
+        parser = IncrementalMazeParser()
+        parser.update(self.text)
+        lines = self.text.splitlines()
+        tokens = 'Cross.N T.E Closed.N Corner.S Straight.W DeadEnd.E'.split()
+        for edit in range(50):
+            index = generator.randrange(20, len(lines))
+            line = [generator.choice(tokens)
+                    for count in range(generator.randrange(8, 12))]
+            lines[index] = ' '.join(line)
+            text = '\n'.join(lines)
+            parser.update(text)
+
+            fresh = IncrementalMazeParser()
+            fresh.update(text)
+            self.assertEqual(parser.maze, fresh.maze)
+            self.assertEqual(parser.diagnostics(), fresh.diagnostics())
+
+
+class Test_MazeFileWatcher(unittest.TestCase):
+
+    def test_poll(self):
+        (handle, path) = tempfile.mkstemp(suffix='.maze')
+        os.close(handle)
+        try:
+            with open(path, 'w') as stream:
+                stream.write('2 1\nCross.N Cross.N')
+            watcher = MazeFileWatcher([path])
+            reports = watcher.poll()
+            self.assertEqual([(p, d) for (p, d, s) in reports], [(path, [])])
+            self.assertEqual(watcher.poll(), [])
+
+            with open(path, 'w') as stream:
+                stream.write('2 1\nCross.N Closed.N')
+            reports = watcher.poll()
+            self.assertEqual([(p, d) for (p, d, s) in reports], [(path, [
+                'inconsistent walls between tile (0,0) and (1,0)'])])
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
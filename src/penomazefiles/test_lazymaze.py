@@ -0,0 +1,151 @@
+import unittest
+import io
+import pickle
+import os
+import tempfile
+
+from .lazymaze import *
+from .maze import AsciiArtRenderer
+from .mazefileparser import MazeFileBuilder
+from .mazefileparser import SpecificationViolationError
+from . import tiles
+
+
+class Test_LazyMazeFile(unittest.TestCase):
+    """
+    Test of the LazyMazeFile view
+    """
+
+    def setUp(self):
+        # the rows deliberately don't match the lines of the file
+        self.lines = ['# header comment',
+                      '3 3 Straight.N',
+                      '',
+                      'Corner.E T.S # first row ends here',
+                      'DeadEnd.W.V Cross.N',
+                      '   Closed.N Seesaw.E Straight.E',
+                      'Corner.S.S1N']
+        (handle, self.path) = tempfile.mkstemp(suffix='.maze')
+        with os.fdopen(handle, 'w') as stream:
+            stream.write('\n'.join(self.lines))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, text):
+        with open(self.path, 'w') as stream:
+            stream.write(text)
+
+    def test_get_tile(self):
+        with LazyMazeFile(self.path) as view:
+            self.assertEqual(view.get_tile((0,0)), tiles.Straight(0))
+            self.assertEqual(view.get_tile((2,0)), tiles.T(2))
+            self.assertEqual(view.get_tile((0,1)), tiles.DeadEnd(3))
+            self.assertEqual(view.get_tile((1,2)), tiles.Straight(1))
+            self.assertEqual(view.get_tile((2,2)), tiles.Corner(2))
+            self.assertIsNone(view.get_tile((3,0)))
+            self.assertIsNone(view.get_tile((0,-1)))
+
+    def test_equal_to_parsed_maze(self):
+        maze = MazeFileBuilder(self.lines)
+        with LazyMazeFile(self.path) as view:
+            self.assertEqual(view, maze)
+            self.assertEqual(maze, view)
+            self.assertEqual(view.get_boundingbox(), maze.get_boundingbox())
+
+    def test_pickle_reopens_file(self):
+        with LazyMazeFile(self.path, cache_rows=2) as view:
+            data = pickle.dumps(view)
+            with pickle.loads(data) as other:
+                self.assertEqual(other, view)
+                self.assertEqual(other._cache_rows, 2)
+        self.assertLess(len(data), 200)
+
+    def test_row_cache_is_bounded(self):
+        with LazyMazeFile(self.path, cache_rows=2) as view:
+            for y in range(3):
+                view.get_tile((0,y))
+            self.assertEqual(list(view._cache), [1, 2])
+
+    def test_missing_tiles(self):
+        self.write('2 2 Cross.N Cross.N Cross.N')
+        with LazyMazeFile(self.path) as view:
+            self.assertEqual(view.get_tile((0,1)), tiles.Cross())
+            self.assertIsNone(view.get_tile((1,1)))
+
+    def test_to_many_tiles(self):
+        self.write('1 1 Cross.N Cross.N')
+        with self.assertRaises(SpecificationViolationError):
+            LazyMazeFile(self.path)
+
+    def test_invalid_token_on_access(self):
+        self.write('2 1 Cross.N Crosss.N')
+        with LazyMazeFile(self.path) as view:
+            self.assertEqual(view.get_tile((0,0)), tiles.Cross())
+            with self.assertRaises(SpecificationViolationError):
+                view.get_tile((1,0))
+
+    def test_read_only(self):
+        with LazyMazeFile(self.path) as view:
+            for (method, args) in (
+                    (view.add_tile, ((0,0), tiles.Cross())),
+                    (view.remove_tile, ((0,0),)),
+                    (view.add_tiles, ([((0,0), tiles.Cross())],)),
+                    (view.add_code_row, ((0,0), b'\x10'))):
+                with self.assertRaises(TypeError):
+                    method(*args)
+            view.build_spatial_index()
+            self.assertEqual(view.get_tile((0,0)), tiles.Straight(0))
+
+    def test_close(self):
+        view = LazyMazeFile(self.path)
+        stream = view._file
+        del view
+        self.assertTrue(stream.closed)
+
+    def test_encoding(self):
+        with open(self.path, 'w', encoding='utf-8') as stream:
+            stream.write('1 1 Corner.E.\u00e9t\u00e9')
+        with LazyMazeFile(self.path, encoding='utf-8') as view:
+            self.assertEqual(view.row_tokens(0), ['Corner.E.\u00e9t\u00e9'])
+            with pickle.loads(pickle.dumps(view)) as other:
+                self.assertEqual(other.encoding, 'utf-8')
+
+    def test_render_viewport(self):
+        maze = MazeFileBuilder(self.lines)
+        viewport = ((1,1),(3,2))
+
+        expected = io.StringIO()
+        AsciiArtRenderer().render(maze, expected, viewport)
+
+        stream = io.StringIO()
+        with LazyMazeFile(self.path) as view:
+            AsciiArtRenderer().render(view, stream, viewport)
+            # only the rendered row got read
+            self.assertEqual(list(view._cache), [1])
+
+        self.assertEqual(stream.getvalue(), expected.getvalue())
+        self.assertEqual(len(stream.getvalue().splitlines()), 5)
+
+    def test_region_queries(self):
+        maze = MazeFileBuilder(self.lines)
+        with LazyMazeFile(self.path) as view:
+            for box in (((0,0), (3,3)), ((1,1), (5,2)), ((-1,-1), (1,1))):
+                self.assertEqual(list(view.iter_region(box)),
+                                 list(maze.iter_region(box)))
+            self.assertEqual(list(view.iter_rows()), list(maze.iter_rows()))
+            self.assertEqual(list(view.iter_edges()),
+                             list(maze.iter_edges()))
+
+    def test_batch_queries(self):
+        maze = MazeFileBuilder(self.lines)
+        xs = [x for x in range(-1, 4) for y in range(-1, 4)]
+        ys = [y for x in range(-1, 4) for y in range(-1, 4)]
+        with LazyMazeFile(self.path) as view:
+            self.assertEqual(view.walls_at(xs, ys), maze.walls_at(xs, ys))
+            self.assertEqual(view.is_open_batch(xs, ys, [1] * len(xs)),
+                             maze.is_open_batch(xs, ys, [1] * len(xs)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,12 @@ from .maze  import *
 
 from . import tiles
 import io
+import pickle
+from array import array
+
+class CustomTile(tiles.Tile):
+    """a tile type without a tile code"""
+
 
 class Test_Maze(unittest.TestCase):
     """
@@ -73,6 +79,236 @@ class Test_Maze(unittest.TestCase):
         maze1.add_tile((1,1), tiles.Closed())
 
         self.assertEqual(maze1.get_boundingbox(), ((0,0),(2,2)))
+        self.assertRaises(ValueError, Maze().get_boundingbox)
+
+    def test_fork(self):
+        maze1 = Maze()
+        maze1.add_tile((0,0), tiles.Straight(0))
+        maze1.add_tile((1,0), tiles.Corner(1))
+
+        maze2 = maze1.fork()
+        self.assertEqual(maze1, maze2)
+
+        maze2.add_tile((1,0), tiles.Closed())
+        self.assertEqual(maze1.get_tile((1,0)), tiles.Corner(1))
+        self.assertNotEqual(maze1, maze2)
+
+    def test_pickle(self):
+        dense = Maze.from_grid([[0b1001, 0b0101, 0b0011],
+                                [0b1100, 0b0101, 0b0110]], origin=(-1, 4))
+        dense.add_tile((0, 5), tiles.Seesaw(1, passable=False))
+        sparse = Maze()
+        sparse.add_tile((-5, 0), tiles.T(3))
+        sparse.add_tile((10**6, 7), tiles.Seesaw(2))
+        for maze in (dense, sparse, Maze()):
+            self.assertEqual(pickle.loads(pickle.dumps(maze)), maze)
+
+        # the dense maze is pickled as a grid of tile codes
+        self.assertLess(len(pickle.dumps(dense)), 200)
+
+    def test_pickle_custom_tiles(self):
+        maze = Maze()
+        maze.add_tile((0, 0), tiles.Tile([1, 0, 1, 0]))
+        maze.add_tile((1, 0), CustomTile())
+        self.assertEqual(pickle.loads(pickle.dumps(maze)), maze)
+
+    def test_add_tiles(self):
+        maze1 = Maze()
+        maze1.add_tile((0,0), tiles.Straight(0))
+        maze1.add_tile((1,0), tiles.Corner(1))
+
+        maze2 = Maze()
+        maze2.add_tiles([((0,0), tiles.Straight(0)), ((1,0), tiles.Corner(1))])
+        self.assertEqual(maze1, maze2)
+
+        maze3 = Maze()
+        maze3.add_tiles([(0,0), (1,0)], [tiles.Straight(0), tiles.Corner(1)])
+        self.assertEqual(maze1, maze3)
+
+    def test_add_code_row(self):
+        maze = Maze()
+        maze.add_tile((1,5), tiles.Cross())
+        maze.add_code_row((-1,5), [tiles.encode(tiles.T(1)), tiles.NO_TILE,
+                                   tiles.NO_TILE, tiles.encode(tiles.Seesaw())])
+
+        self.assertEqual(maze.get_tile((-1,5)), tiles.T(1))
+        self.assertIsNone(maze.get_tile((0,5)))
+        self.assertEqual(maze.get_tile((1,5)), tiles.Cross())
+        self.assertEqual(maze.get_tile((2,5)), tiles.Seesaw())
+
+    def test_from_grid_masks(self):
+        maze = Maze.from_grid([[0b1001, 0b0011],
+                               [0b1100, 0b0110]], origin=(3,-1))
+
+        expected = Maze()
+        expected.add_tile((3,-1), tiles.Corner(0))
+        expected.add_tile((4,-1), tiles.Corner(1))
+        expected.add_tile((3,0), tiles.Corner(3))
+        expected.add_tile((4,0), tiles.Corner(2))
+        self.assertEqual(maze, expected)
+
+    def test_from_grid_codes(self):
+        straight = tiles.encode(tiles.Straight(1))
+        seesaw = tiles.encode(tiles.Seesaw())
+        maze = Maze.from_grid([[straight, tiles.NO_TILE, seesaw]], codes=True)
+
+        self.assertEqual(maze.get_tile((0,0)), tiles.Straight(1))
+        self.assertIsNone(maze.get_tile((1,0)))
+        self.assertEqual(maze.get_tile((2,0)), tiles.Seesaw())
+
+    def test_from_grid_invalid_mask(self):
+        with self.assertRaises(ValueError):
+            Maze.from_grid([[0, 16]])
+
+class Test_RegionQueries(unittest.TestCase):
+    """
+    Test of the spatial queries of the Maze class
+    """
+
+    def setUp(self):
+        self.maze = Maze()
+        masks = {(0,0): 0b1001, (1,0): 0b0101, (2,0): 0b0011,
+                 (0,1): 0b1110, (2,1): 0b1110, (-3,5): 0b1111}
+        for (coordinate, mask) in masks.items():
+            self.maze.add_tile(coordinate,
+                               tiles.decode(tiles.MASK_CODES[mask]))
+
+    def test_iter_region(self):
+        self.assertEqual(list(self.maze.iter_region(((0,0), (3,2)))),
+                         [((0,0), tiles.Corner(0)), ((1,0), tiles.Straight(1)),
+                          ((2,0), tiles.Corner(1)), ((0,1), tiles.DeadEnd(2)),
+                          ((2,1), tiles.DeadEnd(2))])
+        self.assertEqual(list(self.maze.iter_region(((1,0), (2,6)))),
+                         [((1,0), tiles.Straight(1))])
+        self.assertEqual(list(self.maze.iter_region(((5,5), (9,9)))), [])
+
+    def test_code_grid(self):
+        code = lambda mask: tiles.MASK_CODES[mask]
+        # a box smaller than the maze is probed, a larger one scanned
+        self.assertEqual(self.maze.code_grid(((1,0), (3,1))),
+                         bytearray([code(0b0101), code(0b0011)]))
+        self.assertEqual(self.maze.code_grid(((0,1), (3,3))),
+                         bytearray([code(0b1110), 0, code(0b1110), 0, 0, 0]))
+
+    def test_index_follows_updates(self):
+        self.maze.build_spatial_index()
+        self.maze.add_tile((1,1), tiles.Cross())
+        self.maze.add_tile((0,0), tiles.Closed())
+        self.maze.remove_tile((-3,5))
+        self.maze.add_code_row((0,2), bytes([tiles.encode(tiles.Cross())]))
+        expected = sorted(self.maze, key=lambda item: item[0][::-1])
+        self.assertEqual(list(self.maze.iter_region(((-5,-5), (5,5)))),
+                         expected)
+        # forks and unpickled mazes have no index
+        fork = self.maze.fork()
+        fork.remove_tile((1,1))
+        self.assertEqual(len(list(self.maze.iter_region(((1,1), (2,2))))), 1)
+        other = pickle.loads(pickle.dumps(self.maze))
+        self.assertEqual(list(other.iter_region(((-5,-5), (5,5)))), expected)
+        self.maze.drop_spatial_index()
+        self.maze.add_tile((-1,0), tiles.Cross())
+        self.assertEqual(list(self.maze.iter_region(((-1,0), (1,1)))),
+                         [((-1,0), tiles.Cross()), ((0,0), tiles.Closed())])
+
+    def test_queries_leave_no_index(self):
+        maze = Maze()
+        maze.add_tiles(self.maze)
+        are_walls_consistent(maze)
+        inconsistent_borders(maze)
+        AsciiArtRenderer().render(maze, io.StringIO())
+        list(maze.iter_rows())
+        self.assertIsNone(maze._rows)
+
+    def test_iter_rows(self):
+        rows = list(self.maze.iter_rows())
+        self.assertEqual([y for (y, row) in rows], [0, 1, 5])
+        self.assertEqual(rows[1], (1, [(0, tiles.DeadEnd(2)),
+                                       (2, tiles.DeadEnd(2))]))
+        self.assertEqual(list(Maze().iter_rows()), [])
+
+    def test_neighbours(self):
+        self.assertEqual(self.maze.neighbours((1,0)),
+                         [(Tile.EAST, (2,0), tiles.Corner(1)),
+                          (Tile.WEST, (0,0), tiles.Corner(0))])
+        self.assertEqual(self.maze.neighbours((-3,5)), [])
+
+    def test_iter_edges(self):
+        edges = [(coordinate, direction) for (coordinate, direction, tile,
+                                              neighbour) in self.maze.iter_edges()]
+        self.assertEqual(edges, [((0,0), Tile.EAST), ((1,0), Tile.EAST),
+                                 ((0,0), Tile.SOUTH), ((2,0), Tile.SOUTH)])
+        self.assertTrue(are_walls_consistent(self.maze))
+        self.maze.add_tile((1,1), tiles.Cross())
+        self.assertFalse(are_walls_consistent(self.maze))
+        self.assertEqual(inconsistent_borders(self.maze),
+                         {((1,0), Tile.SOUTH), ((0,1), Tile.EAST),
+                          ((1,1), Tile.EAST)})
+
+    def test_batch_queries(self):
+        self.maze.add_tile((5,5), CustomTile([1,0,1,0]))
+        coordinates = [(x, y) for y in range(-1, 7) for x in range(-4, 6)]
+        (xs, ys) = ([x for (x, y) in coordinates], [y for (x, y) in coordinates])
+        masks = self.maze.walls_at(xs, ys)
+        for (coordinate, mask) in zip(coordinates, masks):
+            tile = self.maze.get_tile(coordinate)
+            self.assertEqual(mask, 15 if tile is None else tile.wall_mask())
+
+        for direction in range(4):
+            is_open = self.maze.is_open_batch(xs, ys,
+                                              [direction] * len(coordinates))
+            for (coordinate, value) in zip(coordinates, is_open):
+                tile = self.maze.get_tile(coordinate)
+                self.assertEqual(value, tile is not None and
+                                 tile.is_open(direction))
+        self.assertEqual(self.maze.is_open_batch([0, 0, 5], [0, 0, 5],
+                                                 array('b', [1, 2, 1])),
+                         bytearray([1, 1, 1]))
+        self.assertEqual(self.maze.walls_at([], []), bytearray())
+
+    def test_batch_validation(self):
+        self.assertRaises(ValueError, self.maze.walls_at, [0, 1], [0])
+        self.assertRaises(ValueError, self.maze.is_open_batch, [0], [0], [4])
+        self.assertRaises(ValueError, self.maze.is_open_batch, [0], [0], [-1])
+        self.assertRaises(ValueError, self.maze.is_open_batch, [0], [0],
+                          [Tile.NORTH, Tile.EAST])
+        self.assertRaises(ValueError, self.maze.is_open_batch, [0], [0],
+                          ['N'])
+
+class _TileCollection(object):
+    """a maze that only provides get_tile and __iter__"""
+
+    def __init__(self, maze):
+        self._tiles = dict(maze)
+
+    def get_tile(self, coordinate):
+        return self._tiles.get(coordinate)
+
+    def get_boundingbox(self):
+        return Maze.get_boundingbox(self)
+
+    def __iter__(self):
+        return iter(self._tiles.items())
+
+
+class Test_DuckTypedMaze(unittest.TestCase):
+
+    def test_helpers(self):
+        maze = Maze()
+        maze.add_tile((1,1), tiles.Corner())
+        maze.add_tile((2,1), tiles.Corner(1))
+        collection = _TileCollection(maze)
+        self.assertTrue(are_walls_consistent(collection))
+        (stream, expected) = (io.StringIO(), io.StringIO())
+        AsciiArtRenderer().render(collection, stream)
+        AsciiArtRenderer().render(maze, expected)
+        self.assertEqual(stream.getvalue(), expected.getvalue())
+
+        maze.add_tile((1,2), tiles.Closed())
+        collection = _TileCollection(maze)
+        self.assertFalse(are_walls_consistent(collection))
+        self.assertEqual(inconsistent_borders(collection),
+                         inconsistent_borders(maze))
+
 
 class Test_AsciiArtRenderer(unittest.TestCase):
     
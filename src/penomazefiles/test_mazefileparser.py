@@ -2,6 +2,7 @@ import unittest
 from .mazefileparser import MazeFileBuilder
 from .mazefileparser import MazeFileTokenizer
 from .mazefileparser import MazeFileParser
+from .mazefileparser import MazeTokenParser
 from .mazefileparser import SpecificationViolationError
 from . import maze
 from . import tiles
@@ -213,5 +214,62 @@ class Test_MazeFileBuilder(unittest.TestCase):
 
         
 
+class Test_MazeTokenParser(unittest.TestCase):
+    """Test of the MazeTokenParser class"""
+
+    def test_rows_are_committed(self):
+        parser = MazeTokenParser()
+        parser.consume(((0,0), 'Straight.N'))
+        parser.consume(((1,0), 'Corner.E.S1N'))
+        parser.consume(((0,1), 'Seesaw.S'))
+        # a gap on the row starts a new run of tiles
+        parser.consume(((3,1), 'DeadEnd.W.V'))
+
+        expected = maze.Maze()
+        expected.add_tile((0,0), tiles.Straight(0))
+        expected.add_tile((1,0), tiles.Corner(1))
+        expected.add_tile((0,1), tiles.Seesaw(2))
+        expected.add_tile((3,1), tiles.DeadEnd(3))
+        self.assertEqual(parser.getMaze(), expected)
+
+    def test_token_code(self):
+        self.assertEqual(MazeTokenParser.token_code('T.W'),
+                         tiles.encode(tiles.T(3)))
+        with self.assertRaises(SpecificationViolationError):
+            MazeTokenParser.token_code('T.X')
+
+    def test_token_table(self):
+        for (name, cls) in (('Straight', tiles.Straight), ('Corner', tiles.Corner),
+                            ('T', tiles.T), ('DeadEnd', tiles.DeadEnd),
+                            ('Cross', tiles.Cross), ('Closed', tiles.Closed),
+                            ('Seesaw', tiles.Seesaw)):
+            for (rotations, orientation) in enumerate('NESW'):
+                token = '{:s}.{:s}'.format(name, orientation)
+                tile = MazeTokenParser.parse_tile_token(token)
+                self.assertEqual(tile, cls(rotations))
+                # every call returns a new tile
+                self.assertIsNot(tile, MazeTokenParser.parse_tile_token(token))
+                self.assertEqual(
+                    MazeTokenParser.token_code(token + '.13'),
+                    MazeTokenParser.token_code(token))
+
+        # the table only holds the plain tile tokens
+        size = len(MazeTokenParser._TOKEN_CODES)
+        for barcode in range(100):
+            MazeTokenParser.token_code('Corner.E.{:d}'.format(barcode))
+        self.assertNotIn('Corner.E.13', MazeTokenParser._TOKEN_CODES)
+        for token in ('Bogus.N', 'Corner', 'Corner.X.13'):
+            with self.assertRaises(SpecificationViolationError):
+                MazeTokenParser.parse_tile_token(token)
+            self.assertNotIn(token, MazeTokenParser._TOKEN_CODES)
+        self.assertEqual(len(MazeTokenParser._TOKEN_CODES), size)
+
+    def test_seesaw_entrance(self):
+        for (orientation, entrance) in (('N', 0), ('E', 1), ('S', 2), ('W', 3)):
+            tile = tiles.decode(MazeTokenParser.token_code('Seesaw.' + orientation))
+            self.assertEqual(tile.entrance, entrance)
+            self.assertTrue(tile.is_passable())
+
+
 if __name__ == '__main__':
     unittest.main()
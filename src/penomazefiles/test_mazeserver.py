@@ -0,0 +1,177 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+from .mazeserver import *
+from .chunkedmaze import ChunkedMaze
+from .maze import Maze
+from .mazefileparser import MazeFileBuilder
+from . import tiles
+
+
+MAZEFILE = '''3 2
+Straight.N Corner.E T.S
+DeadEnd.W Cross.N Seesaw.E
+'''
+
+
+class Test_MazeData(unittest.TestCase):
+
+    def test_roundtrip(self):
+        maze = Maze()
+        maze.add_tile((-2, 5), tiles.Corner(1))
+        maze.add_tile((1, 7), tiles.Seesaw(3, passable=False))
+        self.assertEqual(decode_maze(encode_maze(maze)), maze)
+        self.assertEqual(decode_maze(encode_maze(Maze())), Maze())
+        self.assertIsInstance(decode_maze(encode_maze(maze), ChunkedMaze),
+                              ChunkedMaze)
+
+
+class Test_MazeServer(unittest.TestCase):
+    """
+    Test of the MazeServer and MazeClient classes
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.maze')
+        self.write(MAZEFILE)
+        self.server = MazeServer(os.path.join(self.directory, 'socket'),
+                                 cache_size=2, poll_interval=0.01,
+                                 root=self.directory).start()
+        self.client = MazeClient(self.server.address, pool_size=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        shutil.rmtree(self.directory)
+
+    def write(self, text, path=None):
+        with open(path or self.path, 'w') as stream:
+            stream.write(text)
+
+    def test_get_maze(self):
+        expected = MazeFileBuilder(MAZEFILE.splitlines())
+        self.assertEqual(self.client.get_maze(self.path), expected)
+        # served from the cache
+        self.assertEqual(self.client.get_maze(self.path), expected)
+        self.assertEqual(len(self.server._cache), 1)
+
+    def test_relative_path(self):
+        # relative to the served directory, not to the working directory
+        self.assertEqual(self.client.get_maze('test.maze'),
+                         MazeFileBuilder(MAZEFILE.splitlines()))
+
+    def test_file_changed(self):
+        self.client.get_maze(self.path)
+        self.write(MAZEFILE.replace('Cross.N', 'Closed.N   '))
+        self.assertEqual(self.client.get_maze(self.path).get_tile((1, 1)),
+                         tiles.Closed())
+
+    def test_cache_is_bounded(self):
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(self.directory, name + '.maze')
+            self.write(MAZEFILE, path)
+            self.client.get_maze(path)
+        self.assertEqual([os.path.basename(path) for path in self.server._cache],
+                         ['b.maze', 'c.maze'])
+
+    def test_errors(self):
+        with self.assertRaises(MazeServerError):
+            self.client.get_maze(os.path.join(self.directory, 'missing.maze'))
+        self.write('2 1 Straight.N Bogus.N')
+        output = io.StringIO()
+        with self.assertRaises(MazeServerError), \
+                contextlib.redirect_stdout(output):
+            self.client.get_maze(self.path)
+        # the diagnostics of the parser don't reach the stdout of the server
+        self.assertEqual(output.getvalue(), '')
+        # the connection is still usable
+        self.write(MAZEFILE)
+        self.assertIsNotNone(self.client.get_maze(self.path).get_tile((0, 0)))
+
+    def test_unexpected_errors(self):
+        def fail(path):
+            raise TypeError('unexpected')
+
+        self.server.get = fail
+        with self.assertRaisesRegex(MazeServerError, 'unexpected'):
+            self.client.get_maze(self.path)
+        del self.server.get
+        self.assertIsNotNone(self.client.get_maze(self.path))
+
+    def test_root_directory(self):
+        outside = tempfile.mkdtemp()
+        try:
+            path = os.path.join(outside, 'other.maze')
+            self.write(MAZEFILE, path)
+            for request in (path, os.path.join(self.directory, '..',
+                                                os.path.basename(outside),
+                                                'other.maze')):
+                with self.assertRaisesRegex(MazeServerError, 'outside'):
+                    self.client.get_maze(request)
+            with self.assertRaises(MazeServerError):
+                self.client.subscribe(path)
+            # a link within the root that points outside of it
+            os.symlink(path, os.path.join(self.directory, 'link.maze'))
+            with self.assertRaises(MazeServerError):
+                self.client.get_maze(os.path.join(self.directory, 'link.maze'))
+            self.assertIsNotNone(self.client.get_maze(self.path))
+        finally:
+            shutil.rmtree(outside)
+
+    def test_subscribe(self):
+        with self.client.subscribe(self.path) as subscription:
+            self.assertIsNone(subscription.wait(0.05))
+            self.write(MAZEFILE + '# a comment\n')
+            self.assertEqual(subscription.wait(5),
+                             os.path.realpath(self.path))
+            self.assertIsNone(subscription.wait(0.05))
+
+    def test_concurrent_clients(self):
+        expected = MazeFileBuilder(MAZEFILE.splitlines())
+        results = []
+
+        def work():
+            for request in range(20):
+                results.append(self.client.get_maze(self.path) == expected)
+
+        threads = [threading.Thread(target=work) for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [True] * 80)
+        self.assertLessEqual(self.client._pool.qsize(), 2)
+
+    def test_reconnect_after_server_restart(self):
+        self.client.get_maze(self.path)
+        address = self.server.address
+        self.server.shutdown()
+        self.server = MazeServer(address, root=self.directory).start()
+        self.assertIsNotNone(self.client.get_maze(self.path))
+
+
+class Test_MazeServerTCP(unittest.TestCase):
+
+    def test_get_maze(self):
+        (handle, path) = tempfile.mkstemp(suffix='.maze')
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(MAZEFILE)
+        try:
+            with MazeServer(('127.0.0.1', 0), poll_interval=0.01,
+                            root=os.path.dirname(path)).start() \
+                    as server, \
+                 MazeClient(server.address) as client:
+                self.assertEqual(client.get_maze(path),
+                                 MazeFileBuilder(MAZEFILE.splitlines()))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import copy
+import random
+
+from .merging import *
+from .merging import _CodeGrid
+from .merging import _correlate
+from .chunkedmaze import ChunkedMaze
+from .generator import perfect_maze
+from .maze import Maze
+from . import tiles
+
+
+def brute_force_scores(reference, other):
+    """correlation of the border values of two mazes at every translation"""
+    def borders(maze):
+        values = {}
+        for ((x, y), tile) in maze:
+            for (direction, border) in enumerate((('h', x, y), ('v', x+1, y),
+                                                  ('h', x, y+1), ('v', x, y))):
+                wall = 1 if tile.has_wall(direction) else -1
+                values[border] = max(values.get(border, -1), wall)
+        return values
+
+    (a, b) = (borders(reference), borders(other))
+    scores = {}
+    for (dx, dy) in {(x1 - x2, y1 - y2) for (k1, x1, y1) in a
+                     for (k2, x2, y2) in b}:
+        scores[(dx, dy)] = sum(value * a.get((kind, x + dx, y + dy), 0)
+                               for ((kind, x, y), value) in b.items())
+    return scores
+
+
+class Test_Merge(unittest.TestCase):
+    """
+    Test of the alignment and merging of partial mazes
+    """
+
+    def setUp(self):
+        self.world = perfect_maze(20, 15, seed=6, loops=0.1)
+        self.first = Maze()
+        self.second = Maze()
+        for ((x, y), tile) in self.world:
+            if x < 13:
+                self.first.add_tile((x, y), tile)
+            if x >= 7:
+                # the second robot started at (7, 2) facing east
+                self.second.add_tile((y - 2, -(x - 7)),
+                                     copy.deepcopy(tile).rotate(3))
+
+    def test_correlation(self):
+        generator = random.Random(1)
+        for test in range(5):
+            mazes = []
+            for size in range(2):
+                maze = Maze()
+                for count in range(generator.randrange(1, 12)):
+                    maze.add_tile((generator.randrange(-2, 4),
+                                   generator.randrange(-1, 3)),
+                                  tiles.from_wall_mask(generator.randrange(16)))
+                mazes.append(maze)
+            (score, (dx, dy)) = _correlate(_CodeGrid.from_maze(mazes[0]),
+                                           _CodeGrid.from_maze(mazes[1]))
+            scores = brute_force_scores(mazes[0], mazes[1])
+            ((min_x, min_y), _) = mazes[0].get_boundingbox()
+            ((other_x, other_y), _) = mazes[1].get_boundingbox()
+            self.assertEqual(score, max(scores.values()))
+            self.assertEqual(score, scores[(min_x - other_x + dx,
+                                            min_y - other_y + dy)])
+
+    def test_translation(self):
+        shifted = Maze()
+        for ((x, y), tile) in self.first:
+            shifted.add_tile((x - 30, y + 4), tile)
+        alignment = align(self.world, shifted)
+        self.assertEqual((alignment.rotation, alignment.offset), (0, (30, -4)))
+        self.assertEqual(alignment.transform((-30, 4)), (0, 0))
+
+    def test_rotation(self):
+        alignment = align(self.first, self.second, rotations=True)
+        self.assertEqual((alignment.rotation, alignment.offset), (1, (7, 2)))
+        self.assertEqual(alignment.transform((0, -3)), (10, 2))
+        self.assertEqual(alignment.transform_tile(self.second.get_tile((0, -3))),
+                         self.world.get_tile((10, 2)))
+
+    def test_merge(self):
+        (merged, conflicts, alignment) = merge(self.first, self.second,
+                                               rotations=True)
+        self.assertEqual(merged, self.world)
+        self.assertEqual(conflicts, set())
+        # the reference is left untouched
+        self.assertIsNone(self.first.get_tile((15, 0)))
+
+    def test_conflicts(self):
+        original = self.second.get_tile((3, -4))
+        self.second.add_tile((3, -4), tiles.Closed())
+        (merged, conflicts, alignment) = merge(self.first, self.second,
+                                               rotations=True)
+        self.assertEqual(alignment.rotation, 1)
+        self.assertEqual(conflicts, {(11, 5)})
+        self.assertEqual(merged.get_tile((11, 5)), self.world.get_tile((11, 5)))
+        self.assertEqual(alignment.transform_tile(original),
+                         self.world.get_tile((11, 5)))
+
+    def test_chunked(self):
+        first = ChunkedMaze()
+        first.add_tiles(self.first)
+        (merged, conflicts, alignment) = merge(first, self.second,
+                                               rotations=True)
+        self.assertIsInstance(merged, ChunkedMaze)
+        self.assertEqual(merged, self.world)
+
+    def test_empty(self):
+        self.assertIsNone(align(Maze(), self.second))
+        (merged, conflicts, alignment) = merge(self.first, Maze())
+        self.assertEqual(merged, self.first)
+        self.assertIsNone(alignment)
+
+
+if __name__ == '__main__':
+    unittest.main()
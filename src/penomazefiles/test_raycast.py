@@ -0,0 +1,84 @@
+import unittest
+import random
+
+from .raycast import *
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .grid import OFFSETS
+from .maze import Maze
+from . import tiles
+from .tiles import Tile
+
+
+def walk(maze, coordinate, direction):
+    """distance to the nearest wall, found tile by tile"""
+    (dx, dy) = OFFSETS[direction]
+    (x, y) = coordinate
+    distance = 0
+    tile = maze.get_tile((x, y))
+    while tile is not None and tile.is_open(direction):
+        (x, y) = (x + dx, y + dy)
+        tile = maze.get_tile((x, y))
+        if tile is None or tile.has_wall((direction + 2) % 4):
+            break
+        distance += 1
+    return distance
+
+
+class Test_RayCastTable(unittest.TestCase):
+    """
+    Test of the RayCastTable class
+    """
+
+    def setUp(self):
+        self.maze = perfect_maze(9, 7, seed=2, straightness=0.8, loops=0.3,
+                                 origin=(-3, 2))
+        self.maze.remove_tile((1, 4))
+
+    def assertMatchesWalk(self, table):
+        for y in range(2, 9):
+            for x in range(-3, 6):
+                for direction in range(4):
+                    self.assertEqual(table.distance((x, y), direction),
+                                     walk(self.maze, (x, y), direction),
+                                     ((x, y), direction))
+
+    def test_distances(self):
+        self.assertMatchesWalk(RayCastTable(self.maze))
+
+    def test_corridor(self):
+        # dead end, 3 straights, dead end
+        maze = Maze.from_grid([[0b1101, 0b0101, 0b0101, 0b0101, 0b0111]])
+        table = RayCastTable(MazeGrid(maze))
+        self.assertEqual([table.distance((x, 0), Tile.EAST) for x in range(5)],
+                         [4, 3, 2, 1, 0])
+        self.assertEqual([table.distance((x, 0), Tile.WEST) for x in range(5)],
+                         [0, 1, 2, 3, 4])
+        self.assertEqual(table.distances((2, 0)), (0, 2, 0, 2))
+        with self.assertRaises(ValueError):
+            table.distance((5, 0), Tile.EAST)
+
+    def test_add_tile(self):
+        table = RayCastTable(self.maze, ((-3, 2), (6, 9)))
+        generator = random.Random(8)
+        for update in range(40):
+            coordinate = (generator.randrange(-3, 6), generator.randrange(2, 9))
+            if generator.random() < 0.2:
+                table.remove_tile(coordinate)
+            else:
+                table.add_tile(coordinate,
+                               tiles.from_wall_mask(generator.randrange(16)))
+        self.assertMatchesWalk(table)
+
+    def test_add_tile_outside(self):
+        table = RayCastTable(self.maze, ((-3, 2), (6, 9)))
+        before = self.maze.fork()
+        with self.assertRaises(ValueError):
+            table.add_tile((6, 2), tiles.Cross())
+        with self.assertRaises(ValueError):
+            table.remove_tile((-4, 2))
+        self.assertEqual(self.maze, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import random
+
+from .replanning import *
+from .assertions import PathAssertions
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .maze import Maze
+from . import tiles
+
+
+class Test_DStarLite(PathAssertions, unittest.TestCase):
+    """
+    Test of the DStarLite class
+    """
+
+    def setUp(self):
+        generator = random.Random(3)
+        self.maze = perfect_maze(12, 10, seed=7, loops=0.15)
+        self.seesaws = []
+        for (coordinate, tile) in list(self.maze):
+            if isinstance(tile, tiles.Straight) and generator.random() < 0.5:
+                self.maze.add_tile(coordinate,
+                                   tiles.Seesaw(1 if tile.walls[0] else 0))
+                self.seesaws.append(coordinate)
+
+    def test_initial_plan(self):
+        planner = DStarLite(self.maze, (0, 0), (11, 9))
+        expected = MazeGrid(self.maze).shortest_path((0, 0), (11, 9))
+        path = planner.path()
+        self.assertEqual(len(path), len(expected))
+        self.assertValidPath(planner.grid, path, (0, 0), (11, 9))
+
+    def test_toggle_and_move(self):
+        self.assertGreater(len(self.seesaws), 3)
+        generator = random.Random(5)
+        goal = (11, 9)
+        planner = DStarLite(self.maze, (0, 0), goal)
+        reference = MazeGrid(self.maze)
+        robot = (0, 0)
+        for step in range(60):
+            seesaw = generator.choice(self.seesaws)
+            planner.toggle_seesaw(seesaw)
+            reference.set_tile(seesaw, reference.tile(seesaw).toggle())
+
+            expected = reference.shortest_path(robot, goal)
+            path = planner.path()
+            if expected is None:
+                self.assertIsNone(path)
+                self.assertIsNone(planner.distance())
+                continue
+            self.assertEqual(len(path), len(expected))
+            self.assertValidPath(reference, path, robot, goal)
+            if len(path) > 2:
+                robot = path[1]
+                planner.move_to(robot)
+
+    def test_unreachable(self):
+        maze = Maze.from_grid([[0b1001, 0b0101, 0b0011]])
+        maze.add_tile((1, 0), tiles.Seesaw(1, passable=False))
+        planner = DStarLite(maze, (0, 0), (2, 0))
+        self.assertIsNone(planner.path())
+        planner.toggle_seesaw((1, 0))
+        self.assertEqual(planner.path(), [(0, 0), (1, 0), (2, 0)])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            DStarLite(self.maze, (0, 0), (12, 9))
+        planner = DStarLite(self.maze, (0, 0), (11, 9))
+        with self.assertRaises(ValueError):
+            planner.toggle_seesaw((0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
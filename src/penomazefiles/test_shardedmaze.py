@@ -0,0 +1,101 @@
+import unittest
+import pickle
+
+from .shardedmaze import *
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .maze import Maze
+from .maze import inconsistent_borders
+from . import tiles
+
+
+class Test_ShardedMaze(unittest.TestCase):
+    """
+    Test of the ShardedMaze class
+    """
+
+    def setUp(self):
+        self.maze = perfect_maze(23, 17, seed=3, loops=0.2, origin=(-5, -7))
+        # inconsistent borders inside a band and across two bands
+        self.maze.add_tile((3, 3), tiles.Cross())
+        self.maze.add_tile((10, -5), tiles.Closed())
+        self.sharded = ShardedMaze(shards=3, band_rows=4)
+        ((min_x, min_y), (max_x, max_y)) = self.maze.get_boundingbox()
+        for y in range(min_y, max_y):
+            self.sharded.add_code_row(
+                (min_x, y), self.maze.code_grid(((min_x, y), (max_x, y + 1))))
+
+    def tearDown(self):
+        self.sharded.close()
+
+    def test_tiles(self):
+        self.assertEqual(self.sharded, self.maze)
+        self.assertEqual(self.sharded.get_boundingbox(),
+                         self.maze.get_boundingbox())
+        self.sharded.add_tile((40, 40), tiles.Seesaw(1, passable=False))
+        self.sharded.remove_tile((0, 0))
+        self.assertEqual(self.sharded.get_tile((40, 40)),
+                         tiles.Seesaw(1, passable=False))
+        self.assertIsNone(self.sharded.get_tile((0, 0)))
+        self.assertIsNone(self.sharded.get_tile((-100, 7)))
+        self.assertEqual(self.sharded.get_boundingbox(), ((-5, -7), (41, 41)))
+
+    def test_add_tiles(self):
+        items = list(self.maze)
+        with ShardedMaze(shards=2, band_rows=3) as sharded:
+            sharded.add_tiles(items)
+            self.assertEqual(sharded, self.maze)
+            self.assertEqual(sharded.fork(), self.maze)
+
+    def test_queries(self):
+        box = ((-2, -6), (9, 5))
+        self.assertEqual(list(self.sharded.iter_region(box)),
+                         list(self.maze.iter_region(box)))
+        self.assertEqual(self.sharded.code_grid(box), self.maze.code_grid(box))
+        xs = [x for x in range(-6, 19) for y in range(-8, 11)]
+        ys = [y for x in range(-6, 19) for y in range(-8, 11)]
+        self.assertEqual(self.sharded.walls_at(xs, ys),
+                         self.maze.walls_at(xs, ys))
+
+    def test_inconsistent_borders(self):
+        expected = inconsistent_borders(self.maze)
+        self.assertTrue(any(coordinate[1] == -5 for (coordinate, direction)
+                            in expected))
+        self.assertEqual(self.sharded.inconsistent_borders(), expected)
+
+        self.maze.remove_tile((3, 3))
+        self.maze.remove_tile((10, -5))
+        self.sharded.remove_tile((3, 3))
+        self.sharded.remove_tile((10, -5))
+        self.assertEqual(self.sharded.inconsistent_borders(),
+                         inconsistent_borders(self.maze))
+
+    def test_bfs(self):
+        grid = MazeGrid(self.maze)
+        start = (-5, -7)
+        for goal in ((17, 9), (0, 0), (3, 3), (6, -7)):
+            path = grid.shortest_path(start, goal)
+            distance = None if path is None else len(path) - 1
+            self.assertEqual(self.sharded.bfs(start, goal)[1], distance)
+
+        (reached, farthest) = self.sharded.bfs(start)
+        distances = [len(grid.shortest_path(start, coordinate)) - 1
+                     for (coordinate, tile) in self.maze
+                     if grid.shortest_path(start, coordinate) is not None]
+        self.assertEqual((reached, farthest), (len(distances), max(distances)))
+        self.assertEqual(self.sharded.bfs((100, 100)), (0, None))
+
+    def test_empty(self):
+        with ShardedMaze(shards=2) as sharded:
+            self.assertEqual(list(sharded), [])
+            self.assertEqual(sharded.inconsistent_borders(), set())
+            self.assertRaises(ValueError, sharded.get_boundingbox)
+            self.assertEqual(sharded, Maze())
+
+    def test_not_picklable(self):
+        self.assertRaises(TypeError, pickle.dumps, self.sharded)
+        self.assertRaises(ValueError, ShardedMaze, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import multiprocessing
+import pickle
+
+from .sharedmaze import *
+from .generator import perfect_maze
+from .grid import MazeGrid
+from . import tiles
+
+
+def _count_dead_ends(maze):
+    """run in a worker process"""
+    return sum(1 for (coordinate, tile) in maze
+               if isinstance(tile, tiles.DeadEnd))
+
+
+class Test_SharedMemoryMaze(unittest.TestCase):
+    """
+    Test of the SharedMemoryMaze class
+    """
+
+    def setUp(self):
+        self.maze = perfect_maze(8, 6, seed=4, origin=(-2, 3))
+        self.maze.remove_tile((0, 4))
+        self.maze.add_tile((1, 5), tiles.Seesaw(3, passable=False))
+        self.shared = SharedMemoryMaze.create(self.maze)
+
+    def tearDown(self):
+        self.shared.close()
+        self.shared.unlink()
+
+    def test_tiles(self):
+        self.assertEqual(self.shared, self.maze)
+        self.assertEqual(self.shared.get_tile((1, 5)),
+                         tiles.Seesaw(3, passable=False))
+        self.assertIsNone(self.shared.get_tile((0, 4)))
+        self.assertIsNone(self.shared.get_tile((6, 3)))
+        self.assertEqual(self.shared.get_boundingbox(), ((-2, 3), (6, 9)))
+
+    def test_code_grid(self):
+        for box in (None, ((-3, 2), (4, 5)), ((0, 4), (2, 6)),
+                    ((10, 10), (12, 12))):
+            self.assertEqual(self.shared.code_grid(box),
+                             self.maze.code_grid(box or ((-2, 3), (6, 9))))
+        self.assertEqual(MazeGrid(self.shared).passable,
+                         MazeGrid(self.maze).passable)
+
+    def test_read_only(self):
+        with self.assertRaises(TypeError):
+            self.shared.add_tile((0, 0), tiles.Cross())
+        with self.assertRaises(TypeError):
+            self.shared.remove_tile((0, 3))
+        with self.assertRaises(TypeError):
+            self.shared.add_tiles([((0, 4), tiles.Cross())])
+        with self.assertRaises(TypeError):
+            self.shared.add_code_row((0, 4), b'\x10')
+        fork = self.shared.fork()
+        fork.add_tile((0, 4), tiles.Cross())
+        self.assertIsNone(self.shared.get_tile((0, 4)))
+
+    def test_pickle_attaches(self):
+        data = pickle.dumps(self.shared)
+        self.assertLess(len(data), 200)
+        with pickle.loads(data) as other:
+            self.assertEqual(other, self.maze)
+
+    def test_pool(self):
+        expected = _count_dead_ends(self.maze)
+        with multiprocessing.Pool(2) as pool:
+            self.assertEqual(pool.map(_count_dead_ends, [self.shared] * 4),
+                             [expected] * 4)
+
+    def test_region_queries(self):
+        for box in (((-3, 2), (4, 5)), ((0, 4), (2, 6)), ((10, 10), (12, 12))):
+            self.assertEqual(list(self.shared.iter_region(box)),
+                             list(self.maze.iter_region(box)))
+        self.assertEqual(list(self.shared.iter_edges()),
+                         list(self.maze.iter_edges()))
+
+    def test_batch_queries(self):
+        xs = [x for x in range(-4, 8) for y in range(1, 11)]
+        ys = [y for x in range(-4, 8) for y in range(1, 11)]
+        self.assertEqual(self.shared.walls_at(xs, ys),
+                         self.maze.walls_at(xs, ys))
+        directions = [(x * 3 + y) % 4 for (x, y) in zip(xs, ys)]
+        self.assertEqual(self.shared.is_open_batch(xs, ys, directions),
+                         self.maze.is_open_batch(xs, ys, directions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from .simulation import *
+from .grid import MazeGrid
+from .maze import Maze
+
+from . import tiles
+from .tiles import Tile
+
+
+class Test_Simulation(unittest.TestCase):
+    """
+    Test of the multi-robot simulation
+    """
+
+    def setUp(self):
+        # a closed loop of 2 by 2 corners next to a dead end corridor
+        #   (0,0) (1,0) (2,0)
+        #   (0,1) (1,1)
+        self.maze = Maze()
+        self.maze.add_tile((0,0), tiles.Corner(0))
+        self.maze.add_tile((1,0), tiles.T(0))
+        self.maze.add_tile((2,0), tiles.DeadEnd(1))
+        self.maze.add_tile((0,1), tiles.Corner(3))
+        self.maze.add_tile((1,1), tiles.Corner(2))
+
+    def test_grid_passable(self):
+        grid = MazeGrid(self.maze)
+        self.assertEqual(grid.passable[grid.index((0,0))], 0b0110)
+        self.assertEqual(grid.passable[grid.index((1,0))], 0b1110)
+        self.assertEqual(grid.passable[grid.index((2,0))], 0b1000)
+        # there is no tile at (2,1)
+        self.assertEqual(grid.passable[grid.index((2,1))], 0)
+
+    def test_sense(self):
+        grid = MazeGrid(self.maze)
+        simulation = Simulation(grid, robots=1, starts=[((2,0), Tile.WEST)])
+        self.assertEqual(simulation.sense(0), tiles.DeadEnd(1).wall_mask())
+        self.assertEqual(simulation.ranges(0), (0, 0, 0, 2))
+
+    def test_invalid_starts(self):
+        grid = MazeGrid(self.maze)
+        for starts in ([((3,0), Tile.WEST)], [((0,-1), Tile.WEST)],
+                       [((0,0), 4)], [((0,0), -1)]):
+            with self.assertRaises(ValueError):
+                Simulation(grid, robots=1, starts=starts)
+
+    def test_moves_respect_walls(self):
+        grid = MazeGrid(self.maze)
+        simulation = Simulation(grid, episodes=10, seed=1)
+        previous = list(simulation.positions)
+        for step in range(100):
+            simulation.step()
+            for (before, after) in zip(previous, simulation.positions):
+                moves = [before + delta for (direction, delta)
+                         in enumerate(grid.deltas())
+                         if grid.passable[before] >> direction & 1]
+                self.assertIn(after, moves)
+            previous = list(simulation.positions)
+
+    def test_left_hand_follower_covers_maze(self):
+        grid = MazeGrid(self.maze)
+        simulation = Simulation(grid, robots=1, policy='left_hand',
+                                starts=[((0,0), Tile.EAST)])
+        report = simulation.run(6)
+        self.assertEqual(report.coverage, [1.0])
+        self.assertEqual(report.steps, 6)
+        self.assertEqual(simulation.poses(0), [((0,0), Tile.NORTH)])
+
+    def test_run_episodes_in_process_pool(self):
+        report = run_episodes(self.maze, episodes=10, steps=20, robots=4,
+                              seed=3, processes=2, batch_size=3)
+        self.assertEqual(report.steps, 10 * 20 * 4)
+        self.assertEqual(len(report.coverage), 10)
+        self.assertGreater(report.steps_per_second, 0)
+
+    def test_run_episodes_is_reproducible(self):
+        report1 = run_episodes(self.maze, 5, 7, seed=4, processes=0)
+        report2 = run_episodes(self.maze, 5, 7, seed=4, processes=0)
+        self.assertEqual(report1.coverage, report2.coverage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -156,6 +156,76 @@ class Test_Tile_Types(unittest.TestCase):
         self.assertEqual(t.has_wall(Tile.SOUTH),False)
         self.assertEqual(t.has_wall(Tile.WEST), True)
 
+    def test_seesaw_entrance(self):
+        self.assertEqual(Seesaw().entrance, Tile.NORTH)
+        self.assertEqual(Seesaw(1).entrance, Tile.EAST)
+        self.assertEqual(Seesaw(3).rotate(2).entrance, Tile.EAST)
+        self.assertTrue(Seesaw(3).is_open(Seesaw(3).entrance))
+        self.assertNotEqual(Seesaw(0), Seesaw(2))
+        self.assertEqual(Seesaw(0).walls, Seesaw(2).walls)
+
+    def test_seesaw_passable(self):
+        t = Seesaw()
+        self.assertTrue(t.is_passable())
+        self.assertFalse(t.toggle().is_passable())
+        self.assertEqual(t, Seesaw(passable=False))
+        self.assertNotEqual(t, Seesaw())
+        self.assertTrue(Corner().is_passable())
+
+    def test_seesaw_codes(self):
+        codes = set()
+        for rotations in range(4):
+            for passable in (True, False):
+                t = Seesaw(rotations, passable)
+                codes.add(encode(t))
+                self.assertEqual(decode(encode(t)), t)
+                self.assertEqual(OPEN_MASKS[encode(t)],
+                                 (~t.wall_mask() & 15) if passable else 0)
+        self.assertEqual(len(codes), 8)
+        self.assertEqual(OPEN_MASKS[encode(Corner())], 0b0110)
+        self.assertEqual(OPEN_MASKS[NO_TILE], 0)
+
+    def test_seesaw_open_masks(self):
+        # both ends of a passable seesaw are open, whatever its entrance
+        for rotations in range(4):
+            self.assertEqual(OPEN_MASKS[encode(Seesaw(rotations))],
+                             0b0101 if rotations % 2 == 0 else 0b1010)
+            self.assertEqual(OPEN_MASKS[encode(Seesaw(rotations))],
+                             OPEN_MASKS[encode(Seesaw(rotations + 2))])
+            self.assertEqual(
+                OPEN_MASKS[encode(Seesaw(rotations, passable=False))], 0)
+
+    def test_rotate_codes(self):
+        for cls in (Corner, T, Seesaw):
+            for rotations in range(4):
+                self.assertEqual(ROTATE_CODES[encode(cls(rotations))],
+                                 encode(cls(rotations + 1)))
+        self.assertEqual(ROTATE_CODES[encode(Seesaw(1, passable=False))],
+                         encode(Seesaw(2, passable=False)))
+        self.assertEqual(ROTATE_CODES[NO_TILE], NO_TILE)
+
+    def test_view_codes(self):
+        from . import tiles
+        view = tiles.VIEW_CODES
+        # regular tiles follow their walls, the others keep their type
+        self.assertEqual(view[encode(Cross()) | 0b0001], encode(T(0)))
+        self.assertEqual(view[encode(Corner(1)) | 0b1111], encode(Closed()))
+        seesaw = encode(Seesaw(1))
+        self.assertEqual(view[seesaw | 0b1111], seesaw | 0b1111)
+        self.assertEqual(view[NO_TILE], NO_TILE)
+
+    def test_lazy_tables(self):
+        from . import tiles
+        for name in ('MASK_CODES', 'OPEN_MASKS', 'ROTATE_CODES',
+                     'VIEW_CODES', 'WALL_MASKS', 'PRESENT'):
+            self.assertEqual(len(getattr(tiles, name)), 256)
+            self.assertIs(getattr(tiles, name), getattr(tiles, name))
+        self.assertEqual(tiles.PRESENT[NO_TILE], 0)
+        self.assertEqual(tiles.PRESENT[encode(Closed())], 1)
+        self.assertEqual(from_wall_mask(0b0101), Straight(1))
+        with self.assertRaises(AttributeError):
+            tiles.NO_SUCH_TABLE
+
     def test_straight(self):
         t = Straight()
         self.assertEqual(t.has_wall(Tile.NORTH),False)
@@ -0,0 +1,125 @@
+import unittest
+import heapq
+import random
+
+from .turnplanner import *
+from .coverage import FORWARD, LEFT, RIGHT, U_TURN
+from .generator import perfect_maze
+from .grid import MazeGrid
+from .grid import OFFSETS
+from .maze import Maze
+from .tiles import Tile
+from . import tiles
+
+
+def _reference_cost(grid, start, heading, goal, costs, goal_heading=None):
+    """Dijkstra with separate turn and forward steps"""
+    (forward, turn, u_turn) = costs
+    queue = [(0, start, heading)]
+    done = set()
+    while queue:
+        (cost, (x, y), heading) = heapq.heappop(queue)
+        if ((x, y), heading) in done:
+            continue
+        done.add(((x, y), heading))
+        if (x, y) == goal and goal_heading in (None, heading):
+            return cost
+        for (change, step) in ((1, turn), (3, turn), (2, u_turn)):
+            heapq.heappush(queue, (cost + step, (x, y), (heading + change) % 4))
+        if grid.passable[grid.index((x, y))] >> heading & 1:
+            (dx, dy) = OFFSETS[heading]
+            heapq.heappush(queue, (cost + forward, (x + dx, y + dy), heading))
+    return None
+
+
+class Test_TurnCostPlanner(unittest.TestCase):
+    """
+    Test of the TurnCostPlanner class
+    """
+
+    def drive(self, grid, start, heading, moves):
+        """return the coordinate and heading at the end of the moves"""
+        (x, y) = start
+        for command in moves:
+            if command == FORWARD:
+                self.assertTrue(grid.passable[grid.index((x, y))] >> heading & 1)
+                (x, y) = (x + OFFSETS[heading][0], y + OFFSETS[heading][1])
+            else:
+                heading = (heading + {LEFT: 3, RIGHT: 1, U_TURN: 2}[command]) % 4
+        return ((x, y), heading)
+
+    def cost(self, moves, costs):
+        (forward, turn, u_turn) = costs
+        return moves.count(FORWARD) * forward + \
+            (moves.count(LEFT) + moves.count(RIGHT)) * turn + \
+            moves.count(U_TURN) * u_turn
+
+    def test_matches_reference(self):
+        generator = random.Random(3)
+        maze = perfect_maze(12, 9, seed=1, loops=0.3, origin=(2, -4))
+        grid = MazeGrid(maze)
+        for costs in ((1, 2, 3), (1, 5, 4), (2, 1, 1), (1, 0, 0), (3, 3, 8)):
+            planner = TurnCostPlanner(grid, *costs)
+            for query in range(20):
+                start = (generator.randrange(2, 14), generator.randrange(-4, 5))
+                goal = (generator.randrange(2, 14), generator.randrange(-4, 5))
+                heading = generator.randrange(4)
+                goal_heading = generator.choice((None, generator.randrange(4)))
+                (moves, cost) = planner.plan(start, heading, goal, goal_heading)
+                self.assertEqual(cost, _reference_cost(grid, start, heading,
+                                                       goal, costs,
+                                                       goal_heading))
+                self.assertEqual(cost, self.cost(moves, costs))
+                (end, end_heading) = self.drive(grid, start, heading, moves)
+                self.assertEqual(end, goal)
+                if goal_heading is not None:
+                    self.assertEqual(end_heading, goal_heading)
+
+    def test_free_turns(self):
+        maze = perfect_maze(10, 10, seed=2, loops=0.2)
+        grid = MazeGrid(maze)
+        (moves, cost) = TurnCostPlanner(maze, 1, 0, 0).plan((0, 0), Tile.EAST,
+                                                            (9, 9))
+        self.assertEqual(cost, len(grid.shortest_path((0, 0), (9, 9))) - 1)
+
+    def test_prefers_straight_routes(self):
+        # the zigzag along the diagonal is as short as the way around
+        maze = Maze.from_grid([[0b1001, 0b0011, 0b1011],
+                               [0b1010, 0b1100, 0b0010],
+                               [0b1100, 0b0101, 0b0110]])
+        planner = TurnCostPlanner(maze, forward=1, turn=3, u_turn=5)
+        self.assertEqual(planner.plan((0, 0), Tile.SOUTH, (2, 2)),
+                         ('FFLFF', 7))
+        self.assertEqual(planner.plan((0, 0), Tile.SOUTH, (0, 0)), ('', 0))
+        self.assertEqual(planner.plan((0, 0), Tile.SOUTH, (0, 0), Tile.NORTH),
+                         ('U', 5))
+
+    def test_expensive_u_turn(self):
+        # two quarter turns are cheaper than a U-turn
+        maze = Maze.from_grid([[0b1101, 0b0111]])
+        planner = TurnCostPlanner(maze, forward=3, turn=3, u_turn=8)
+        self.assertEqual(planner.plan((0, 0), Tile.SOUTH, (0, 0), Tile.NORTH),
+                         ('RR', 6))
+        self.assertEqual(planner.plan((1, 0), Tile.EAST, (0, 0)), ('RRF', 9))
+
+    def test_seesaw(self):
+        maze = Maze.from_grid([[0b1101, 0b0101, 0b0111]])
+        grid = MazeGrid(maze)
+        planner = TurnCostPlanner(grid)
+        self.assertEqual(planner.plan((0, 0), Tile.EAST, (2, 0)), ('FF', 2))
+        grid.set_tile((1, 0), tiles.Seesaw(1, passable=False))
+        self.assertIsNone(planner.plan((0, 0), Tile.EAST, (2, 0)))
+
+    def test_errors(self):
+        maze = Maze.from_grid([[0b1101, 0b0111]])
+        self.assertRaises(ValueError, TurnCostPlanner, maze, 1, -1, 2)
+        self.assertRaises(ValueError, TurnCostPlanner(maze).plan, (0, 0),
+                          Tile.EAST, (3, 0))
+        self.assertRaises(ValueError, TurnCostPlanner(maze).plan, (0, 0), 4,
+                          (1, 0))
+        self.assertRaises(ValueError, TurnCostPlanner(maze).plan, (0, 0),
+                          Tile.EAST, (1, 0), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -142,6 +142,36 @@ class Tile(object):
     def __ne__(self,other):
         return not self.__eq__(other)
 
+    def wall_mask(self):
+        """
+        Return the walls of this Tile packed in a 4 bit integer.
+
+        Bit i is set if there is a wall in direction i, e.g. a mask of 0b0101
+        denotes walls in the north and south direction.
+        """
+        walls = self.walls
+        return walls[0] | walls[1] << 1 | walls[2] << 2 | walls[3] << 3
+
+    def __reduce_ex__(self, protocol):
+        """
+        Pickle this Tile as its single byte tile code (see encode) rather than
+        as a list of booleans. Tile types without a tile code are pickled as
+        usual.
+        """
+        try:
+            return (decode, (encode(self),))
+        except ValueError:
+            return super().__reduce_ex__(protocol)
+
+    def is_passable(self):
+        """
+        Check whether a robot can currently drive onto this Tile through its
+        open sides.
+
+        Regular tiles are always passable, see Seesaw for tiles that are not.
+        """
+        return True
+
 
 
 class Straight(Tile):
@@ -205,11 +235,226 @@ class Seesaw(Tile):
     """Create a Seasaw tile.
 
     A Seesaw Tile is  has walls in East and west and in open in the north and south direction.
+
+    A seesaw is lowered on its entrance side, i.e. the side given by the
+    orientation of the seesaw token in a mazefile. Seesaw(0) has its entrance
+    in the north, rotating the tile rotates the entrance along with the walls.
+
+    A seesaw also acts as a gate: while it is blocked a robot can't drive onto
+    it from either side.
+
+    The entrance only tells which side is lowered, it doesn't restrict the
+    way a robot drives: a passable seesaw can be crossed in both directions,
+    hence is_passable and OPEN_MASKS ignore the entrance.
     """
 
-    def __init__(self,rotations=0):
+    """Direction of the entrance of this seesaw"""
+    entrance = Tile.NORTH
+
+    """False while the seesaw blocks the way"""
+    passable = True
+
+    def __init__(self,rotations=0, passable=True):
+        self.entrance = Tile.NORTH
+        self.passable = bool(passable)
         super().__init__([False, True, False,True],rotations)
 
+    def rotate(self, number=1):
+        """Rotate this Tile <number> times 90 degrees counter clockwise"""
+        super().rotate(number)
+        self.entrance = (self.entrance + number) % 4
+        return self
+
+    def is_passable(self):
+        return self.passable
+
+    def toggle(self):
+        """Switch this seesaw between passable and blocked"""
+        self.passable = not self.passable
+        return self
+
+    def __str__(self):
+        return 'Seesaw(entrance={:d},passable={!s})'.format(
+            self.entrance, self.passable)
+
+    def __eq__(self,other):
+        return super().__eq__(other) and \
+               self.entrance == other.entrance and \
+               self.passable == other.passable
+
+
+"""
+Tile types that can be stored as a compact tile code.
+
+A tile code is a single byte (type_index << 4) | wall_mask where type_index is
+the position of the tile class in TILE_TYPES plus one. The code 0 is reserved
+to denote the absence of a tile.
+
+The wall mask of a Seesaw only tells whether it runs north-south or east-west,
+hence a Seesaw takes 4 consecutive type indices: bit 0 of the offset is set if
+the entrance is in the south or west, bit 1 if the seesaw is blocked.
+"""
+TILE_TYPES = (Tile, Straight, Corner, T, DeadEnd, Cross, Closed, Seesaw)
+
+_TYPE_INDEX = {cls: index+1 for (index, cls) in enumerate(TILE_TYPES)}
+
+_SEESAW_INDEX = _TYPE_INDEX[Seesaw]
+
+"""Tile code denoting the absence of a tile"""
+NO_TILE = 0
+
+
+def encode(tile):
+    """
+    Return the tile code of a given tile.
+
+    Raises a ValueError if the tile type can not be represented by a tile
+    code.
+    """
+    try:
+        type_index = _TYPE_INDEX[tile.__class__]
+    except KeyError:
+        raise ValueError(
+            'tile type {!s} has no tile code'.format(tile.__class__.__name__))
+    if type_index == _SEESAW_INDEX:
+        type_index += (tile.entrance >= 2) | (not tile.passable) << 1
+    return type_index << 4 | tile.wall_mask()
+
+
+def decode(code):
+    """
+    Return a new Tile object for a given tile code.
+
+    Return None for the NO_TILE code.
+    """
+    if code == NO_TILE:
+        return None
+    type_index = code >> 4
+    seesaw = type_index - _SEESAW_INDEX
+    tile = object.__new__(TILE_TYPES[type_index - 1 - max(seesaw, 0)])
+    tile.walls = [bool(code & 1), bool(code & 2), bool(code & 4), bool(code & 8)]
+    if seesaw >= 0:
+        # the entrance lies on one of the open sides
+        tile.entrance = (1 if code & 1 else 0) + 2 * (seesaw & 1)
+        tile.passable = not seesaw & 2
+    return tile
+
+
+def _mask_codes():
+    """
+    MASK_CODES[mask] is the tile code of the regular tile with the given wall
+    mask, e.g. the code of a Corner tile for a mask with two adjacent walls.
+    The table is 256 bytes long so it can be passed to bytes.translate.
+    """
+    codes = bytearray(256)
+    for cls in (Cross, T, Straight, Corner, DeadEnd, Closed):
+        for rotations in range(4):
+            tile = cls(rotations)
+            codes[tile.wall_mask()] = encode(tile)
+    return bytes(codes)
+
+
+def _open_masks():
+    """
+    OPEN_MASKS[code] is a 4 bit mask of the directions in which a robot can
+    leave the tile with the given code: the sides without a wall of a passable
+    tile. It is 0 for NO_TILE and for blocked seesaws. The entrance of a
+    seesaw plays no part, see Seesaw.
+    """
+    masks = bytearray(256)
+    for code in range(1 << 4, _SEESAW_INDEX + 4 << 4):
+        if decode(code).is_passable():
+            masks[code] = ~code & 15
+    return bytes(masks)
+
+
+def _rotate_codes():
+    """
+    ROTATE_CODES[code] is the code of the tile with the given code after a
+    single rotation (see Tile.rotate), e.g. to rotate a whole grid of codes at
+    once with bytes.translate.
+    """
+    codes = bytearray(256)
+    for code in range(1 << 4, _SEESAW_INDEX + 4 << 4):
+        codes[code] = encode(decode(code).rotate())
+    return bytes(codes)
+
+def _wall_masks():
+    """
+    WALL_MASKS[code] is the wall mask (see Tile.wall_mask) of the tile with
+    the given code. It is 15 for NO_TILE, a spot without a tile is walled
+    off like a Closed tile.
+    """
+    return bytes(code & 15 if code else 15 for code in range(256))
+
+
+def _present():
+    """
+    PRESENT[code] is 1 for the code of a tile and 0 for NO_TILE, e.g. to turn
+    a grid of codes into a plane of occupied spots with bytes.translate.
+    """
+    return bytes(1 if code else 0 for code in range(256))
+
+
+def _view_codes():
+    """
+    VIEW_CODES[type_index << 4 | wall_mask] is the code of the tile with a
+    given type index (see encode) and the given walls. A regular tile (see
+    MASK_CODES) turns into the regular tile with those walls, e.g. a Cross
+    with a wall in the north is a T, other tiles keep their type.
+    """
+    mask_codes = _table('MASK_CODES')
+    regular = frozenset(mask_codes[mask] >> 4 for mask in range(16))
+    codes = bytearray(256)
+    for code in range(1 << 4, 256):
+        if code >> 4 in regular:
+            codes[code] = mask_codes[code & 15]
+        else:
+            codes[code] = code
+    return bytes(codes)
+
+"""
+Lookup tables of tile codes and the functions that build them. A table is
+built on its first access rather than when this module is imported, see
+__getattr__.
+"""
+_TABLES = {'MASK_CODES': _mask_codes,
+           'OPEN_MASKS': _open_masks,
+           'ROTATE_CODES': _rotate_codes,
+           'WALL_MASKS': _wall_masks,
+           'PRESENT': _present,
+           'VIEW_CODES': _view_codes}
+
+
+def __getattr__(name):
+    """build a lookup table of _TABLES on its first access"""
+    try:
+        builder = _TABLES[name]
+    except KeyError:
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name))
+    table = globals()[name] = builder()
+    return table
+
+
+def _table(name):
+    """return a lookup table of _TABLES from within this module"""
+    return globals().get(name) or __getattr__(name)
+
+
+"""the public names of this module, including the lazily built tables"""
+__all__ = ['Tile', 'Straight', 'Corner', 'T', 'DeadEnd', 'Cross', 'Closed',
+           'Seesaw', 'TILE_TYPES', 'NO_TILE', 'encode', 'decode',
+           'from_wall_mask'] + list(_TABLES)
+
+
+def from_wall_mask(mask):
+    """
+    Return a new regular tile (Cross, T, Straight, Corner, DeadEnd or
+    Closed) with the walls denoted by a 4 bit wall mask.
+    """
+    return decode(_table('MASK_CODES')[mask])
+
 
 if __name__ == '__main__':
     import unittest
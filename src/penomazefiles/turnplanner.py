@@ -0,0 +1,128 @@
+'''
+File: turnplanner.py
+Author: Jeroen De Vlieger
+Description:
+
+Shortest routes for a robot that pays for turning.
+
+A robot turns on the spot, which takes a lot longer than driving one tile
+forward. The fastest route is then not the one with the fewest tiles but the
+one with the lowest sum of forward, turn and U-turn costs. The planner
+searches the (tile, heading) states of the robot with Dijkstra's algorithm.
+A transition turns the robot, if needed, and drives it one tile forward, the
+transitions of each heading and passable mask are precomputed for the costs
+of the planner.
+
+Run its benchmark to time the planner on a random maze
+
+    python3 -m penomazefiles.benchmarks turnplanner [width height]
+'''
+import heapq
+
+from .coverage import FORWARD
+from .coverage import TURNS
+from .grid import MazeGrid
+
+
+class TurnCostPlanner(object):
+    """
+    Dijkstra search over the (tile, heading) states of a maze.
+
+    A state is the grid index of a tile times 4 plus the heading of the
+    robot. The planner reads the passable masks of its MazeGrid on every
+    search, so replacing a tile with grid.set_tile, e.g. a seesaw that
+    toggled, takes effect on the next search.
+    """
+
+    def __init__(self, maze, forward=1, turn=2, u_turn=3):
+        """
+        Plan routes through a maze, or a MazeGrid, with the given costs of
+        driving one tile forward, of a quarter turn and of a U-turn. A robot
+        reverses with two quarter turns if they cost less than a U-turn.
+        """
+        if min(forward, turn, u_turn) < 0:
+            raise ValueError('the costs can not be negative')
+        self.grid = maze if isinstance(maze, MazeGrid) else MazeGrid(maze)
+        # a reversal is a U-turn or two quarter turns, whichever is cheaper
+        if u_turn <= 2 * turn:
+            self.costs = (0, turn, u_turn, turn)
+            self.turns = TURNS
+        else:
+            self.costs = (0, turn, 2 * turn, turn)
+            self.turns = (TURNS[0], TURNS[1], TURNS[1] * 2, TURNS[3])
+
+        # _transitions[mask << 2 | heading] lists a (state offset, cost,
+        # commands) tuple per direction a robot with that heading can leave a
+        # tile with that passable mask
+        deltas = self.grid.deltas()
+        self._transitions = tuple(
+            tuple(((deltas[direction] << 2) + direction - heading,
+                   forward + self.costs[(direction - heading) % 4],
+                   self.turns[(direction - heading) % 4] + FORWARD)
+                  for direction in range(4) if mask >> direction & 1)
+            for mask in range(16) for heading in range(4))
+
+    def _index(self, coordinate):
+        grid = self.grid
+        if not grid.contains(coordinate) or \
+           not grid.present[grid.index(coordinate)]:
+            raise ValueError('there is no tile at {!s}'.format(coordinate))
+        return grid.index(coordinate)
+
+    def plan(self, start, heading, goal, goal_heading=None):
+        """
+        Return a (moves, cost) tuple of a cheapest route of a robot at
+        coordinate 'start' facing 'heading' to coordinate 'goal', or None if
+        the goal can't be reached.
+
+        moves is a string of FORWARD, LEFT, RIGHT and U_TURN commands (see
+        coverage.path_moves). If goal_heading is given the route ends with the
+        robot facing that direction, otherwise with any heading.
+        """
+        for direction in (heading, goal_heading):
+            if direction not in (None, 0, 1, 2, 3):
+                raise ValueError('a heading must be in range(4), not '
+                                 '{!s}'.format(direction))
+        source = self._index(start) << 2 | heading
+        target = self._index(goal)
+        passable = self.grid.passable
+        transitions = self._transitions
+
+        costs = {source: 0}
+        parents = {source: None}
+        queue = [(0, source)]
+        best = None
+        while queue:
+            (cost, state) = heapq.heappop(queue)
+            if best is not None and cost >= best[0]:
+                break
+            if cost > costs[state]:
+                continue
+            index = state >> 2
+            if index == target:
+                # the last turn into the goal heading, if any
+                total = cost if goal_heading is None else \
+                    cost + self.costs[(goal_heading - state) % 4]
+                if best is None or total < best[0]:
+                    best = (total, state)
+                continue
+            for (offset, step, commands) in \
+                    transitions[passable[index] << 2 | state & 3]:
+                neighbour = state + offset
+                new_cost = cost + step
+                if new_cost < costs.get(neighbour, new_cost + 1):
+                    costs[neighbour] = new_cost
+                    parents[neighbour] = (state, commands)
+                    heapq.heappush(queue, (new_cost, neighbour))
+        if best is None:
+            return None
+
+        (total, state) = best
+        moves = []
+        if goal_heading is not None:
+            moves.append(self.turns[(goal_heading - state) % 4])
+        while parents[state] is not None:
+            (state, commands) = parents[state]
+            moves.append(commands)
+        moves.reverse()
+        return (''.join(moves), total)